@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import functools
+from langgraph.config import get_config
+
+class BranchGroup:
+    """
+    Nodes the graph runs concurrently in one step. A member that rejects the claim cancels
+    the members still running in the same run, e.g. a policy that doesn't exist stops the
+    document extraction that started next to it.
+    """
+
+    def __init__(self, *names: str):
+        self.names = names
+        self._running = {}       # (run id, checkpoints, step) -> {node name: task}
+        self._cancelled = set()  # (run key, node name) cancelled by a sibling
+
+    @staticmethod
+    def _run_key() -> tuple:
+        # run_id is set per run by the runner, so two concurrent runs of one claim (or thread)
+        # never share siblings. Runs invoked without one are told apart by the checkpoints the
+        # step started from (one per enclosing graph, new for every step of every run).
+        config = get_config()
+        configurable = config.get("configurable", {})
+        return (configurable.get("run_id"), tuple(sorted((configurable.get("checkpoint_map") or {}).items())),
+                config.get("metadata", {}).get("langgraph_step"))
+
+    def branch(self, name: str, node_fn):
+        """
+        Wraps a member node so a sibling's Reject can cancel it. A cancelled node returns no
+        update; the run ends on the Reject anyway.
+        """
+        @functools.wraps(node_fn)
+        async def wrapper(state):
+            key = self._run_key()
+            # The node runs as its own task (inheriting the node's metrics context) so it can be
+            # cancelled without cancelling the graph's task
+            task = asyncio.ensure_future(node_fn(state))
+            running = self._running.setdefault(key, {})
+            running[name] = task
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                if (key, name) not in self._cancelled:
+                    raise
+                self._cancelled.discard((key, name))
+                return {}
+            finally:
+                running.pop(name, None)
+                if not running:
+                    self._running.pop(key, None)
+
+            if (result or {}).get("decision") == "Reject":
+                self._cancel_siblings(key, name, state.get("claim_id"))
+            return result
+
+        return wrapper
+
+    def _cancel_siblings(self, key: tuple, name: str, claim_id: str):
+        for sibling, task in list(self._running.get(key, {}).items()):
+            if sibling != name and task.cancel():
+                self._cancelled.add((key, sibling))
+                logging.info(f"Claim {claim_id}: {name} rejected the claim, cancelled {sibling}")
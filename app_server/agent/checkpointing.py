@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+from pymongo import ASCENDING, UpdateOne
+from langgraph.checkpoint.mongodb import MongoDBSaver
+
+class ChannelBlobMongoDBSaver(MongoDBSaver):
+    """
+    MongoDBSaver that stores channel values once per channel version.
+
+    The stock saver serializes every channel value into every checkpoint, so a large,
+    unchanged fnol_data would be rewritten after each node. Here checkpoints are stored
+    without channel_values; each value lives in a blob document keyed by
+    (thread_id, checkpoint_ns, channel, version) and is only written when the channel's
+    version changes. Blobs are re-attached on read.
+    """
+
+    def __init__(self, client, db_name: str, blobs_collection_name: str = "checkpoint_blobs", **kwargs: Any) -> None:
+        super().__init__(client, db_name, **kwargs)
+        self.blobs_collection = self.db[blobs_collection_name]
+        self.blobs_collection.create_index(
+            [("thread_id", ASCENDING), ("checkpoint_ns", ASCENDING), ("channel", ASCENDING), ("version", ASCENDING)],
+            unique=True
+        )
+        if self.ttl:
+            self.blobs_collection.create_index([("created_at", ASCENDING)], expireAfterSeconds=self.ttl)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        values = checkpoint.get("channel_values", {})
+        now = datetime.now(tz=timezone.utc)
+
+        operations = []
+        for channel, version in new_versions.items():
+            if channel in values:
+                type_, serialized = self.serde.dumps_typed(values[channel])
+            else:
+                type_, serialized = "empty", None
+            doc = {"type": type_, "value": serialized}
+            if self.ttl:
+                doc["created_at"] = now
+            operations.append(UpdateOne(
+                {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "channel": channel, "version": str(version)},
+                {"$setOnInsert": doc},
+                upsert=True
+            ))
+        if operations:
+            self.blobs_collection.bulk_write(operations, ordered=False)
+
+        return super().put(config, {**checkpoint, "channel_values": {}}, metadata, new_versions)
+
+    def get_tuple(self, config):
+        checkpoint_tuple = super().get_tuple(config)
+        if checkpoint_tuple:
+            self._attach_channel_values(checkpoint_tuple)
+        return checkpoint_tuple
+
+    def list(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None, limit: Optional[int] = None):
+        for checkpoint_tuple in super().list(config, filter=filter, before=before, limit=limit):
+            self._attach_channel_values(checkpoint_tuple)
+            yield checkpoint_tuple
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self.blobs_collection.delete_many({"thread_id": thread_id})
+
+    def _attach_channel_values(self, checkpoint_tuple) -> None:
+        configurable = checkpoint_tuple.config["configurable"]
+        versions = checkpoint_tuple.checkpoint.get("channel_versions", {})
+        if not versions:
+            return
+
+        query = {
+            "thread_id": configurable["thread_id"],
+            "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+            "$or": [{"channel": channel, "version": str(version)} for channel, version in versions.items()],
+        }
+        values = {}
+        for doc in self.blobs_collection.find(query):
+            if doc["type"] != "empty":
+                values[doc["channel"]] = self.serde.loads_typed((doc["type"], doc["value"]))
+        checkpoint_tuple.checkpoint["channel_values"] = values
@@ -1,5 +1,10 @@
-from langgraph.graph import StateGraph, END
+import os
+import functools
+from langgraph.graph import StateGraph, START, END
 from app_server.agent.state import ClaimAgentState
+from app_server.agent.branches import BranchGroup
+from app_server.agent.claim_types import CLAIM_TYPE_PROFILES, GENERIC_PROFILE
+from app_server.utils.metrics import instrument_node
 
 # Import Nodes
 from app_server.agent.nodes.fnol_node import fnol_node
@@ -11,54 +16,44 @@ from app_server.agent.nodes.fraud_check_node import fraud_check_node
 from app_server.agent.nodes.assessment_node import assessment_node
 from app_server.agent.nodes.settlement_node import settlement_node
 
-# Graph Construction
-workflow = StateGraph(ClaimAgentState)
-
-# Add Nodes
-workflow.add_node("fnol", fnol_node)
-workflow.add_node("policy_verification", policy_verification_node)
-workflow.add_node("document_reader", document_reader_node)
-workflow.add_node("proof_verification", proof_verification_node)
-workflow.add_node("coverage", coverage_node)
-workflow.add_node("fraud_check", fraud_check_node)
-workflow.add_node("assessment", assessment_node)
-workflow.add_node("settlement", settlement_node)
-
-# Set Entry Point
-workflow.set_entry_point("fnol")
+CLAIM_GRAPH_PARALLEL = os.getenv("CLAIM_GRAPH_PARALLEL", "true").lower() == "true"
+
+# Nodes of the per-claim-type subgraphs (FNOL runs before the claim type is known)
+NODES = {
+    "policy_verification": policy_verification_node,
+    "document_reader": document_reader_node,
+    "proof_verification": proof_verification_node,
+    "coverage": coverage_node,
+    "fraud_check": fraud_check_node,
+    "assessment": assessment_node,
+    "settlement": settlement_node,
+}
+# Nodes that take the claim type's profile
+PROFILE_NODES = {"coverage", "assessment"}
+# Subgraph for claim types without a profile
+GENERIC_CLAIM_TYPE = "general"
+
+# Stages whose nodes only read what earlier stages wrote. In the parallel graph each stage
+# fans out and joins in a no-op node; a Reject from any member cancels the others. Fraud
+# check runs after the review join, as in the sequential graph: a coverage Reject would
+# otherwise cancel it at an arbitrary point.
+INTAKE_NODES = ("policy_verification", "document_reader")
+REVIEW_NODES = ("proof_verification", "coverage")
 
 # Define Edges
 
-# 1. FNOL -> Policy Verification
-def check_fnol(state: ClaimAgentState):
-    if state.get("decision") == "Reject":
-        return END
-    return "policy_verification"
-
-workflow.add_conditional_edges("fnol", check_fnol, {"policy_verification": "policy_verification", END: END})
-
-# 1b. Policy Verification -> Document Reader
+# 1. Policy Verification -> Document Reader
 def check_policy_sql(state: ClaimAgentState):
     if state.get("decision") == "Reject":
         return END
     return "document_reader"
 
-workflow.add_conditional_edges("policy_verification", check_policy_sql, {"document_reader": "document_reader", END: END})
-
-# 2. Document Reader -> Proof Verification
-workflow.add_edge("document_reader", "proof_verification")
-
-# 3. Proof Verification -> Coverage
-workflow.add_edge("proof_verification", "coverage")
-
-# 4. Coverage -> Fraud Check
+# 2. Coverage -> Fraud Check
 def check_coverage(state: ClaimAgentState):
     if state.get("decision") == "Reject":
         return END
     return "fraud_check"
 
-workflow.add_conditional_edges("coverage", check_coverage, {"fraud_check": "fraud_check", END: END})
-
 # 3. Fraud Check -> (Assessment / Settlement)
 def check_fraud(state: ClaimAgentState):
     fraud = state.get("fraud_risk", {})
@@ -68,13 +63,113 @@ def check_fraud(state: ClaimAgentState):
         return "settlement"
     return "assessment"
 
-workflow.add_conditional_edges("fraud_check", check_fraud, {"settlement": "settlement", "assessment": "assessment"})
+def fan_out(stage: BranchGroup):
+    def route(state: ClaimAgentState):
+        if state.get("decision") == "Reject":
+            return END
+        return list(stage.names)
+    return route
+
+async def join_node(state: ClaimAgentState):
+    return {}
+
+def build_claim_subgraph(profile: dict, parallel: bool = CLAIM_GRAPH_PARALLEL) -> StateGraph:
+    """
+    Builds the workflow after FNOL for one claim type, either strictly sequential or with
+    independent stages run in parallel. Both make the same decisions.
+    """
+    # Graph Construction (all nodes are coroutines)
+    workflow = StateGraph(ClaimAgentState)
+    # Each compiled graph tracks its own running branches
+    intake, review = BranchGroup(*INTAKE_NODES), BranchGroup(*REVIEW_NODES)
+    stages = {name: stage for stage in (intake, review) for name in stage.names} if parallel else {}
+
+    # Add Nodes (each wrapped to record timings into node_metrics and Prometheus)
+    for name, node_fn in NODES.items():
+        if name in PROFILE_NODES:
+            node_fn = functools.partial(node_fn, profile=profile)
+        if name in stages:
+            node_fn = stages[name].branch(name, node_fn)
+        workflow.add_node(name, instrument_node(name, node_fn))
+
+    if parallel:
+        # (policy_verification | document_reader) -> intake_join
+        workflow.add_node("intake_join", join_node)
+        workflow.add_conditional_edges(START, fan_out(intake), [*intake.names, END])
+        workflow.add_edge(list(intake.names), "intake_join")
+        # -> (proof_verification | coverage) -> review_join
+        workflow.add_node("review_join", join_node)
+        workflow.add_conditional_edges("intake_join", fan_out(review), [*review.names, END])
+        workflow.add_edge(list(review.names), "review_join")
+        # -> fraud_check -> (assessment ->) settlement
+        workflow.add_conditional_edges("review_join", check_coverage, {"fraud_check": "fraud_check", END: END})
+        workflow.add_conditional_edges("fraud_check", check_fraud, {"settlement": "settlement", "assessment": "assessment"})
+    else:
+        workflow.set_entry_point("policy_verification")
+        workflow.add_conditional_edges("policy_verification", check_policy_sql, {"document_reader": "document_reader", END: END})
+        workflow.add_edge("document_reader", "proof_verification")
+        workflow.add_edge("proof_verification", "coverage")
+        workflow.add_conditional_edges("coverage", check_coverage, {"fraud_check": "fraud_check", END: END})
+        workflow.add_conditional_edges("fraud_check", check_fraud, {"settlement": "settlement", "assessment": "assessment"})
+
+    # Assessment -> Settlement -> END
+    workflow.add_edge("assessment", "settlement")
+    workflow.add_edge("settlement", END)
+    return workflow
+
+def compile_claim_subgraphs(parallel: bool = CLAIM_GRAPH_PARALLEL) -> dict:
+    """
+    claim type -> compiled subgraph, for one claim graph. Subgraphs use the parent graph's
+    checkpointer.
+    """
+    subgraphs = {claim_type: build_claim_subgraph(profile, parallel).compile()
+                 for claim_type, profile in CLAIM_TYPE_PROFILES.items()}
+    subgraphs[GENERIC_CLAIM_TYPE] = build_claim_subgraph(GENERIC_PROFILE, parallel).compile()
+    return subgraphs
+
+def subgraph_node_name(claim_type: str) -> str:
+    return f"{claim_type}_claim"
+
+def subgraph_node(subgraph):
+    async def run_subgraph(state: ClaimAgentState):
+        result = await subgraph.ainvoke(state)
+        # The subgraph returns its whole state; pass on only the channels it changed (so
+        # checkpoints don't rewrite the rest) and only the reasoning it added, since
+        # reasoning is appended to
+        update = {key: value for key, value in result.items()
+                  if key != "reasoning" and (key not in state or value is not state[key] and value != state[key])}
+        update["reasoning"] = result.get("reasoning", [])[len(state.get("reasoning", [])):]
+        return update
+    return run_subgraph
+
+# FNOL -> claim type subgraph
+def route_claim_type(state: ClaimAgentState):
+    if state.get("decision") == "Reject":
+        return END
+    claim_type = state.get("fnol_data", {}).get("claim_type")
+    return subgraph_node_name(claim_type if claim_type in CLAIM_TYPE_PROFILES else GENERIC_CLAIM_TYPE)
+
+SUBGRAPH_NODES = {subgraph_node_name(claim_type) for claim_type in [*CLAIM_TYPE_PROFILES, GENERIC_CLAIM_TYPE]}
 
-# 4. Assessment -> Settlement
-workflow.add_edge("assessment", "settlement")
+def build_claim_graph(parallel: bool = CLAIM_GRAPH_PARALLEL) -> StateGraph:
+    """
+    FNOL, then the subgraph of the claim's type.
+    """
+    workflow = StateGraph(ClaimAgentState)
+    workflow.add_node("fnol", instrument_node("fnol", fnol_node))
+    for claim_type, subgraph in compile_claim_subgraphs(parallel).items():
+        workflow.add_node(subgraph_node_name(claim_type), subgraph_node(subgraph))
+        workflow.add_edge(subgraph_node_name(claim_type), END)
 
-# 5. Settlement -> END
-workflow.add_edge("settlement", END)
+    workflow.set_entry_point("fnol")
+    workflow.add_conditional_edges("fnol", route_claim_type, [*SUBGRAPH_NODES, END])
+    return workflow
 
 # Compile
-claim_graph = workflow.compile()
+def compile_claim_graph(checkpointer=None, parallel: bool = CLAIM_GRAPH_PARALLEL):
+    """
+    Compiles the workflow, optionally with a checkpointer for durable, resumable runs.
+    """
+    return build_claim_graph(parallel).compile(checkpointer=checkpointer)
+
+claim_graph = compile_claim_graph()
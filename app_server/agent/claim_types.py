@@ -0,0 +1,40 @@
+from typing import Dict, Any
+
+# Everything that differs between claim types, in one place. Each profile is bound into its
+# own subgraph when the claim graph is built, so nodes don't branch on claim_type at runtime.
+#   mandatory_docs          FNOL rejects the claim without these document categories
+#   deductible              subtracted from the payout
+#   default_coverage_limit  used when the policy row is missing
+#   sum_assured             fixed payout; skips the bill-amount scan in assessment
+CLAIM_TYPE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "life": {
+        "mandatory_docs": ["death-certificate", "bank-details"],
+        "deductible": 0,
+        "default_coverage_limit": 1000000,
+        # In a real system, fetch 'sum_assured' from the policy
+        "sum_assured": 1000000.0,
+    },
+    "health": {
+        "mandatory_docs": ["claim-form", "hospital-bills", "discharge-summary"],
+        "deductible": 5000,
+        "default_coverage_limit": 500000,
+        "sum_assured": None,
+    },
+    "car": {
+        "mandatory_docs": ["claim-form", "rc-copy", "driving-license", "damage-photos"],
+        "deductible": 5000,
+        "default_coverage_limit": 500000,
+        "sum_assured": None,
+    },
+}
+
+# Claims of any other type
+GENERIC_PROFILE: Dict[str, Any] = {
+    "mandatory_docs": [],
+    "deductible": 5000,
+    "default_coverage_limit": 500000,
+    "sum_assured": None,
+}
+
+def get_claim_type_profile(claim_type: str) -> Dict[str, Any]:
+    return CLAIM_TYPE_PROFILES.get(claim_type, GENERIC_PROFILE)
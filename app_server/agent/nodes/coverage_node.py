@@ -1,15 +1,18 @@
 from app_server.agent.state import ClaimAgentState
+from app_server.agent.claim_types import get_claim_type_profile
 from typing import Dict, Any
 
-def coverage_node(state: ClaimAgentState) -> Dict[str, Any]:
+async def coverage_node(state: ClaimAgentState, profile: Dict[str, Any] = None) -> Dict[str, Any]:
     """
     Verifies if the policy covers the reported incident.
+    profile is the claim type's profile, bound by the claim type's subgraph.
     """
     print("--- Coverage Verification Node ---")
     
     policy_id = state.get("policy_id")
     fnol_data = state.get("fnol_data", {})
     claim_type = fnol_data.get("claim_type", "General")
+    profile = profile or get_claim_type_profile(claim_type)
     
     # Use Data from SQL Verification
     sql_data = state.get("policy_sql_data", {})
@@ -27,14 +30,12 @@ def coverage_node(state: ClaimAgentState) -> Dict[str, Any]:
         # Fallback to Mock if SQL data is missing
         print(f"⚠️ SQL data missing, falling back to mock for {policy_id}")
         is_covered = True
-        coverage_limit = 500000 
-        if claim_type == "life":
-            coverage_limit = 1000000
+        coverage_limit = profile["default_coverage_limit"]
     
     coverage_data = {
         "is_active": True,
         "covers_incident_type": is_covered,
-        "deductible": 0 if claim_type == "life" else 5000,
+        "deductible": profile["deductible"],
         "coverage_limit": float(coverage_limit)
     }
     
@@ -52,6 +53,6 @@ def coverage_node(state: ClaimAgentState) -> Dict[str, Any]:
 
     # Sync to backend
     from app_server.utils.sync import sync_claim_state_to_backend
-    sync_claim_state_to_backend({**state, **res}, current_step="coverage_analysis")
+    sync_claim_state_to_backend(state, current_step="coverage_analysis", delta=res)
 
     return res
@@ -1,61 +1,52 @@
 
 from typing import Dict, Any
 from app_server.agent.state import ClaimAgentState
-from app_server.utils.clients import azure_client, AZURE_DEPLOYMENT_NAME
+from app_server.utils.clients import azure_chat, vision_chat, AZURE_DEPLOYMENT_NAME
 from app_server.utils.helpers import safe_parse_json, ensure_azure_url_has_sas
+from app_server.utils.extraction_cache import make_cache_key_from_digest, get_cached_extraction, put_cached_extraction
+from app_server.utils.pdf_pipeline import download_document, render_pdf, read_pdf_text, run_cpu_bound
+from app_server.utils.metrics import track_io, record_tokens
+from app_server.utils.image_preprocessing import IMAGE_PREPROCESSING_ENABLED, preprocess_image_bytes, to_data_url
+from app_server.utils.text_extractors import (
+    TEXT_FAST_PATH_ENABLED,
+    TEXT_LLM_ENABLED,
+    TEXT_LLM_MAX_CHARS,
+    has_usable_text,
+    extract_with_regex,
+    record_extraction_path,
+)
+import asyncio
 import logging
-import fitz # PyMuPDF
-import base64
-import requests
-import io
+import os
 
-def document_reader_node(state: ClaimAgentState) -> Dict[str, Any]:
+# Process-wide cap on Azure requests in flight. Held only for the HTTP call itself, so callers
+# waiting out a 429 or retry backoff don't keep slots other documents could use.
+VISION_MAX_CONCURRENCY = int(os.getenv("VISION_MAX_CONCURRENCY", "8"))
+vision_semaphore = asyncio.Semaphore(VISION_MAX_CONCURRENCY)
+
+# Text-only extraction of born-digital PDFs can use a cheaper deployment
+TEXT_EXTRACTION_DEPLOYMENT = os.getenv("TEXT_EXTRACTION_DEPLOYMENT", AZURE_DEPLOYMENT_NAME)
+
+# Bump whenever EXTRACTION_PROMPT or the image preparation changes so cached extractions are not reused
+PROMPT_VERSION = "v3"
+
+def extraction_cache_key(digest: str, doc_type_hint: str) -> str:
     """
-    Reads documents from Azure Blob Storage links provided in fnol_data.
-    Uses Azure OpenAI Vision to extract data.
+    Keys a document's extraction on every deployment that may produce it (the vision pool,
+    and the text pool when the text-layer path is on) and the pipeline toggles in effect.
     """
-    print("--- Document Reader Node ---")
-    
-    fnol_data = state.get("fnol_data", {})
-    documents = fnol_data.get("documents", [])
-    
-    if not documents:
-        print("ℹ️ No documents found to read.")
-        return {"document_data": {"status": "skipped", "reason": "no_documents"}}
-
-    def call_vision(image_url, doc_type_hint="unknown"):
-        try:
-            # Ensure URL has SAS token if it's Azure Blob
-            signed_url = ensure_azure_url_has_sas(image_url)
-            
-            # Check if it's a PDF. GPT-4o Vision does not support PDF URLs directly.
-            if signed_url.lower().split('?')[0].endswith('.pdf'):
-                print(f"📄 PDF Detected: {image_url}. Converting first page to image...")
-                pdf_resp = requests.get(signed_url)
-                pdf_resp.raise_for_status()
-                
-                # Open PDF from memory
-                doc = fitz.open(stream=pdf_resp.content, filetype="pdf")
-                if len(doc) == 0:
-                    raise Exception("Empty PDF document")
-                
-                page = doc[0]
-                # High resolution pixmap (Matrix 2.0 = 2x zoom) for better OCR
-                pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                img_bytes = pix.tobytes("jpg")
-                doc.close()
-                
-                base64_image = base64.b64encode(img_bytes).decode('utf-8')
-                image_data_url = f"data:image/jpeg;base64,{base64_image}"
-                print("✅ PDF conversion successful.")
-            else:
-                image_data_url = signed_url
+    deployments = azure_chat.signature(AZURE_DEPLOYMENT_NAME)
+    if TEXT_FAST_PATH_ENABLED and TEXT_LLM_ENABLED:
+        deployments += ";text:" + azure_chat.signature(TEXT_EXTRACTION_DEPLOYMENT)
+    variant = f"text={TEXT_FAST_PATH_ENABLED}/{TEXT_LLM_ENABLED};preprocess={IMAGE_PREPROCESSING_ENABLED}"
+    return make_cache_key_from_digest(digest, PROMPT_VERSION, deployments, doc_type_hint, variant)
 
-            prompt = f"""
+EXTRACTION_PROMPT = """
 You are a smart insurance claim document extraction assistant.
 1. **Analyze the image content** to identify the document type.
 2. The user labeled this as: '{doc_type_hint}'.
 3. Extract relevant fields based on the document type.
+4. Several images are pages of the same document; combine them into one extraction (e.g. totals on a later page).
 
 Typical fields for Claims:
 - Death Certificate: name of deceased, date of death, cause of death, registration number.
@@ -70,25 +61,165 @@ Return JSON only:
   "confidence": 0.0-1.0
 }}
 """
-            resp = azure_client.chat.completions.create(
+
+TEXT_EXTRACTION_PROMPT = """
+You are a smart insurance claim document extraction assistant.
+Below is the text layer of a document the user labeled as: '{doc_type_hint}'.
+Identify the document type and extract the relevant fields (same fields as for scanned documents:
+names, dates, amounts, registration / license / chassis numbers).
+
+Return JSON only:
+{{
+  "document_type": "Detected Type",
+  "extracted_data": {{ ...fields... }},
+  "confidence": 0.0-1.0
+}}
+
+Document text:
+{text}
+"""
+
+async def call_text_model(text, doc_type_hint):
+    with track_io("azure", "chat_completion.text"):
+        resp = await azure_chat.create(
+            model=TEXT_EXTRACTION_DEPLOYMENT,
+            slots=vision_semaphore,
+            messages=[{
+                "role": "user",
+                "content": TEXT_EXTRACTION_PROMPT.format(doc_type_hint=doc_type_hint, text=text[:TEXT_LLM_MAX_CHARS])
+            }],
+            max_tokens=1000,
+            temperature=0.0,
+            response_format={"type": "json_object"}
+        )
+    record_tokens(resp.usage, purpose="text")
+    return safe_parse_json(resp.choices[0].message.content)
+
+async def extract_from_text_layer(download, doc_type_hint):
+    """
+    Fast path for born-digital PDFs: regex extractors for known categories, otherwise a
+    text-only chat call. Returns None when the text layer is too thin or extraction fails,
+    so the caller falls back to vision.
+    """
+    text = await read_pdf_text(download)
+    if not has_usable_text(text):
+        return None
+
+    result = extract_with_regex(doc_type_hint, text)
+    if result is not None:
+        print(f"⚡ Text-layer extraction (regex) for {doc_type_hint}")
+        record_extraction_path("regex")
+        return result
+
+    if not TEXT_LLM_ENABLED:
+        return None
+    try:
+        result = await call_text_model(text, doc_type_hint)
+    except Exception as e:
+        logging.warning(f"Text-only extraction failed, falling back to vision: {e}")
+        return None
+    if "raw" in result or "error" in result:
+        return None
+    print(f"⚡ Text-layer extraction (text model) for {doc_type_hint}")
+    result["extraction_method"] = "text_llm"
+    record_extraction_path("text_llm")
+    return result
+
+async def call_vision(image_url, doc_type_hint="unknown"):
+    """
+    Download -> render -> Azure OpenAI Vision extraction for a single document.
+    PDFs with a usable text layer skip vision (see extract_from_text_layer); other
+    multi-page PDFs send their most relevant pages together in one request.
+    Results are cached by document content, so re-runs of the same upload cost no tokens.
+    Never raises: failures are returned as {"error": ...}.
+    """
+    try:
+        # Ensure URL has SAS token if it's Azure Blob
+        signed_url = ensure_azure_url_has_sas(image_url)
+
+        # Streamed into a bounded buffer and hashed on the way in
+        with await download_document(signed_url) as download:
+            cache_key = extraction_cache_key(download.digest, doc_type_hint)
+            cached = await get_cached_extraction(cache_key)
+            if cached is not None:
+                print(f"⚡ Extraction cache hit: {image_url}")
+                record_extraction_path("cache")
+                return cached
+
+            # Check if it's a PDF. GPT-4o Vision does not support PDF URLs directly.
+            if signed_url.lower().split('?')[0].endswith('.pdf'):
+                if TEXT_FAST_PATH_ENABLED:
+                    result = await extract_from_text_layer(download, doc_type_hint)
+                    if result is not None:
+                        await put_cached_extraction(cache_key, result)
+                        return result
+
+                print(f"📄 PDF Detected: {image_url}. Rendering selected pages...")
+                pages = await render_pdf(download, doc_type_hint)
+                images = [(to_data_url(prepared), prepared["detail"]) for _, prepared in pages]
+                print(f"✅ PDF conversion successful (pages {', '.join(str(number + 1) for number, _ in pages)}).")
+            else:
+                images = [(signed_url, "auto")]
+                if IMAGE_PREPROCESSING_ENABLED:
+                    try:
+                        prepared = await run_cpu_bound(preprocess_image_bytes, download.read_bytes(), doc_type_hint)
+                        images = [(to_data_url(prepared), prepared["detail"])]
+                    except Exception as e:
+                        # Formats Pillow can't decode are still passed to the model by URL
+                        logging.warning(f"Image preprocessing skipped for {image_url}: {e}")
+
+        with track_io("azure", "chat_completion.vision"):
+            resp = await vision_chat.create(
+                doc_type_hint,
                 model=AZURE_DEPLOYMENT_NAME,
+                slots=vision_semaphore,
                 messages=[{
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": image_data_url}}
+                        {"type": "text", "text": EXTRACTION_PROMPT.format(doc_type_hint=doc_type_hint)},
+                        *({"type": "image_url", "image_url": {"url": url, "detail": detail}} for url, detail in images)
                     ]
                 }],
                 max_tokens=1000,
                 temperature=0.0,
                 response_format={"type": "json_object"}
             )
-            return safe_parse_json(resp.choices[0].message.content)
-        except Exception as e:
-            logging.error(f"Error reading document {image_url}: {e}")
-            return {"error": str(e)}
+        record_tokens(resp.usage, purpose="vision")
+        result = safe_parse_json(resp.choices[0].message.content)
+        record_extraction_path("vision")
+        
+        if "raw" not in result and "error" not in result:
+            await put_cached_extraction(cache_key, result)
+        return result
+    except Exception as e:
+        logging.error(f"Error reading document {image_url}: {e}")
+        return {"error": str(e)}
 
-    results = {}
+async def document_reader_node(state: ClaimAgentState) -> Dict[str, Any]:
+    """
+    Reads documents from Azure Blob Storage links provided in fnol_data.
+    Uses Azure OpenAI Vision to extract data. Documents are extracted concurrently,
+    so node latency tracks the slowest document rather than the sum. Every upload is read:
+    proof verification and fraud check look at all of them, whatever the category.
+    """
+    print("--- Document Reader Node ---")
+    
+    fnol_data = state.get("fnol_data", {})
+    documents = fnol_data.get("documents", [])
+    
+    if not documents:
+        print("ℹ️ No documents found to read.")
+        return {"document_data": {"status": "skipped", "reason": "no_documents"}}
+
+    async def read_document(unique_key, filename, category, url):
+        return unique_key, {
+            "filename": filename,
+            "category": category,
+            "url": url,
+            "extraction": await call_vision(url, doc_type_hint=category)
+        }
+
+    tasks = []
     for idx, doc in enumerate(documents):
         filename = doc.get("filename", "unknown")
         url = doc.get("url")
@@ -99,15 +230,13 @@ Return JSON only:
         
         if url:
             print(f"📄 Reading document: {filename} ({category}) as {unique_key}")
-            results[unique_key] = {
-                "filename": filename,
-                "category": category,
-                "url": url,
-                "extraction": call_vision(url, doc_type_hint=category)
-            }
+            tasks.append(read_document(unique_key, filename, category, url))
         else:
             print(f"⚠️ No URL for document: {filename} at index {idx}")
 
+    # gather preserves submission order, so results keep the original document ordering
+    results = dict(await asyncio.gather(*tasks))
+
     res = {
         "document_data": {
             "status": "completed",
@@ -117,6 +246,6 @@ Return JSON only:
 
     # Sync to backend
     from app_server.utils.sync import sync_claim_state_to_backend
-    sync_claim_state_to_backend({**state, **res}, current_step="document_processing")
+    sync_claim_state_to_backend(state, current_step="document_processing", delta=res)
     
     return res
@@ -1,10 +1,11 @@
 from app_server.agent.state import ClaimAgentState
-from app_server.utils.mongodb_utils import get_claim_by_id
+from app_server.agent.claim_types import get_claim_type_profile
+from app_server.utils.mongodb_utils import aget_claim_by_id
 from typing import Dict, Any
 import datetime
 import logging
 
-def fnol_node(state: ClaimAgentState) -> Dict[str, Any]:
+async def fnol_node(state: ClaimAgentState) -> Dict[str, Any]:
     """
     First Notice of Loss (FNOL) Node.
     Ingests claim details and performs basic validation.
@@ -14,14 +15,16 @@ def fnol_node(state: ClaimAgentState) -> Dict[str, Any]:
     
     claim_id = state.get("claim_id")
     fnol_data = state.get("fnol_data", {})
+    fetched_from_db = False
     
     # If data is missing, fetch from MongoDB
     if not fnol_data and claim_id:
         print(f"FNOL data missing for {claim_id}. Fetching from MongoDB...")
-        fetched_data = get_claim_by_id(claim_id)
+        fetched_data = await aget_claim_by_id(claim_id)
         if fetched_data:
             print(f"Successfully fetched data for claim {claim_id}")
             fnol_data = fetched_data
+            fetched_from_db = True
         else:
             return {"decision": "Reject", "reasoning": [f"Could not find claim details for ID: {claim_id}"]}
     
@@ -94,13 +97,8 @@ def fnol_node(state: ClaimAgentState) -> Dict[str, Any]:
     documents = fnol_data.get("documents", [])
     provided_categories = {doc.get("category") for doc in documents if doc.get("category")}
     
-    mandatory_docs = {
-        "life": ["death-certificate", "bank-details"],
-        "car": ["claim-form", "rc-copy", "driving-license", "damage-photos"],
-        "health": ["claim-form", "hospital-bills", "discharge-summary"]
-    }
-    
-    missing_docs = [doc for doc in mandatory_docs.get(claim_type, []) if doc not in provided_categories]
+    mandatory_docs = get_claim_type_profile(claim_type)["mandatory_docs"]
+    missing_docs = [doc for doc in mandatory_docs if doc not in provided_categories]
     
     if missing_docs:
         return {
@@ -111,13 +109,15 @@ def fnol_node(state: ClaimAgentState) -> Dict[str, Any]:
     print(f"FNOL Schema & Documents Validated for {claim_type} Claim: {claim_id}")
     
     res = {
-        "fnol_data": fnol_data,
         "current_step": "fnol_complete",
         "reasoning": [f"Full schema for {claim_type} claim validated successfully. All required fields present."]
     }
+    # Only write fnol_data back when it was fetched here, so checkpoints don't re-store an unchanged copy
+    if fetched_from_db:
+        res["fnol_data"] = fnol_data
 
     # Sync to backend
     from app_server.utils.sync import sync_claim_state_to_backend
-    sync_claim_state_to_backend({**state, **res}, current_step="fnol_validation")
+    sync_claim_state_to_backend(state, current_step="fnol_validation", delta=res)
     
     return res
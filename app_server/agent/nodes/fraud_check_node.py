@@ -2,7 +2,7 @@ from app_server.agent.state import ClaimAgentState
 from typing import Dict, Any
 import random
 
-def fraud_check_node(state: ClaimAgentState) -> Dict[str, Any]:
+async def fraud_check_node(state: ClaimAgentState) -> Dict[str, Any]:
     """
     Analyzes claim for fraud markers.
     """
@@ -53,6 +53,6 @@ def fraud_check_node(state: ClaimAgentState) -> Dict[str, Any]:
 
     # Sync to backend
     from app_server.utils.sync import sync_claim_state_to_backend
-    sync_claim_state_to_backend({**state, **res}, current_step="fraud_check")
+    sync_claim_state_to_backend(state, current_step="fraud_check", delta=res)
 
     return res
@@ -1,9 +1,9 @@
 
 from app_server.agent.state import ClaimAgentState
-from app_server.utils.postgres_utils import fetch_policy_by_number
+from app_server.utils.policy_cache import get_policy
 from typing import Dict, Any
 
-def policy_verification_node(state: ClaimAgentState) -> Dict[str, Any]:
+async def policy_verification_node(state: ClaimAgentState) -> Dict[str, Any]:
     """
     Verifies policy existence and status in PostgreSQL.
     """
@@ -19,7 +19,7 @@ def policy_verification_node(state: ClaimAgentState) -> Dict[str, Any]:
         }
         
     print(f"🔍 Fetching policy details for: {policy_number}")
-    policy_data = fetch_policy_by_number(policy_number)
+    policy_data = await get_policy(policy_number)
     
     if not policy_data:
         return {
@@ -45,6 +45,6 @@ def policy_verification_node(state: ClaimAgentState) -> Dict[str, Any]:
 
     # Sync to backend
     from app_server.utils.sync import sync_claim_state_to_backend
-    sync_claim_state_to_backend({**state, **res}, current_step="policy_verification")
+    sync_claim_state_to_backend(state, current_step="policy_verification", delta=res)
 
     return res
@@ -3,7 +3,7 @@ from typing import Dict, Any
 from app_server.agent.state import ClaimAgentState
 from datetime import datetime
 
-def proof_verification_node(state: ClaimAgentState) -> Dict[str, Any]:
+async def proof_verification_node(state: ClaimAgentState) -> Dict[str, Any]:
     """
     Compares user-provided fnol_data with AI-extracted document_data.
     Acts as the 'Proof of Claim' verification engine.
@@ -72,6 +72,6 @@ def proof_verification_node(state: ClaimAgentState) -> Dict[str, Any]:
 
     # Sync to backend
     from app_server.utils.sync import sync_claim_state_to_backend
-    sync_claim_state_to_backend({**state, **res}, current_step="proof_verification")
+    sync_claim_state_to_backend(state, current_step="proof_verification", delta=res)
 
     return res
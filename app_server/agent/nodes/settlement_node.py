@@ -1,7 +1,7 @@
 from app_server.agent.state import ClaimAgentState
 from typing import Dict, Any
 
-def settlement_node(state: ClaimAgentState) -> Dict[str, Any]:
+async def settlement_node(state: ClaimAgentState) -> Dict[str, Any]:
     """
     Calculates final settlement and makes decision.
     """
@@ -66,6 +66,6 @@ def settlement_node(state: ClaimAgentState) -> Dict[str, Any]:
 
     # Sync to backend
     from app_server.utils.sync import sync_claim_state_to_backend
-    sync_claim_state_to_backend({**state, **res}, current_step="settlement_complete")
+    sync_claim_state_to_backend(state, current_step="settlement_complete", delta=res)
 
     return res
@@ -0,0 +1,150 @@
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Dict
+from app_server.agent.claim_graph import SUBGRAPH_NODES, claim_graph, compile_claim_graph
+from app_server.agent.checkpointing import ChannelBlobMongoDBSaver
+from app_server.utils.mongodb_utils import client as mongo_client, DB_NAME
+from app_server.utils.events import event_bus
+from app_server.utils.sync import sync_manager
+from app_server.utils.tracing import tracer
+
+# Durable checkpointing: each claim is a LangGraph thread (thread_id = claim_id)
+CHECKPOINTING_ENABLED = os.getenv("CHECKPOINTING_ENABLED", "true").lower() == "true"
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_checkpointer = None
+_graph = claim_graph
+
+async def init_checkpointing():
+    """
+    Builds the Mongo checkpointer (it creates its indexes on construction) and recompiles
+    the graph with it. Falls back to the un-checkpointed graph if Mongo is unavailable.
+    """
+    global _checkpointer, _graph
+    if not CHECKPOINTING_ENABLED or _checkpointer is not None:
+        return
+    try:
+        _checkpointer = await asyncio.to_thread(
+            ChannelBlobMongoDBSaver,
+            mongo_client,
+            DB_NAME,
+            checkpoint_collection_name="claim_checkpoints",
+            writes_collection_name="claim_checkpoint_writes",
+            blobs_collection_name="claim_checkpoint_blobs",
+            ttl=CHECKPOINT_TTL_SECONDS,
+        )
+        _graph = compile_claim_graph(_checkpointer)
+        logging.info("Claim graph checkpointing enabled.")
+    except Exception as e:
+        logging.warning(f"Checkpointing disabled, could not initialise Mongo checkpointer: {e}")
+        _checkpointer = None
+
+def get_claim_graph():
+    return _graph
+
+def thread_config(claim_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": claim_id}}
+
+def build_initial_state(claim: dict) -> dict:
+    return {
+        "claim_id": claim.get("claim_id"),
+        "policy_id": claim.get("policy_id"),
+        "fnol_data": claim.get("fnol_data", {}),
+        "reasoning": []
+    }
+
+async def get_pending_run(claim_id: str):
+    """
+    Returns the checkpointed snapshot if the claim has an unfinished run, otherwise None.
+    """
+    if _checkpointer is None:
+        return None
+    snapshot = await _graph.aget_state(thread_config(claim_id))
+    return snapshot if snapshot.next else None
+
+async def _execute(claim_id: str, graph_input, config) -> dict:
+    """
+    Runs the graph via astream, publishing a node-completion event (node name, state delta,
+    timings) to the event bus as each node finishes. Returns the final state.
+    """
+    with tracer.start_as_current_span("claim.run", attributes={"claim.id": claim_id or "", "claim.resumed": graph_input is None}) as span:
+        final_state = await _stream_graph(claim_id, graph_input, config)
+        span.set_attribute("claim.decision", final_state.get("decision") or "")
+        return final_state
+
+async def _stream_graph(claim_id: str, graph_input, config) -> dict:
+    started = time.perf_counter()
+    last = started
+    final_state = {}
+    if graph_input is not None:
+        # A fresh run: don't merge its syncs into what an earlier run of the claim sent
+        sync_manager.reset(claim_id)
+    event_bus.publish(claim_id, {"event": "started", "claim_id": claim_id, "resumed": graph_input is None})
+    # Tells this run's parallel branches apart from another run of the same claim (see BranchGroup)
+    config = {**config, "configurable": {**config.get("configurable", {}), "run_id": uuid.uuid4().hex}}
+    try:
+        # subgraphs=True streams the nodes inside the claim type's subgraph as they finish
+        async for namespace, mode, chunk in _graph.astream(graph_input, config, stream_mode=["updates", "values"], subgraphs=True):
+            if mode == "values":
+                if not namespace:
+                    final_state = chunk
+                continue
+            now = time.perf_counter()
+            for node, delta in chunk.items():
+                if delta is None or (not namespace and node in SUBGRAPH_NODES):
+                    continue  # join nodes write nothing; a subgraph's own update repeats its nodes'
+                event_bus.publish(claim_id, {
+                    "event": "node",
+                    "claim_id": claim_id,
+                    "node": node,
+                    "delta": delta,
+                    "step_ms": round((now - last) * 1000, 2),
+                    "elapsed_ms": round((now - started) * 1000, 2),
+                })
+            last = now
+    except Exception as e:
+        event_bus.publish(claim_id, {"event": "failed", "claim_id": claim_id, "error": str(e)})
+        raise
+
+    event_bus.publish(claim_id, {
+        "event": "completed",
+        "claim_id": claim_id,
+        "decision": final_state.get("decision"),
+        "settlement_amount": final_state.get("settlement_amount"),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    })
+    return final_state
+
+async def run_claim(claim: dict, thread_id: str = None) -> dict:
+    """
+    Runs a claim through the graph. If an earlier run of the same claim stopped part-way
+    (crash, error in a node), it resumes from the last completed node instead of restarting.
+    thread_id defaults to the claim_id; batch re-processing passes its own so it never
+    touches the claim's live checkpoints.
+    """
+    claim_id = claim.get("claim_id")
+    if _checkpointer is None:
+        return await _execute(claim_id, build_initial_state(claim), {})
+
+    thread_id = thread_id or claim_id
+    config = thread_config(thread_id)
+    snapshot = await _graph.aget_state(config)
+    if snapshot.next:
+        logging.info(f"Resuming claim {claim_id} at {', '.join(snapshot.next)}")
+        return await _execute(claim_id, None, config)
+    if snapshot.values:
+        # Previous run finished: start over on a clean thread
+        await _checkpointer.adelete_thread(thread_id)
+    return await _execute(claim_id, build_initial_state(claim), config)
+
+async def resume_claim(claim_id: str) -> dict:
+    """
+    Resumes an unfinished run. Raises LookupError if there is nothing to resume.
+    """
+    if await get_pending_run(claim_id) is None:
+        raise LookupError(f"No unfinished run for claim {claim_id}")
+    logging.info(f"Resuming claim {claim_id}")
+    return await _execute(claim_id, None, thread_config(claim_id))
@@ -2,6 +2,20 @@ from typing import TypedDict, List, Optional, Any, Dict
 import operator
 from typing import Annotated
 
+def merge_node_metrics(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    return {**(left or {}), **(right or {})}
+
+DECISION_SEVERITY = {"Approve": 0, "Investigate": 1, "Reject": 2}
+
+def merge_decision(left: Optional[str], right: Optional[str]) -> Optional[str]:
+    # Parallel branches can decide in the same step; the more severe decision wins. Nodes
+    # only ever escalate a decision, so this matches running them one after another.
+    if left is None:
+        return right
+    if right is None:
+        return left
+    return right if DECISION_SEVERITY.get(right, 0) >= DECISION_SEVERITY.get(left, 0) else left
+
 class ClaimAgentState(TypedDict):
     # Inputs
     claim_id: str
@@ -15,7 +29,7 @@ class ClaimAgentState(TypedDict):
     
     # Decisions
     settlement_amount: float
-    decision: str  # "Approve", "Reject", "Investigate"
+    decision: Annotated[str, merge_decision]  # "Approve", "Reject", "Investigate"
     reasoning: Annotated[List[str], operator.add]
     
     # Checkpointing
@@ -25,3 +39,6 @@ class ClaimAgentState(TypedDict):
     document_data: Dict[str, Any] # results from document_reader_node
     proof_verified: bool  # Whether document matches user input
     policy_sql_data: Dict[str, Any] # Data fetched from PostgreSQL Policy table
+
+    # Instrumentation: node name -> wall time, I/O by backend, tokens, cache hits
+    node_metrics: Annotated[Dict[str, Any], merge_node_metrics]
@@ -1,21 +1,125 @@
-from fastapi import FastAPI, Body, HTTPException
-from app_server.agent.claim_graph import claim_graph
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Body, HTTPException, Query
+from fastapi.responses import StreamingResponse, Response
+from app_server.agent.runner import init_checkpointing, run_claim, resume_claim
+from app_server.utils.clients import azure_chat, vision_chat, close_clients
+from app_server.utils.extraction_cache import ensure_extraction_cache_indexes, cache_stats as extraction_cache_stats
+from app_server.utils.text_extractors import get_extraction_path_stats
+from app_server.utils.metrics import render_metrics
+from app_server.utils.serialization import FastJSONResponse, project
+from app_server.utils.tracing import init_tracing, shutdown_tracing, tracer
+from app_server.utils.mongodb_utils import ensure_claim_indexes, aget_claim_by_id
+from app_server.utils.sync import sync_manager
+from app_server.utils.events import event_bus, format_sse, sse_events
+from app_server.utils.postgres_utils import close_pool
+from app_server.utils.pdf_pipeline import shutdown_render_pool
+from app_server.utils.policy_cache import start_policy_listener, stop_policy_listener, invalidate_policy, get_policy_cache_stats
+from app_server.jobs.queue import QueueFullError, ensure_job_indexes, enqueue_claim, get_job, get_queue_depth
+from app_server.jobs.worker import JobWorkerPool
 import logging
+import os
 import sys
 
 # Logging Setup
 logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 
-app = FastAPI(title="Insurance Claim Agent")
+# Job queue consumers run inside the API process when > 0 (otherwise use `python -m app_server.jobs.worker`)
+JOB_WORKERS_IN_PROCESS = int(os.getenv("JOB_WORKERS_IN_PROCESS", "0"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_tracing()
+    await ensure_claim_indexes()
+    await ensure_extraction_cache_indexes()
+    await ensure_job_indexes()
+    await start_policy_listener()
+    await init_checkpointing()
+    job_workers = None
+    if JOB_WORKERS_IN_PROCESS > 0:
+        job_workers = JobWorkerPool(JOB_WORKERS_IN_PROCESS)
+        job_workers.start()
+    yield
+    if job_workers:
+        await job_workers.stop()
+    await stop_policy_listener()
+    # Flush queued backend syncs before the HTTP client goes away
+    await sync_manager.close()
+    # Release pooled HTTP / Mongo / Azure / Postgres connections
+    await close_clients()
+    await close_pool()
+    shutdown_render_pool()
+    shutdown_tracing()
+
+app = FastAPI(title="Insurance Claim Agent", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 @app.get("/")
 def home():
     return {"status": "Claim Agent is Running", "port": 8002}
 
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus scrape endpoint: per-node wall time and I/O by backend, token usage, cache hits.
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/policies/cache/stats")
+def policy_cache_stats():
+    return get_policy_cache_stats()
+
+@app.get("/documents/extraction/stats")
+def document_extraction_stats():
+    """
+    How documents were read (cache / regex / text model / vision) and the share that avoided vision.
+    """
+    return {"paths": get_extraction_path_stats(), "cache": extraction_cache_stats}
+
+@app.get("/azure/stats")
+def azure_stats():
+    """
+    Per-deployment Azure OpenAI routing: latency and error averages, quota headroom, throttled,
+    retried and queued calls, circuit breaker state. Plus vision latency by category and hedging.
+    """
+    return {**azure_chat.get_stats(), "vision": vision_chat.get_stats()}
+
+@app.post("/policies/{policy_number}/invalidate")
+def invalidate_cached_policy(policy_number: str):
+    """
+    Drop a policy from the read-through cache (e.g. after a status change to non-Active).
+    """
+    invalidate_policy(policy_number)
+    return {"status": "invalidated", "policy_number": policy_number}
+
+def _claim_response(claim_id: str, final_state: dict, fields: str = None, full_state: bool = False) -> FastJSONResponse:
+    """
+    Compact summary of a finished run. fields= adds selected state fields (comma-separated,
+    dotted paths allowed) under "state"; full_state=true adds the whole state.
+    """
+    response = {
+        "status": "completed",
+        "claim_id": claim_id,
+        "decision": final_state.get("decision"),
+        "settlement_amount": final_state.get("settlement_amount"),
+        "current_step": final_state.get("current_step"),
+        "proof_verified": final_state.get("proof_verified"),
+        "reasoning": final_state.get("reasoning"),
+    }
+    if fields:
+        response["state"] = project(final_state, [field.strip() for field in fields.split(",") if field.strip()])
+    if full_state:
+        response["full_state"] = final_state
+    return FastJSONResponse(response)
+
+FIELDS_QUERY = Query(None, description="Comma-separated state fields to include, e.g. fraud_risk,document_data.results")
+FULL_STATE_QUERY = Query(False, description="Include the complete final state")
+
 @app.post("/submit_claim")
-async def submit_claim(claim: dict = Body(...)):
+async def submit_claim(claim: dict = Body(...), fields: str = FIELDS_QUERY, full_state: bool = FULL_STATE_QUERY):
     """
-    Trigger the Claims Processing Workflow
+    Trigger the Claims Processing Workflow.
+    If a previous run of this claim stopped part-way, it resumes from the last completed node.
     """
     claim_id = claim.get("claim_id")
     if not claim_id:
@@ -23,30 +127,120 @@ async def submit_claim(claim: dict = Body(...)):
         
     logging.info(f"Processing Claim ID: {claim_id}")
     
-    # Initial State
-    initial_state = {
-        "claim_id": claim_id,
-        "policy_id": claim.get("policy_id"),
-        "fnol_data": claim.get("fnol_data", {}),
-        "reasoning": []
-    }
-    
+    # Root of the claim's trace: claim.run -> node.* -> external calls
+    with tracer.start_as_current_span("POST /submit_claim", attributes={"claim.id": claim_id}) as span:
+        try:
+            # Run Graph
+            final_state = await run_claim(claim)
+            span.set_attribute("claim.decision", final_state.get("decision") or "")
+            return _claim_response(claim_id, final_state, fields, full_state)
+        except Exception as e:
+            logging.error(f"Error processing claim: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/claims/{claim_id}/resume")
+async def resume_claim_endpoint(claim_id: str, fields: str = FIELDS_QUERY, full_state: bool = FULL_STATE_QUERY):
+    """
+    Resume an unfinished (crashed / failed) claim run from its last checkpoint.
+    """
     try:
-        # Run Graph
-        final_state = await claim_graph.ainvoke(initial_state)
-        
-        return {
-            "status": "completed",
-            "claim_id": claim_id,
-            "decision": final_state.get("decision"),
-            "settlement_amount": final_state.get("settlement_amount"),
-            "reasoning": final_state.get("reasoning"),
-            "full_state": final_state
-        }
+        final_state = await resume_claim(claim_id)
+        return _claim_response(claim_id, final_state, fields, full_state)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logging.error(f"Error processing claim: {e}")
+        logging.error(f"Error resuming claim: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Strong references to background claim runs started by the streaming endpoint
+_background_runs = set()
+
+async def _run_in_background(claim: dict):
+    try:
+        await run_claim(claim)
+    except Exception as e:
+        logging.error(f"Error processing claim: {e}")
+
+@app.post("/submit_claim/stream")
+async def submit_claim_stream(claim: dict = Body(...)):
+    """
+    Start the Claims Processing Workflow and stream progress as Server-Sent Events:
+    'started', one 'node' event per completed node (name, state delta, timings),
+    then 'completed' or 'failed'. The run continues even if the client disconnects.
+    """
+    claim_id = claim.get("claim_id")
+    if not claim_id:
+        raise HTTPException(status_code=400, detail="claim_id is required")
+
+    logging.info(f"Processing Claim ID (streaming): {claim_id}")
+    queue = event_bus.subscribe(claim_id)
+    task = asyncio.create_task(_run_in_background(claim))
+    _background_runs.add(task)
+    task.add_done_callback(_background_runs.discard)
+
+    return StreamingResponse(sse_events(claim_id, queue), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/claims/{claim_id}/events")
+async def claim_events(claim_id: str):
+    """
+    Live view: Server-Sent Events for a claim that is currently being processed. A claim that
+    isn't running gets a single 'status' event with its stored status; an unknown claim 404s.
+    """
+    queue = event_bus.subscribe(claim_id)
+    if not event_bus.is_active(claim_id):
+        event_bus.unsubscribe(claim_id, queue)
+        claim = await aget_claim_by_id(claim_id, {"claim_id": 1, "status": 1})
+        if claim is None:
+            raise HTTPException(status_code=404, detail=f"Claim {claim_id} not found")
+        event = {"event": "status", "claim_id": claim_id, "status": claim.get("status"), "running": False}
+        return StreamingResponse(iter([format_sse(event)]), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return StreamingResponse(sse_events(claim_id, queue), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/jobs", status_code=202)
+async def submit_job(claim: dict = Body(...)):
+    """
+    Queue a claim for asynchronous processing and return a job id to poll.
+    Responds 429 when the queue is full.
+    """
+    claim_id = claim.get("claim_id")
+    if not claim_id:
+        raise HTTPException(status_code=400, detail="claim_id is required")
+
+    try:
+        job = await enqueue_claim(claim)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+
+    logging.info(f"Queued Claim ID {claim_id} as job {job['_id']}")
+    return {"job_id": job["_id"], "claim_id": claim_id, "status": job["status"], "priority": job["priority"]}
+
+@app.get("/jobs/stats")
+async def job_queue_stats():
+    return await get_queue_depth()
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Poll a queued claim: queued -> running -> completed / failed. Completed jobs include the decision.
+    """
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {
+        "job_id": job["_id"],
+        "claim_id": job.get("claim_id"),
+        "status": job["status"],
+        "attempts": job.get("attempts", 0),
+        "enqueued_at": job.get("enqueued_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8002)
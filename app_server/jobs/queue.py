@@ -0,0 +1,131 @@
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, ReturnDocument
+from app_server.utils.mongodb_utils import async_db
+
+# Submit-and-poll job queue backed by the existing Mongo database (no external broker)
+JOB_QUEUE_COLLECTION = os.getenv("JOB_QUEUE_COLLECTION", "claim_jobs")
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", "10000"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+
+# Lower value = picked up first
+JOB_PRIORITY_BY_CLAIM_TYPE = {"life": 0, "health": 1, "car": 2}
+JOB_DEFAULT_PRIORITY = 5
+
+jobs_collection = async_db[JOB_QUEUE_COLLECTION]
+
+class QueueFullError(Exception):
+    """Raised when the queue is at JOB_QUEUE_MAX_DEPTH (backpressure)."""
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def priority_for_claim(claim: dict) -> int:
+    claim_type = (claim.get("fnol_data") or {}).get("claim_type") or claim.get("claim_type")
+    return JOB_PRIORITY_BY_CLAIM_TYPE.get(claim_type, JOB_DEFAULT_PRIORITY)
+
+async def ensure_job_indexes():
+    """
+    Indexes for priority-ordered dequeue and expired-lease recovery. Called at startup.
+    """
+    try:
+        await jobs_collection.create_index([("status", ASCENDING), ("priority", ASCENDING), ("enqueued_at", ASCENDING)])
+        await jobs_collection.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+        await jobs_collection.create_index([("claim_id", ASCENDING)])
+    except Exception as e:
+        logging.warning(f"Could not create job queue indexes: {e}")
+
+async def enqueue_claim(claim: dict, priority: int = None) -> dict:
+    """
+    Queues a claim for processing and returns the job document.
+    Raises QueueFullError when the number of queued jobs has reached JOB_QUEUE_MAX_DEPTH.
+    """
+    if await jobs_collection.count_documents({"status": "queued"}, limit=JOB_QUEUE_MAX_DEPTH) >= JOB_QUEUE_MAX_DEPTH:
+        raise QueueFullError(f"Job queue is full ({JOB_QUEUE_MAX_DEPTH} queued)")
+
+    job = {
+        "_id": uuid.uuid4().hex,
+        "claim_id": claim.get("claim_id"),
+        "claim": claim,
+        "priority": priority_for_claim(claim) if priority is None else priority,
+        "status": "queued",
+        "attempts": 0,
+        "enqueued_at": _now(),
+    }
+    await jobs_collection.insert_one(job)
+    return job
+
+async def claim_next_job(worker_id: str):
+    """
+    Atomically takes the highest-priority queued job (or one whose lease expired because
+    its worker died) and marks it running under this worker's lease. Expired jobs that have
+    used up JOB_MAX_ATTEMPTS are failed instead, so a claim that kills its worker isn't
+    retried forever.
+    """
+    now = _now()
+    await jobs_collection.update_many(
+        {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": JOB_MAX_ATTEMPTS}},
+        {"$set": {"status": "failed", "error": "Lease expired: worker lost on the last attempt", "finished_at": now},
+         "$unset": {"lease_expires_at": ""}}
+    )
+    return await jobs_collection.find_one_and_update(
+        {"$or": [
+            {"status": "queued"},
+            {"status": "running", "lease_expires_at": {"$lt": now}, "attempts": {"$lt": JOB_MAX_ATTEMPTS}},
+        ]},
+        {
+            "$set": {
+                "status": "running",
+                "worker_id": worker_id,
+                "started_at": now,
+                "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority", ASCENDING), ("enqueued_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+async def renew_lease(job_id: str, worker_id: str):
+    await jobs_collection.update_one(
+        {"_id": job_id, "worker_id": worker_id, "status": "running"},
+        {"$set": {"lease_expires_at": _now() + timedelta(seconds=JOB_LEASE_SECONDS)}}
+    )
+
+def _owned(job_id: str, worker_id: str) -> dict:
+    # Only the worker holding the lease may finish a job; after a reclaim the old one can't
+    return {"_id": job_id, "worker_id": worker_id, "status": "running"}
+
+async def complete_job(job_id: str, worker_id: str, result: dict) -> bool:
+    """
+    Returns False if the job's lease was lost to another worker (nothing is written).
+    """
+    res = await jobs_collection.update_one(
+        _owned(job_id, worker_id),
+        {"$set": {"status": "completed", "result": result, "finished_at": _now()}, "$unset": {"lease_expires_at": ""}}
+    )
+    return res.matched_count > 0
+
+async def fail_job(job_id: str, worker_id: str, error: str, attempts: int) -> bool:
+    """
+    Re-queues the job for another attempt, or marks it failed once JOB_MAX_ATTEMPTS is reached.
+    Returns False if the job's lease was lost to another worker.
+    """
+    if attempts < JOB_MAX_ATTEMPTS:
+        update = {"$set": {"status": "queued", "error": error}, "$unset": {"lease_expires_at": "", "worker_id": ""}}
+    else:
+        update = {"$set": {"status": "failed", "error": error, "finished_at": _now()}, "$unset": {"lease_expires_at": ""}}
+    res = await jobs_collection.update_one(_owned(job_id, worker_id), update)
+    return res.matched_count > 0
+
+async def get_job(job_id: str):
+    return await jobs_collection.find_one({"_id": job_id}, {"claim": 0})
+
+async def get_queue_depth() -> dict:
+    return {
+        status: await jobs_collection.count_documents({"status": status})
+        for status in ("queued", "running")
+    }
@@ -0,0 +1,162 @@
+"""
+Job queue workers: drain claim_jobs and run each claim through the graph.
+
+    python -m app_server.jobs.worker --processes 4 --concurrency 25
+
+Each process runs `concurrency` async consumers. Workers can also run inside the API
+process by setting JOB_WORKERS_IN_PROCESS to the desired concurrency.
+"""
+import os
+import signal
+import socket
+import asyncio
+import logging
+import argparse
+import multiprocessing
+from app_server.agent.runner import init_checkpointing, run_claim
+from app_server.jobs.queue import (
+    JOB_LEASE_SECONDS,
+    ensure_job_indexes,
+    claim_next_job,
+    renew_lease,
+    complete_job,
+    fail_job,
+)
+
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "0.5"))
+
+def summarize_result(final_state: dict) -> dict:
+    return {
+        "decision": final_state.get("decision"),
+        "settlement_amount": final_state.get("settlement_amount"),
+        "reasoning": final_state.get("reasoning"),
+    }
+
+class JobWorkerPool:
+    """
+    `concurrency` async consumers in one process, each taking one job at a time.
+    """
+
+    def __init__(self, concurrency: int, worker_id: str = None):
+        self.concurrency = concurrency
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        for idx in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._consume(f"{self.worker_id}:{idx}")))
+        logging.info(f"Started {self.concurrency} job consumers ({self.worker_id})")
+
+    async def stop(self):
+        """
+        Stops taking new jobs and waits for in-flight ones to finish.
+        """
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _consume(self, consumer_id: str):
+        while not self._stopping.is_set():
+            try:
+                job = await claim_next_job(consumer_id)
+            except Exception as e:
+                logging.warning(f"Could not poll job queue: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=JOB_POLL_INTERVAL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(consumer_id, job)
+
+    async def _process(self, consumer_id: str, job: dict):
+        job_id = job["_id"]
+        logging.info(f"Job {job_id}: processing claim {job.get('claim_id')} (attempt {job['attempts']})")
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, consumer_id))
+        try:
+            final_state = await run_claim(job["claim"])
+            finished = await complete_job(job_id, consumer_id, summarize_result(final_state))
+        except Exception as e:
+            logging.error(f"Job {job_id} failed: {e}")
+            try:
+                finished = await fail_job(job_id, consumer_id, str(e), job["attempts"])
+            except Exception as bookkeeping_error:
+                # The job stays running under our lease; once the heartbeat stops it expires
+                # and another worker picks the job up again
+                logging.error(f"Job {job_id}: could not record the failure, left to lease expiry: {bookkeeping_error}")
+                return
+        finally:
+            heartbeat.cancel()
+        if not finished:
+            logging.warning(f"Job {job_id}: lease lost to another worker, result discarded")
+
+    async def _heartbeat(self, job_id: str, consumer_id: str):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await renew_lease(job_id, consumer_id)
+            except Exception as e:
+                logging.warning(f"Could not renew lease for job {job_id}: {e}")
+
+async def serve(concurrency: int):
+    """
+    Runs a worker pool until SIGINT/SIGTERM, then drains in-flight jobs and flushes syncs.
+    """
+    from app_server.utils.clients import close_clients
+    from app_server.utils.postgres_utils import close_pool
+    from app_server.utils.sync import sync_manager
+    from app_server.utils.tracing import init_tracing, shutdown_tracing
+
+    init_tracing()
+    await ensure_job_indexes()
+    await init_checkpointing()
+    pool = JobWorkerPool(concurrency)
+    pool.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logging.info("Shutting down job workers...")
+    await pool.stop()
+    await sync_manager.close()
+    await close_clients()
+    await close_pool()
+    shutdown_tracing()
+
+def _run_process(concurrency: int):
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(serve(concurrency))
+
+def main():
+    parser = argparse.ArgumentParser(description="Claim job queue workers")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("JOB_WORKER_PROCESSES", "1")))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("JOB_WORKER_CONCURRENCY", "20")))
+    args = parser.parse_args()
+
+    if args.processes <= 1:
+        _run_process(args.concurrency)
+        return
+
+    # Spawn, not fork: the Mongo, HTTP and Azure clients are created at import time and
+    # pymongo clients must not be shared across a fork; each child builds its own
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_run_process, args=(args.concurrency,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+if __name__ == "__main__":
+    main()
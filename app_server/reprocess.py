@@ -0,0 +1,216 @@
+"""
+Bulk re-processing of historical claims, e.g. after a rules change.
+
+    python -m app_server.reprocess --status approved --claim-type health --since 2025-01-01 \
+        --concurrency 20 --output reprocess_results.jsonl
+
+Claims are streamed from the Mongo claims collection with a cursor and run through the
+claim graph in parallel; the policies of each window of claims are fetched from Postgres
+with one query up front. Each finished claim is appended to the results JSONL and its id
+to a checkpoint file; re-running the same command skips claims that already succeeded.
+Backend syncing is off unless --sync is given, so historical runs don't overwrite the
+Admin panel. Throughput and per-node timings are printed at the end.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime
+from app_server.agent.runner import init_checkpointing, run_claim
+from app_server.utils.mongodb_utils import async_claims_collection, FNOL_PROJECTION
+from app_server.utils.policy_cache import get_policy_cache_stats, prefetch_policies
+from app_server.utils.sync import sync_manager
+from app_server.utils.tracing import init_tracing, shutdown_tracing
+
+REPROCESS_CURSOR_BATCH_SIZE = int(os.getenv("REPROCESS_CURSOR_BATCH_SIZE", "200"))
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def build_query(args) -> dict:
+    query = {}
+    if args.status:
+        query["status"] = {"$in": args.status}
+    if args.claim_type:
+        query["claim_type"] = {"$in": args.claim_type}
+    if args.since or args.until:
+        query["created_at"] = {}
+        if args.since:
+            query["created_at"]["$gte"] = datetime.fromisoformat(args.since)
+        if args.until:
+            query["created_at"]["$lt"] = datetime.fromisoformat(args.until)
+    return query
+
+def claim_id_of(doc: dict) -> str:
+    """
+    The claim's business id, with the same precedence as the _id / claim_id / id lookups.
+    """
+    return doc.get("claim_id") or doc.get("id") or str(doc["_id"])
+
+def load_checkpoint(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+class ReprocessRun:
+    """
+    Runs claims with bounded concurrency and records results, progress and timings.
+    """
+
+    def __init__(self, run_id: str, concurrency: int, results_file, checkpoint_file):
+        self.run_id = run_id
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.prefetch_size = concurrency
+        self.results_file = results_file
+        self.checkpoint_file = checkpoint_file
+        self.counts = Counter()
+        self.decisions = Counter()
+        self.node_ms = defaultdict(list)
+        self.claim_ms = []
+
+    async def process(self, doc: dict):
+        doc["_id"] = str(doc["_id"])
+        claim_id = claim_id_of(doc)
+        claim = {
+            "claim_id": claim_id,
+            "policy_id": doc.get("policy_id") or doc.get("policyId"),
+            "fnol_data": doc,
+        }
+
+        started = time.perf_counter()
+        record = {"claim_id": claim_id}
+        try:
+            # A run-specific thread keeps the claim's live checkpoints untouched and lets
+            # an interrupted batch resume half-finished claims
+            final_state = await run_claim(claim, thread_id=f"reprocess:{self.run_id}:{claim_id}")
+            record.update({
+                "decision": final_state.get("decision"),
+                "settlement_amount": final_state.get("settlement_amount"),
+                "reasoning": final_state.get("reasoning"),
+            })
+            # Every node that ran leaves its timing in the final state
+            for node, metrics in (final_state.get("node_metrics") or {}).items():
+                self.node_ms[node].append(metrics["wall_ms"])
+        except Exception as e:
+            logging.error(f"Error reprocessing claim {claim_id}: {e}")
+            record["error"] = str(e)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        record["elapsed_ms"] = round(elapsed_ms, 2)
+
+        self.results_file.write(json.dumps(record, default=str) + "\n")
+        self.results_file.flush()
+        if "error" in record:
+            self.counts["failed"] += 1
+        else:
+            self.checkpoint_file.write(claim_id + "\n")
+            self.checkpoint_file.flush()
+            self.counts["succeeded"] += 1
+            self.decisions[record["decision"]] += 1
+            self.claim_ms.append(elapsed_ms)
+        # Each finished claim advances the count once, so every hundred is printed once
+        processed = self.counts["succeeded"] + self.counts["failed"]
+        if processed % 100 == 0:
+            print(f"... {processed} claims processed")
+
+    async def run(self, cursor, done: set):
+        tasks = set()
+        window = []
+        async for doc in cursor:
+            # Checkpoints written before claim ids were used hold the ObjectId
+            if claim_id_of(doc) in done or str(doc["_id"]) in done:
+                self.counts["skipped"] += 1
+                continue
+            window.append(doc)
+            if len(window) >= self.prefetch_size:
+                await self._start(window, tasks)
+                window = []
+        if window:
+            await self._start(window, tasks)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _start(self, docs: list, tasks: set):
+        # One policy query per window instead of one per claim. A window is as large as the
+        # concurrency, so its claims start (and read the cache) well within POLICY_CACHE_TTL.
+        await prefetch_policies(doc.get("policyNumber") for doc in docs)
+        for doc in docs:
+            # Acquiring before creating the task also stops the cursor from running ahead
+            await self.semaphore.acquire()
+            task = asyncio.create_task(self.process(doc))
+            tasks.add(task)
+            task.add_done_callback(lambda t: (tasks.discard(t), self.semaphore.release()))
+
+    def report(self, wall: float):
+        processed = self.counts["succeeded"] + self.counts["failed"]
+        print("\n--- Reprocessing Report ---")
+        print(f"processed={processed} succeeded={self.counts['succeeded']} failed={self.counts['failed']} "
+              f"skipped(checkpoint)={self.counts['skipped']}")
+        print(f"wall={wall:.2f}s throughput={processed / wall if wall else 0:.2f} claims/s")
+        if self.claim_ms:
+            print(f"per claim: p50={percentile(self.claim_ms, 50):.1f}ms p95={percentile(self.claim_ms, 95):.1f}ms "
+                  f"p99={percentile(self.claim_ms, 99):.1f}ms")
+        policy_stats = get_policy_cache_stats()
+        print(f"policies: prefetched={policy_stats['prefetched']} cache hits={policy_stats['hits'] + policy_stats['negative_hits']} "
+              f"lookups={policy_stats['misses']}")
+        if self.decisions:
+            print("decisions: " + ", ".join(f"{decision}={count}" for decision, count in self.decisions.most_common()))
+        if self.node_ms:
+            print(f"{'node':<28}{'n':>7}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+            for node, values in self.node_ms.items():
+                print(f"{node:<28}{len(values):>7}{sum(values) / len(values):>9.1f}ms{percentile(values, 50):>8.1f}ms"
+                      f"{percentile(values, 95):>8.1f}ms{percentile(values, 99):>8.1f}ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="append", help="claim status to include (repeatable)")
+    parser.add_argument("--claim-type", action="append", help="claim_type to include (repeatable)")
+    parser.add_argument("--since", help="created_at lower bound (ISO date, inclusive)")
+    parser.add_argument("--until", help="created_at upper bound (ISO date, exclusive)")
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--output", default="reprocess_results.jsonl")
+    parser.add_argument("--checkpoint", help="progress file (default: <output>.checkpoint)")
+    parser.add_argument("--run-id", help="checkpoint thread namespace (default: output file name)")
+    parser.add_argument("--sync", action="store_true", help="also sync results to the Admin backend")
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    run_id = args.run_id or os.path.splitext(os.path.basename(args.output))[0]
+    sync_manager.enabled = args.sync
+
+    init_tracing()
+    await init_checkpointing()
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        print(f"Resuming: {len(done)} claims already done according to {checkpoint_path}")
+
+    query = build_query(args)
+    print(f"--- Reprocessing claims matching {query} (concurrency={args.concurrency}) ---")
+    cursor = async_claims_collection.find(query, FNOL_PROJECTION, batch_size=REPROCESS_CURSOR_BATCH_SIZE).sort("_id", 1)
+    if args.limit:
+        cursor = cursor.limit(args.limit)
+
+    from app_server.utils.clients import close_clients
+    from app_server.utils.postgres_utils import close_pool
+
+    started = time.perf_counter()
+    with open(args.output, "a") as results_file, open(checkpoint_path, "a") as checkpoint_file:
+        batch = ReprocessRun(run_id, args.concurrency, results_file, checkpoint_file)
+        try:
+            await batch.run(cursor, done)
+        finally:
+            batch.report(time.perf_counter() - started)
+            await sync_manager.close()
+            await close_clients()
+            await close_pool()
+            shutdown_tracing()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main())
@@ -0,0 +1,262 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import contextlib
+import openai
+from opentelemetry import trace
+from app_server.utils.metrics import azure_queue_wait_seconds, azure_retries_total, azure_circuit_open
+
+# Client-side view of each deployment's quota; 0 disables a limit. Set them to the deployment's
+# quota so bursts wait here instead of being answered with 429s.
+AZURE_RPM_LIMIT = int(os.getenv("AZURE_RPM_LIMIT", "0"))
+AZURE_TPM_LIMIT = int(os.getenv("AZURE_TPM_LIMIT", "0"))
+AZURE_MAX_RETRIES = int(os.getenv("AZURE_MAX_RETRIES", "6"))
+AZURE_RETRY_BASE_SECONDS = float(os.getenv("AZURE_RETRY_BASE_SECONDS", "0.5"))
+AZURE_RETRY_MAX_SECONDS = float(os.getenv("AZURE_RETRY_MAX_SECONDS", "30"))
+# Queueing + retries budget per request; after it the call fails and the document is unread
+AZURE_MAX_WAIT_SECONDS = float(os.getenv("AZURE_MAX_WAIT_SECONDS", "300"))
+# Consecutive 5xx / timeouts / connection errors that open the breaker, and how long it stays open
+AZURE_BREAKER_FAILURES = int(os.getenv("AZURE_BREAKER_FAILURES", "5"))
+AZURE_BREAKER_RESET_SECONDS = float(os.getenv("AZURE_BREAKER_RESET_SECONDS", "30"))
+
+# Token estimates before the call; Azure counts max_tokens against the TPM quota up front
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+class CircuitOpenError(Exception):
+    pass
+
+def estimate_tokens(kwargs: dict) -> int:
+    """
+    Rough prompt size (4 characters per token, fixed cost per image) plus max_tokens.
+    """
+    tokens = kwargs.get("max_tokens") or 0
+    for message in kwargs.get("messages", []):
+        content = message.get("content")
+        for part in content if isinstance(content, list) else [{"type": "text", "text": content or ""}]:
+            if part.get("type") == "image_url":
+                tokens += IMAGE_TOKENS.get(part["image_url"].get("detail", "auto"), 765)
+            else:
+                tokens += len(part.get("text", "")) // 4
+    return tokens
+
+def retry_after_seconds(error: Exception):
+    """
+    Server-requested delay from retry-after-ms / retry-after, or None.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = response.headers.get(header)
+        if value:
+            try:
+                return float(value) * scale
+            except ValueError:
+                pass  # HTTP-date form; fall back to backoff
+    return None
+
+class TokenBucket:
+    """
+    Refills per_minute units evenly over a minute and holds at most a minute's worth.
+    Waiters queue on a lock, so they are served in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        if self.rate <= 0:
+            return
+        # A request larger than the whole bucket waits for a full bucket instead of forever
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+    def refund(self, amount: float):
+        """
+        Returns (or, if negative, charges) the difference between the estimate and actual usage.
+        """
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failures. While open, callers wait; after
+    reset_seconds one probe call goes through and closes it again on success.
+    """
+
+    def __init__(self, name: str, failures: int = AZURE_BREAKER_FAILURES, reset_seconds: float = AZURE_BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._closed = asyncio.Event()
+        self._closed.set()
+
+    async def wait(self, deadline: float):
+        while True:
+            if self.state == "closed":
+                return
+            now = time.monotonic()
+            expired = self.state == "half_open" or now - self.opened_at >= self.reset_seconds
+            if expired and not self._probing:
+                self.state = "half_open"
+                self._probing = True
+                return
+            if now >= deadline:
+                raise CircuitOpenError(f"Azure deployment {self.name} is unavailable (circuit open)")
+            reopen_in = max(self.opened_at + self.reset_seconds - now, 0.05)
+            try:
+                await asyncio.wait_for(self._closed.wait(), timeout=min(reopen_in, deadline - now))
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self):
+        """
+        Ends a probe that neither succeeded nor failed (throttled, bad request, cancelled), so
+        the next caller probes instead.
+        """
+        self._probing = False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probing = False
+        if self.state != "closed":
+            logging.info(f"Azure deployment {self.name}: circuit closed")
+            self.state = "closed"
+            azure_circuit_open.labels(self.name).set(0)
+            self._closed.set()
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failures:
+            if self.state != "open":
+                logging.warning(f"Azure deployment {self.name}: circuit opened after {self.consecutive_failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._probing = False
+            azure_circuit_open.labels(self.name).set(1)
+            self._closed.clear()
+
+class DeploymentLimiter:
+    """
+    Quota, retries and circuit breaker for one deployment. call() waits for capacity, retries
+    429s (honoring Retry-After), timeouts and 5xx with jittered backoff, and only raises once
+    the retries or the wait budget run out, so throttling shows up as latency.
+    """
+
+    def __init__(self, name: str, rpm: int = AZURE_RPM_LIMIT, tpm: int = AZURE_TPM_LIMIT):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.breaker = CircuitBreaker(name)
+        # A 429 means the shared quota is spent: hold every caller, not just the one that got it
+        self.paused_until = 0.0
+        self.stats = {"requests": 0, "succeeded": 0, "failed": 0, "throttled": 0, "retries": 0,
+                      "queued": 0, "queue_wait_seconds": 0.0}
+
+    def headroom(self) -> float:
+        """
+        Share of the quota currently available (1.0 without limits, 0 while paused by a 429).
+        """
+        if self.paused_until > time.monotonic() or self.breaker.state == "open":
+            return 0.0
+        shares = []
+        for bucket in (self.requests, self.tokens):
+            if bucket.rate > 0:
+                bucket._refill()
+                shares.append(max(bucket.tokens, 0.0) / bucket.capacity)
+        return min(shares, default=1.0)
+
+    async def call(self, create, max_retries: int = None, slots: asyncio.Semaphore = None, **kwargs):
+        """
+        Calls create(**kwargs) within the quota. max_retries below AZURE_MAX_RETRIES lets a
+        router fail over to another deployment sooner. slots, if given, is held only while the
+        request is in flight, not while queueing for quota or backing off between retries.
+        """
+        max_retries = AZURE_MAX_RETRIES if max_retries is None else max_retries
+        deadline = time.monotonic() + AZURE_MAX_WAIT_SECONDS
+        estimate = estimate_tokens(kwargs)
+        self.stats["requests"] += 1
+        attempt = 0
+        while True:
+            queued_at = time.monotonic()
+            self.stats["queued"] += 1
+            try:
+                await self.breaker.wait(deadline)
+                now = time.monotonic()
+                if self.paused_until > now:
+                    await asyncio.sleep(max(min(self.paused_until, deadline) - now, 0))
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimate)
+            except CircuitOpenError:
+                self.stats["failed"] += 1
+                raise
+            finally:
+                self.stats["queued"] -= 1
+            waited = time.monotonic() - queued_at
+            self.stats["queue_wait_seconds"] += waited
+            azure_queue_wait_seconds.labels(self.name).observe(waited)
+
+            try:
+                async with slots or contextlib.nullcontext():
+                    resp = await create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                self.breaker.release()
+                reason = "throttled" if isinstance(e, openai.RateLimitError) else type(e).__name__
+                retry_after = retry_after_seconds(e)
+                if isinstance(e, openai.RateLimitError):
+                    self.stats["throttled"] += 1
+                    if retry_after:
+                        self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+                else:
+                    self.breaker.record_failure()
+                delay = (retry_after or 0.0) + random.uniform(0, min(AZURE_RETRY_MAX_SECONDS, AZURE_RETRY_BASE_SECONDS * 2 ** attempt))
+                attempt += 1
+                if attempt > max_retries or time.monotonic() + delay > deadline:
+                    self.stats["failed"] += 1
+                    raise
+                self.stats["retries"] += 1
+                azure_retries_total.labels(self.name, reason).inc()
+                trace.get_current_span().add_event("azure.retry", {"reason": reason, "attempt": attempt, "delay_s": delay})
+                logging.info(f"Azure deployment {self.name}: {reason}, retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                self.breaker.release()
+                self.stats["failed"] += 1
+                raise
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+
+            self.breaker.record_success()
+            self.stats["succeeded"] += 1
+            if getattr(resp, "usage", None) is not None and resp.usage.total_tokens:
+                self.tokens.refund(estimate - resp.usage.total_tokens)
+            return resp
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "circuit": self.breaker.state}
@@ -0,0 +1,138 @@
+import os
+import time
+import random
+import logging
+from opentelemetry import trace
+from app_server.utils.azure_limiter import AZURE_RPM_LIMIT, AZURE_TPM_LIMIT, RETRYABLE_ERRORS, CircuitOpenError, DeploymentLimiter
+
+# Weight of the newest sample in the latency / error-rate moving averages
+AZURE_ROUTER_EWMA_ALPHA = float(os.getenv("AZURE_ROUTER_EWMA_ALPHA", "0.2"))
+# Share of requests sent to a random healthy deployment, so a deployment that was slow once
+# gets measured again
+AZURE_ROUTER_EXPLORE_RATE = float(os.getenv("AZURE_ROUTER_EXPLORE_RATE", "0.05"))
+
+FAILOVER_ERRORS = (*RETRYABLE_ERRORS, CircuitOpenError)
+
+class Deployment:
+    """
+    One endpoint/deployment pair with its own quota limiter and moving averages of latency
+    and errors.
+    """
+
+    def __init__(self, name: str, client, deployment: str, model: str = None,
+                 rpm: int = AZURE_RPM_LIMIT, tpm: int = AZURE_TPM_LIMIT):
+        self.name = name
+        self.client = client
+        self.deployment = deployment
+        # Logical model requests ask for (AZURE_DEPLOYMENT_NAME); deployments of the same model are interchangeable
+        self.model = model or deployment
+        self.limiter = DeploymentLimiter(name, rpm=rpm, tpm=tpm)
+        self.ewma_latency = None
+        self.error_rate = 0.0
+        self.inflight = 0
+        self.routed = 0
+
+    def _observe(self, latency: float = None, failed: bool = False):
+        alpha = AZURE_ROUTER_EWMA_ALPHA
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * (1.0 if failed else 0.0)
+        if latency is not None:
+            self.ewma_latency = latency if self.ewma_latency is None else (1 - alpha) * self.ewma_latency + alpha * latency
+
+    async def call(self, kwargs: dict, max_retries: int = None, slots=None):
+        self.inflight += 1
+        self.routed += 1
+        start = time.monotonic()
+        try:
+            resp = await self.limiter.call(self.client.chat.completions.create, max_retries=max_retries,
+                                           slots=slots, **{**kwargs, "model": self.deployment})
+        except Exception:
+            self._observe(failed=True)
+            raise
+        finally:
+            self.inflight -= 1
+        self._observe(latency=time.monotonic() - start)
+        return resp
+
+    def get_stats(self) -> dict:
+        return {
+            "deployment": self.deployment,
+            "model": self.model,
+            "routed": self.routed,
+            "inflight": self.inflight,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 1) if self.ewma_latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "headroom": round(self.limiter.headroom(), 4),
+            **self.limiter.get_stats(),
+        }
+
+class DeploymentRouter:
+    """
+    Drop-in for client.chat.completions over a pool of deployments. Each request goes to the
+    deployment of its model with the lowest expected latency (EWMA latency, scaled by requests
+    in flight, recent errors and remaining quota). Throttling or failures fail over to the next
+    best deployment; the last one retries in full (see DeploymentLimiter).
+    """
+
+    def __init__(self, deployments: list):
+        self.deployments = list(deployments)
+        self.failovers = 0
+
+    def _pool(self, model: str) -> list:
+        pool = [d for d in self.deployments if d.model == model]
+        if not pool:
+            # A model no deployment serves (e.g. a separate text deployment) runs on the first endpoint
+            primary = self.deployments[0]
+            deployment = Deployment(f"{primary.name}/{model}", primary.client, model)
+            self.deployments.append(deployment)
+            pool = [deployment]
+        return pool
+
+    def signature(self, model: str) -> str:
+        """
+        The deployments that may answer requests for model; cached results are keyed on it,
+        so changing the pool doesn't serve another model's output.
+        """
+        return ",".join(sorted(f"{d.name}={d.deployment}" for d in self._pool(model)))
+
+    def _score(self, deployment: Deployment, prior: float) -> float:
+        latency = deployment.ewma_latency if deployment.ewma_latency is not None else prior
+        headroom = max(deployment.limiter.headroom(), 0.05)
+        return latency * (1 + deployment.inflight) * (1 + 4 * deployment.error_rate) / headroom
+
+    def pick(self, pool: list) -> Deployment:
+        healthy = [d for d in pool if d.limiter.headroom() > 0] or pool
+        if len(healthy) > 1 and random.random() < AZURE_ROUTER_EXPLORE_RATE:
+            return random.choice(healthy)
+        # Deployments without samples yet are scored as the fastest known one and win the tie,
+        # so they get tried
+        known = [d.ewma_latency for d in pool if d.ewma_latency is not None]
+        prior = min(known, default=1.0)
+        return min(healthy, key=lambda d: (self._score(d, prior), d.ewma_latency is not None))
+
+    async def create(self, avoid=(), route: list = None, slots=None, **kwargs):
+        """
+        avoid: deployment names to use only if nothing else serves the model (e.g. where the
+        request being hedged went). route, if given, collects the names of the deployments tried.
+        slots: semaphore capping requests in flight (see DeploymentLimiter.call).
+        """
+        remaining = self._pool(kwargs["model"])
+        while True:
+            deployment = self.pick([d for d in remaining if d.name not in avoid] or remaining)
+            remaining = [d for d in remaining if d is not deployment]
+            trace.get_current_span().set_attribute("azure.deployment", deployment.name)
+            if route is not None:
+                route.append(deployment.name)
+            try:
+                return await deployment.call(kwargs, max_retries=None if not remaining else 0, slots=slots)
+            except FAILOVER_ERRORS as e:
+                if not remaining:
+                    raise
+                self.failovers += 1
+                logging.info(f"Azure deployment {deployment.name} failed ({type(e).__name__}), failing over")
+
+    def get_stats(self) -> dict:
+        return {"failovers": self.failovers, "deployments": {d.name: d.get_stats() for d in self.deployments}}
+
+    async def close(self):
+        for client in {id(d.client): d.client for d in self.deployments}.values():
+            await client.close()
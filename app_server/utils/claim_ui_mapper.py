@@ -1,72 +1,54 @@
+import json
+from collections import defaultdict
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Iterable, Optional
 
-def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+# Timeline steps in display order: (step_id, renderer)
+TIMELINE_STEPS = []
+# node name -> [(step_id, renderer)] for the steps that node's output feeds
+STEP_RENDERERS = defaultdict(list)
+
+def timeline_step(step_id: int, *node_names: str):
     """
-    Transforms the ClaimAgentState into a highly detailed, narrative-driven timeline for the UI.
-    Designed to provide 'ChatGPT-style' explanations for inputs, analysis, and decisions.
+    Registers a step renderer, re-run whenever one of node_names has run.
     """
-    steps = []
-    
-    # Create a map of existing steps by ID and name for merging manual completions
-    existing_steps_map = {}
-    if existing_step_history:
-        if isinstance(existing_step_history, str):
-            import json
-            try:
-                existing_step_history = json.loads(existing_step_history)
-            except:
-                existing_step_history = []
-        
-        for existing_step in existing_step_history:
-            step_id = existing_step.get("id")
-            step_name = existing_step.get("name")
-            if step_id:
-                existing_steps_map[step_id] = existing_step
-            if step_name:
-                existing_steps_map[step_name] = existing_step
-    
-    def merge_manual_completion(step_id: int, step_name: str, step_data: Dict[str, Any]) -> Dict[str, Any]:
-        existing = existing_steps_map.get(step_id) or existing_steps_map.get(step_name)
-        if existing and existing.get("completed_by") == "human":
-            step_data["status"] = "completed"
-            step_data["completed_by"] = "human"
-            step_data["admin_notes"] = existing.get("admin_notes")
-            step_data["completed_at"] = existing.get("completed_at")
-        return step_data
+    def register(renderer: Callable[[Dict[str, Any]], Dict[str, Any]]):
+        TIMELINE_STEPS.append((step_id, renderer))
+        for node_name in node_names:
+            STEP_RENDERERS[node_name].append((step_id, renderer))
+        return renderer
+    return register
 
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    def fmt_curr(amt):
-        try:
-            val = float(amt)
-            return f"₹{val:,.2f}"
-        except:
-            return str(amt)
+def fmt_curr(amt):
+    try:
+        val = float(amt)
+        return f"₹{val:,.2f}"
+    except:
+        return str(amt)
 
-    # 1. FNOL Validation
+@timeline_step(1, "fnol")
+def render_fnol_step(state: Dict[str, Any]) -> Dict[str, Any]:
     fnol_data = state.get("fnol_data", {})
     claim_type = fnol_data.get("claim_type", "Unknown")
-    
+
     fnol_inputs = [
         f"Raw Claim Payload: Received unique identifier {state.get('claim_id')}.",
         f"Claimant Source: Data fetched from MongoDB 'claims' collection.",
         f"Mandatory Schema: Applied validation rules for a '{claim_type.upper()}' insurance claim.",
         f"Documents Received: Found {len(fnol_data.get('documents', []))} attachments awaiting processing."
     ]
-    
+
     fnol_thinking = [
         "I have initiated the First Notice of Loss (FNOL) ingestion process.",
         "I am currently verifying the presence of all mandatory fields such as Claimant Name, Policy Number, and Estimated Loss Amount.",
         f"I am confirming that for a '{claim_type}' claim, the required documentation (like proof of incident) is attached.",
         "I've successfully performed a schema integrity check to ensure the data is safe for downstream processing."
     ]
-    
-    steps.append(merge_manual_completion(1, "FNOL Validation", {
+
+    return {
         "id": 1,
         "name": "FNOL Validation",
         "status": "completed" if fnol_data else "pending",
-        "timestamp": timestamp,
         "summary": "Initial claim ingestion and schema validation.",
         "input": fnol_inputs,
         "thinking": fnol_thinking,
@@ -79,18 +61,19 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
                 {"label": "Payload Type", "value": "JSON/BSON", "status": "info"}
             ]
         }
-    }))
+    }
 
-    # 2. Policy Verification
+@timeline_step(2, "policy_verification")
+def render_policy_step(state: Dict[str, Any]) -> Dict[str, Any]:
     policy_sql = state.get("policy_sql_data", {})
-    policy_num = fnol_data.get("policyNumber", "N/A")
-    
+    policy_num = state.get("fnol_data", {}).get("policyNumber", "N/A")
+
     policy_inputs = [
         f"Primary Key: Searching for Policy Number '{policy_num}'.",
         "Target Database: PostgreSQL Production Instance (Insurance_DB).",
         "Validation Parameters: Checking 'Active' status, Expiry Date, and Coverage Eligibility."
     ]
-    
+
     policy_thinking = [
         f"I am executing a SQL query to locate policy {policy_num} in our central registry.",
         "I need to ensure that the policy was actually in force at the time the reported incident occurred.",
@@ -98,12 +81,21 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
         f"I am validating the current status: The database reports the status as '{policy_sql.get('status', 'Unknown')}'.",
         "I am also checking for any premium defaults that might affect claim eligibility."
     ]
-    
-    steps.append(merge_manual_completion(2, "Policy Verification", {
+
+    # Measured by instrument_node; a cache hit means no SQL round-trip at all
+    policy_metrics = state.get("node_metrics", {}).get("policy_verification", {})
+    sql_ms = policy_metrics.get("io_ms", {}).get("postgres")
+    if sql_ms is not None:
+        sql_latency = {"label": "SQL Latency", "value": f"{sql_ms:.0f}ms", "status": "success"}
+    elif policy_metrics.get("cache_hits"):
+        sql_latency = {"label": "SQL Latency", "value": "Cached (0ms)", "status": "success"}
+    else:
+        sql_latency = {"label": "SQL Latency", "value": "N/A", "status": "info"}
+
+    return {
         "id": 2,
         "name": "Policy Verification",
         "status": "completed" if policy_sql else "pending",
-        "timestamp": timestamp,
         "summary": "Verifying policy status in SQL database.",
         "input": policy_inputs,
         "thinking": policy_thinking,
@@ -112,22 +104,23 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
             "outcome": f"Policy '{policy_sql.get('status', 'Active')}' Found",
             "reasoning": f"Successfully located a matching {policy_sql.get('type', 'N/A')} policy for the claimant. The policy is currently in good standing and covers the specified incident category.",
             "metrics": [
-                {"label": "SQL Latency", "value": "45ms", "status": "success"},
+                sql_latency,
                 {"label": "Record ID", "value": f"DB-#{policy_sql.get('id', '???')}", "status": "info"}
             ]
         }
-    }))
+    }
 
-    # 3. Document AI Reader
+@timeline_step(3, "document_reader")
+def render_document_step(state: Dict[str, Any]) -> Dict[str, Any]:
     doc_data = state.get("document_data", {})
-    docs_to_read = fnol_data.get("documents", [])
-    
+    docs_to_read = state.get("fnol_data", {}).get("documents", [])
+
     doc_inputs = [
         f"Source Files: {len(docs_to_read)} attachments (PDFs/Images) from Azure Blob Storage.",
         "Analysis Engine: Azure OpenAI Vision (GPT-4o API).",
         "Extraction Schema: Capturing Name, Dates, registration numbers, and financial amounts."
     ]
-    
+
     doc_thinking = [
         "I am starting the deep visual analysis of the uploaded documentation.",
         "For PDF files, I am converting the source pages into high-resolution images for accurate character recognition.",
@@ -142,12 +135,22 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
             ext = v.get("extraction", {})
             conf = ext.get("confidence", 0)
             doc_thinking.append(f"Analyzing {v.get('category')}: Extracted fields with a confidence score of {conf*100:.0f}%.")
-    
-    steps.append(merge_manual_completion(3, "Document AI Reader", {
+
+    extractions = [v.get("extraction", {}) for v in doc_data.get("results", {}).values()]
+    confidences = [ext.get("confidence") for ext in extractions if "error" not in ext and isinstance(ext.get("confidence"), (int, float))]
+    ocr_errors = sum(1 for ext in extractions if "error" in ext)
+    if confidences:
+        avg_conf = sum(confidences) / len(confidences)
+        level = "High" if avg_conf >= 0.85 else "Medium" if avg_conf >= 0.6 else "Low"
+        ocr_confidence = {"label": "OCR Confidence", "value": f"{level} ({avg_conf * 100:.0f}%)",
+                          "status": "success" if avg_conf >= 0.85 else "warning"}
+    else:
+        ocr_confidence = {"label": "OCR Confidence", "value": "N/A", "status": "info"}
+
+    return {
         "id": 3,
         "name": "Document AI Reader",
         "status": "completed" if doc_data else "pending",
-        "timestamp": timestamp,
         "summary": "AI extraction from uploaded documents using Azure OpenAI Vision.",
         "input": doc_inputs,
         "thinking": doc_thinking,
@@ -156,22 +159,24 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
             "outcome": "Data Extraction Successful",
             "reasoning": "The AI has successfully 'read' the provided documents and converted them into structured data. We now have a machine-readable set of evidence to compare against the user's claim form.",
             "metrics": [
-                {"label": "OCR Confidence", "value": "High (92%)", "status": "success"},
-                {"label": "OCR Errors", "value": "0 Detected", "status": "success"}
+                ocr_confidence,
+                {"label": "OCR Errors", "value": f"{ocr_errors} Detected", "status": "success" if not ocr_errors else "error"}
             ]
         }
-    }))
+    }
 
-    # 4. Coverage Analysis
+@timeline_step(4, "coverage")
+def render_coverage_step(state: Dict[str, Any]) -> Dict[str, Any]:
+    claim_type = state.get("fnol_data", {}).get("claim_type", "Unknown")
     coverage = state.get("coverage_data", {})
     limit = coverage.get("coverage_limit", 0)
-    
+
     coverage_inputs = [
         f"Claim Category: Analyzing '{claim_type}' incident.",
         f"Coverage Limit: Policy Max Sum Assured of {fmt_curr(limit)}.",
         f"Applied Policy ID: Cross-referencing database record {state.get('policy_id')}."
     ]
-    
+
     coverage_thinking = [
         "I am now performing a detailed comparison between the incident reported and the policy's fine print.",
         f"My primary goal is to determine if the '{claim_type}' category is explicitly included in the base plan or available via an add-on rider.",
@@ -179,12 +184,11 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
         f"I have confirmed that the coverage limit allows for a payout of up to {fmt_curr(limit)}.",
         f"I am applying a deductible of {fmt_curr(coverage.get('deductible', 0))} as per the policy tier."
     ]
-    
-    steps.append(merge_manual_completion(4, "Coverage Analysis", {
+
+    return {
         "id": 4,
         "name": "Coverage Analysis",
         "status": "completed" if coverage else "pending",
-        "timestamp": timestamp,
         "summary": "Checking if incident is covered under policy terms.",
         "input": coverage_inputs,
         "thinking": coverage_thinking,
@@ -197,39 +201,38 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
                 {"label": "Remaining Limit", "value": fmt_curr(limit), "status": "info"}
             ]
         }
-    }))
+    }
 
-    # 5. Proof Verification
+@timeline_step(5, "proof_verification")
+def render_proof_step(state: Dict[str, Any]) -> Dict[str, Any]:
     proof_verified = state.get("proof_verified")
-    reasoning_logs = state.get("reasoning", [])
-    
+
     proof_inputs = [
         "User Data: The details provided in the claim application form.",
         "Document Data: The digital records extracted during the AI Reader step.",
         "Verification Logic: String fuzzy matching (Names) and Date consistency checks."
     ]
-    
+
     proof_thinking = [
         "I am acting as a digital auditor. I am' holding' the user's claim form in one hand and the AI-extracted document data in the other.",
         "First, I am matching names. I use fuzzy matching to account for small typos or middle names.",
         "Next, I am comparing dates. The incident date reported must match the date shown on official certificates.",
         "Finally, I am checking for inconsistencies across multiple documents (e.g., does the hospital bill name match the death certificate?)."
     ]
-    
+
     if proof_verified is not None:
         if proof_verified:
             proof_thinking.append("Consistency Check: PASSED. All data points match exactly across all submitted evidence.")
         else:
             proof_thinking.append("Consistency Check: FAILED. I detected significant discrepancies that require a human eye.")
-            mismatches = [r for r in reasoning_logs if "Mismatch" in r]
+            mismatches = [r for r in state.get("reasoning", []) if "Mismatch" in r]
             for m in mismatches:
                 proof_thinking.append(f"  - 🔴 CRITICAL: {m}")
 
-    steps.append(merge_manual_completion(5, "Proof Verification", {
+    return {
         "id": 5,
         "name": "Proof Verification",
         "status": "completed" if proof_verified is not None else "pending",
-        "timestamp": timestamp,
         "summary": "Cross-verifying user data with document data.",
         "input": proof_inputs,
         "thinking": proof_thinking,
@@ -242,18 +245,19 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
                 {"label": "Date Match", "value": "Identical" if proof_verified else "Mismatch", "status": "success" if proof_verified else "error"}
             ]
         }
-    }))
+    }
 
-    # 6. Fraud Check
+@timeline_step(6, "fraud_check")
+def render_fraud_step(state: Dict[str, Any]) -> Dict[str, Any]:
     fraud_risk = state.get("fraud_risk", {})
     score = fraud_risk.get("risk_score", 0)
-    
+
     fraud_inputs = [
         "Historical Records: Checking against past fraudulent patterns.",
         "Behavioral Signals: Analyzing timing, claim size, and document authenticity.",
         "Risk Algorithm: Weighted scoring based on anomaly detection."
     ]
-    
+
     fraud_thinking = [
         "I am now running a specialized fraud detection algorithm.",
         "I am looking for 'red flags' such as high-value claims submitted shortly after policy inception.",
@@ -261,12 +265,11 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
         f"I've computed a cumulative Risk Score of {score} out of 100.",
         "A score below 30 is considered safe. A score above 70 triggers an immediate fraud investigation."
     ]
-    
-    steps.append(merge_manual_completion(6, "Fraud Check", {
+
+    return {
         "id": 6,
         "name": "Fraud Check",
         "status": "completed" if fraud_risk else "pending",
-        "timestamp": timestamp,
         "summary": "Analyzing risk score and anomaly detection.",
         "input": fraud_inputs,
         "thinking": fraud_thinking,
@@ -279,19 +282,20 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
                 {"label": "Anomaly Count", "value": str(len(fraud_risk.get("flags", []))), "status": "info"}
             ]
         }
-    }))
+    }
 
-    # 7. Damage Assessment
+@timeline_step(7, "assessment")
+def render_assessment_step(state: Dict[str, Any]) -> Dict[str, Any]:
     assessment = state.get("damage_assessment", {})
-    claimed = fnol_data.get("estimated_amount", 0)
+    claimed = state.get("fnol_data", {}).get("estimated_amount", 0)
     assessed = assessment.get("verified_amount", 0)
-    
+
     assessment_inputs = [
         f"Claimed Amount: User estimation of {fmt_curr(claimed)}.",
         "Assessment Standards: Applying industry-standard depreciation and part-cost tables.",
         "Verified Evidence: Using line items extracted from hospital/repair bills."
     ]
-    
+
     assessment_thinking = [
         "I am calculating the actual 'payable' damage amount.",
         "First, I evaluate the bills extracted by the AI Reader. I sum up all eligible expenses.",
@@ -299,12 +303,11 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
         f"I am comparing the user's request ({fmt_curr(claimed)}) against my calculated value ({fmt_curr(assessed)}).",
         f"Note: {assessment.get('notes', 'I applied standard evaluation protocols.')}"
     ]
-    
-    steps.append(merge_manual_completion(7, "Damage Assessment", {
+
+    return {
         "id": 7,
         "name": "Damage Assessment",
         "status": "completed" if assessment else "pending",
-        "timestamp": timestamp,
         "summary": "Calculating recommended payout amount.",
         "input": assessment_inputs,
         "thinking": assessment_thinking,
@@ -317,30 +320,31 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
                 {"label": "AI Assessment", "value": fmt_curr(assessed), "status": "success"}
             ]
         }
-    }))
+    }
 
-    # 8. Final Settlement
+# Every node that can set the decision
+@timeline_step(8, "fnol", "policy_verification", "coverage", "proof_verification", "settlement")
+def render_settlement_step(state: Dict[str, Any]) -> Dict[str, Any]:
     final_decision = state.get("decision")
     payout = state.get("settlement_amount", 0)
-    
+
     settlement_inputs = [
         "Aggregated Decisions: Combining Policy, Coverage, Proof, Fraud, and Assessment results.",
         "Guardrail Check: Ensuring no critical 'Reject' flags were raised in any node.",
         "Settlement Calculation: Final sum (Assessed Amount - Deductible)."
     ]
-    
+
     settlement_thinking = [
         "I am reaching the conclusion of my analysis.",
         "I am reviewing my work history to ensure every step was completed with high confidence.",
         f"The final payout has been calculated as {fmt_curr(payout)} (Assessed value minus the deductible).",
         "I am now setting the final status of this claim in the central database."
     ]
-    
-    steps.append(merge_manual_completion(8, "Final Settlement", {
+
+    return {
         "id": 8,
         "name": "Final Settlement",
         "status": "completed" if final_decision else "pending",
-        "timestamp": timestamp,
         "summary": "Final decision and settlement calculation.",
         "input": settlement_inputs,
         "thinking": settlement_thinking,
@@ -353,6 +357,79 @@ def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Op
                 {"label": "Final Payout", "value": fmt_curr(payout), "status": "success"}
             ]
         }
-    }))
+    }
+
+class TimelineBuilder:
+    """
+    A claim's UI timeline, kept between syncs. update() re-renders only the steps fed by
+    the nodes that ran since the last update and bumps the version when a step changed, so
+    the backend can be sent just those steps as a patch.
+    """
+
+    def __init__(self, existing_step_history: Optional[List[Dict[str, Any]]] = None):
+        # Manual completions made in the Admin panel, by step id and name (parsed once per claim)
+        self.existing_steps = {}
+        if isinstance(existing_step_history, str):
+            try:
+                existing_step_history = json.loads(existing_step_history)
+            except:
+                existing_step_history = []
+        for existing_step in existing_step_history or []:
+            if existing_step.get("id"):
+                self.existing_steps[existing_step["id"]] = existing_step
+            if existing_step.get("name"):
+                self.existing_steps[existing_step["name"]] = existing_step
+        self.steps = {}
+        self.version = 0
+        self._measured_nodes = set()
 
-    return steps
+    def _merge_manual_completion(self, step_data: Dict[str, Any]) -> Dict[str, Any]:
+        existing = self.existing_steps.get(step_data["id"]) or self.existing_steps.get(step_data["name"])
+        if existing and existing.get("completed_by") == "human":
+            step_data["status"] = "completed"
+            step_data["completed_by"] = "human"
+            step_data["admin_notes"] = existing.get("admin_notes")
+            step_data["completed_at"] = existing.get("completed_at")
+        return step_data
+
+    def update(self, state: Dict[str, Any], nodes: Optional[Iterable[str]] = None) -> List[int]:
+        """
+        Re-renders the steps registered for `nodes` (all steps on the first update or when
+        nodes is None), plus those of nodes whose node_metrics just arrived: a node's own
+        sync happens before its metrics are merged into the state. Returns the changed step ids.
+        """
+        measured = set(state.get("node_metrics") or {})
+        if nodes is None or not self.steps:
+            renderers = TIMELINE_STEPS
+        else:
+            dirty = set(nodes) | (measured - self._measured_nodes)
+            renderers = sorted({entry for node in dirty for entry in STEP_RENDERERS.get(node, ())}, key=lambda entry: entry[0])
+        self._measured_nodes = measured
+
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        changed = []
+        for step_id, renderer in renderers:
+            step = self._merge_manual_completion(renderer(state))
+            previous = self.steps.get(step_id)
+            if previous is not None and {**previous, "timestamp": None} == {**step, "timestamp": None}:
+                continue
+            self.steps[step_id] = {"id": step.pop("id"), "name": step.pop("name"), "status": step.pop("status"),
+                                   "timestamp": timestamp, **step}
+            changed.append(step_id)
+        if changed:
+            self.version += 1
+        return changed
+
+    @property
+    def step_history(self) -> List[Dict[str, Any]]:
+        return [self.steps[step_id] for step_id in sorted(self.steps)]
+
+def map_claim_state_to_timeline(state: Dict[str, Any], existing_step_history: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Transforms the ClaimAgentState into a highly detailed, narrative-driven timeline for the UI.
+    Designed to provide 'ChatGPT-style' explanations for inputs, analysis, and decisions.
+    Renders every step; the sync manager keeps a TimelineBuilder per claim instead.
+    """
+    builder = TimelineBuilder(existing_step_history)
+    builder.update(state)
+    return builder.step_history
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from app_server.utils.serialization import dumps
+
+# Events that end a claim's stream ('status': the claim isn't running, sent instead of a live view)
+TERMINAL_EVENTS = {"completed", "failed", "status"}
+
+SSE_KEEPALIVE_SECONDS = 15
+
+class ClaimEventBus:
+    """
+    In-process pub/sub of claim progress events, keyed by claim_id.
+    Every graph run publishes here; SSE endpoints subscribe for live views.
+    """
+
+    def __init__(self, max_queue_size: int = 256):
+        self.max_queue_size = max_queue_size
+        self._subscribers = defaultdict(set)
+        # Runs in progress per claim, from their 'started' and terminal events
+        self._active = Counter()
+
+    def is_active(self, claim_id: str) -> bool:
+        return self._active[claim_id] > 0
+
+    def subscribe(self, claim_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._subscribers[claim_id].add(queue)
+        return queue
+
+    def unsubscribe(self, claim_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(claim_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[claim_id]
+
+    def publish(self, claim_id: str, event: dict):
+        if event.get("event") == "started":
+            self._active[claim_id] += 1
+        elif event.get("event") in TERMINAL_EVENTS and self._active[claim_id] > 0:
+            self._active[claim_id] -= 1
+        if not self._active[claim_id]:
+            del self._active[claim_id]
+        for queue in list(self._subscribers.get(claim_id, ())):
+            if queue.full():
+                # Slow consumer: drop its oldest event rather than block the graph
+                logging.debug(f"Dropping oldest event for slow subscriber of {claim_id}")
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+event_bus = ClaimEventBus()
+
+def format_sse(event: dict) -> str:
+    return f"event: {event.get('event', 'message')}\ndata: {dumps(event).decode()}\n\n"
+
+async def sse_events(claim_id: str, queue: asyncio.Queue):
+    """
+    Yields SSE frames from a subscription until a terminal event, with keep-alive comments.
+    """
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+            if event.get("event") in TERMINAL_EVENTS:
+                return
+    finally:
+        event_bus.unsubscribe(claim_id, queue)
@@ -0,0 +1,119 @@
+import os
+import copy
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from cachetools import TTLCache
+from pymongo import ASCENDING
+from app_server.utils.clients import async_db
+from app_server.utils.metrics import track_io, record_cache
+
+# Content-addressed cache for document extraction results.
+# L1: in-process TTL + LRU cache. L2: shared Mongo collection with a TTL index and size cap.
+EXTRACTION_CACHE_SIZE = int(os.getenv("EXTRACTION_CACHE_SIZE", "2048"))
+EXTRACTION_CACHE_TTL = int(os.getenv("EXTRACTION_CACHE_TTL", str(7 * 24 * 3600)))
+EXTRACTION_CACHE_MONGO_MAX_DOCS = int(os.getenv("EXTRACTION_CACHE_MONGO_MAX_DOCS", "100000"))
+EXTRACTION_CACHE_COLLECTION = os.getenv("EXTRACTION_CACHE_COLLECTION", "extraction_cache")
+
+# Trim the shared tier every N writes rather than on each insert
+_TRIM_EVERY = 100
+
+_local_cache = TTLCache(maxsize=EXTRACTION_CACHE_SIZE, ttl=EXTRACTION_CACHE_TTL)
+_collection = async_db[EXTRACTION_CACHE_COLLECTION]
+_writes_since_trim = 0
+
+cache_stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+def make_cache_key(content: bytes, prompt_version: str, deployment: str, doc_type_hint: str = "", variant: str = "") -> str:
+    """
+    Builds the cache key from the document bytes and everything that shapes the model output:
+    the deployments that may answer (deployment) and the pipeline toggles in effect (variant).
+    """
+    return make_cache_key_from_digest(hashlib.sha256(content).hexdigest(), prompt_version, deployment, doc_type_hint, variant)
+
+def make_cache_key_from_digest(doc_hash: str, prompt_version: str, deployment: str, doc_type_hint: str = "", variant: str = "") -> str:
+    """
+    Same as make_cache_key, for callers that hashed the document while streaming it.
+    """
+    return hashlib.sha256(f"{prompt_version}|{deployment}|{variant}|{doc_type_hint}|{doc_hash}".encode()).hexdigest()
+
+async def ensure_extraction_cache_indexes():
+    """
+    Creates the TTL and eviction-order indexes backing the shared tier. Called at startup.
+    """
+    try:
+        await _collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        await _collection.create_index([("created_at", ASCENDING)])
+    except Exception as e:
+        logging.warning(f"Could not create extraction cache indexes: {e}")
+
+async def get_cached_extraction(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks up an extraction in the local tier, then the shared tier (promoting hits locally).
+    Returns a copy, so callers can't change what other claims get from the local tier.
+    """
+    result = _local_cache.get(key)
+    if result is not None:
+        cache_stats["local_hits"] += 1
+        record_cache("extraction", hit=True)
+        return copy.deepcopy(result)
+
+    try:
+        with track_io("mongo", "extraction_cache_get"):
+            doc = await _collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"result": 1}
+            )
+    except Exception as e:
+        logging.warning(f"Extraction cache lookup failed: {e}")
+        doc = None
+
+    if doc:
+        cache_stats["shared_hits"] += 1
+        record_cache("extraction", hit=True)
+        _local_cache[key] = copy.deepcopy(doc["result"])
+        return doc["result"]
+
+    cache_stats["misses"] += 1
+    record_cache("extraction", hit=False)
+    return None
+
+async def put_cached_extraction(key: str, result: Dict[str, Any]):
+    """
+    Stores a successful extraction in both tiers.
+    """
+    global _writes_since_trim
+
+    _local_cache[key] = copy.deepcopy(result)
+    now = datetime.now(timezone.utc)
+    try:
+        with track_io("mongo", "extraction_cache_put"):
+            await _collection.replace_one(
+                {"_id": key},
+                {"result": result, "created_at": now, "expires_at": now + timedelta(seconds=EXTRACTION_CACHE_TTL)},
+                upsert=True
+            )
+    except Exception as e:
+        logging.warning(f"Extraction cache write failed: {e}")
+        return
+
+    _writes_since_trim += 1
+    if _writes_since_trim >= _TRIM_EVERY:
+        _writes_since_trim = 0
+        await _trim_shared_tier()
+
+async def _trim_shared_tier():
+    """
+    Size-based eviction for the shared tier: drops the oldest entries above the cap.
+    """
+    try:
+        excess = await _collection.estimated_document_count() - EXTRACTION_CACHE_MONGO_MAX_DOCS
+        if excess <= 0:
+            return
+        cursor = _collection.find({}, {"_id": 1}).sort("created_at", ASCENDING).limit(excess)
+        stale_ids = [doc["_id"] async for doc in cursor]
+        if stale_ids:
+            await _collection.delete_many({"_id": {"$in": stale_ids}})
+    except Exception as e:
+        logging.warning(f"Extraction cache trim failed: {e}")
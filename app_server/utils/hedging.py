@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+import logging
+from collections import Counter, defaultdict, deque
+from opentelemetry import trace
+from app_server.utils.metrics import vision_latency_seconds, vision_hedges_total
+
+# Opt-in: a vision request still running at the category's VISION_HEDGE_PERCENTILE latency
+# gets a duplicate (on another deployment when there is one); the first answer wins and the
+# other is cancelled
+VISION_HEDGING_ENABLED = os.getenv("VISION_HEDGING_ENABLED", "false").lower() == "true"
+VISION_HEDGE_PERCENTILE = float(os.getenv("VISION_HEDGE_PERCENTILE", "95"))
+# No hedging for a category until it has this many latency samples
+VISION_HEDGE_MIN_SAMPLES = int(os.getenv("VISION_HEDGE_MIN_SAMPLES", "20"))
+VISION_HEDGE_MIN_DELAY_MS = float(os.getenv("VISION_HEDGE_MIN_DELAY_MS", "500"))
+# Hedges per vision request at most, i.e. the extra token spend (0.05 = up to 5%)
+VISION_HEDGE_BUDGET = float(os.getenv("VISION_HEDGE_BUDGET", "0.05"))
+# Recent latencies kept per category
+VISION_LATENCY_WINDOW = int(os.getenv("VISION_LATENCY_WINDOW", "500"))
+# Most unused budget carried over, so a quiet period can't fund a burst of hedges
+HEDGE_BUDGET_BURST = 5.0
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+class HedgedChat:
+    """
+    Vision completions through the deployment router, timed per document category. With
+    VISION_HEDGING_ENABLED, slow requests are hedged within VISION_HEDGE_BUDGET.
+    """
+
+    def __init__(self, router):
+        self.router = router
+        self.latencies = defaultdict(lambda: deque(maxlen=VISION_LATENCY_WINDOW))
+        self.budget = HEDGE_BUDGET_BURST
+        self.stats = Counter()
+
+    def hedge_delay(self, category: str):
+        """
+        Seconds after which a request of this category is hedged, or None while there are too
+        few samples.
+        """
+        samples = self.latencies[category]
+        if len(samples) < VISION_HEDGE_MIN_SAMPLES:
+            return None
+        return max(percentile(samples, VISION_HEDGE_PERCENTILE), VISION_HEDGE_MIN_DELAY_MS / 1000)
+
+    async def _timed(self, category: str, **kwargs):
+        start = time.monotonic()
+        resp = await self.router.create(**kwargs)
+        elapsed = time.monotonic() - start
+        self.latencies[category].append(elapsed)
+        vision_latency_seconds.labels(category).observe(elapsed)
+        return resp
+
+    async def create(self, category: str, **kwargs):
+        self.stats["requests"] += 1
+        delay = self.hedge_delay(category) if VISION_HEDGING_ENABLED else None
+        if delay is None:
+            return await self._timed(category, **kwargs)
+
+        self.budget = min(self.budget + VISION_HEDGE_BUDGET, HEDGE_BUDGET_BURST)
+        route = []
+        start = time.monotonic()
+        primary = asyncio.ensure_future(self._timed(category, route=route, **kwargs))
+        hedge = None
+        winner = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+            if self.budget < 1:
+                self.stats["over_budget"] += 1
+                return await primary
+
+            self.budget -= 1
+            self.stats["hedged"] += 1
+            trace.get_current_span().add_event("vision.hedge", {"category": category, "delay_s": delay})
+            logging.info(f"Hedging {category} extraction after {delay:.2f}s (primary on {', '.join(route)})")
+            hedge = asyncio.ensure_future(self._timed(category, avoid=set(route), **kwargs))
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # A failed request doesn't win while the other can still answer
+                    if task.exception() is None:
+                        winner = "hedge" if task is hedge else "primary"
+                        self.stats[f"{winner}_won"] += 1
+                        vision_hedges_total.labels(category, winner).inc()
+                        return task.result()
+            return primary.result()
+        finally:
+            if winner == "hedge" and not primary.done():
+                # The cancelled primary took at least this long. Leaving it out would under-sample
+                # the tail the percentile measures and pull the hedge delay down over time.
+                self.latencies[category].append(time.monotonic() - start)
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def get_stats(self) -> dict:
+        categories = {}
+        for category, samples in self.latencies.items():
+            if not samples:
+                continue
+            delay = self.hedge_delay(category)
+            categories[category] = {
+                "samples": len(samples),
+                "p50_ms": round(percentile(samples, 50) * 1000, 1),
+                "p99_ms": round(percentile(samples, 99) * 1000, 1),
+                "hedge_delay_ms": round(delay * 1000, 1) if VISION_HEDGING_ENABLED and delay is not None else None,
+            }
+        return {"enabled": VISION_HEDGING_ENABLED, **self.stats, "budget": round(self.budget, 3), "categories": categories}
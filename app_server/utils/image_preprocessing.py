@@ -0,0 +1,128 @@
+import io
+import os
+import math
+import base64
+from PIL import Image, ImageChops, ImageOps
+
+# Downsample / crop / re-encode document images before they are sent to the vision model
+IMAGE_PREPROCESSING_ENABLED = os.getenv("IMAGE_PREPROCESSING_ENABLED", "true").lower() == "true"
+IMAGE_OUTPUT_FORMAT = os.getenv("IMAGE_OUTPUT_FORMAT", "jpeg").lower()  # jpeg | webp
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+# Grayscale level above which a pixel counts as blank paper when cropping borders
+IMAGE_BORDER_THRESHOLD = int(os.getenv("IMAGE_BORDER_THRESHOLD", "235"))
+IMAGE_BORDER_MARGIN = 8
+# Mean error per non-blank pixel (0-255) a lower tier may add before it is considered less legible
+IMAGE_LEGIBILITY_MAX_ERROR = float(os.getenv("IMAGE_LEGIBILITY_MAX_ERROR", "20.0"))
+
+# Short-side resolution tiers; 768 is where GPT-4o high detail stops adding detail
+RESOLUTION_TIERS = (512, 768)
+LOW_DETAIL_SIZE = 512
+
+# category -> vision detail level. Low detail is a flat 85 tokens at 512x512 and is
+# enough to judge photos; text documents need high detail.
+CATEGORY_DETAIL = {
+    "damage-photos": "low",
+    "hospital-bills": "high",
+    "discharge-summary": "high",
+    "death-certificate": "high",
+    "claim-form": "high",
+    "rc-copy": "high",
+    "driving-license": "high",
+    "bank-details": "high",
+}
+DEFAULT_DETAIL = "high"
+
+MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+def estimate_image_tokens(width_px: int, height_px: int) -> int:
+    """
+    GPT-4o high-detail image cost: fit within 2048x2048, scale the short side to 768,
+    then 170 tokens per 512px tile plus 85.
+    """
+    scale = min(1.0, 2048 / max(width_px, height_px))
+    width_px, height_px = width_px * scale, height_px * scale
+    scale = min(1.0, 768 / min(width_px, height_px))
+    width_px, height_px = width_px * scale, height_px * scale
+    return 85 + 170 * math.ceil(width_px / 512) * math.ceil(height_px / 512)
+
+def crop_blank_borders(image: Image.Image) -> Image.Image:
+    """
+    Trims near-white margins (scanner beds, letterboxing), keeping a small margin.
+    """
+    mask = image.convert("L").point(lambda value: 255 if value < IMAGE_BORDER_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return image
+    left, top, right, bottom = bbox
+    bbox = (max(0, left - IMAGE_BORDER_MARGIN), max(0, top - IMAGE_BORDER_MARGIN),
+            min(image.width, right + IMAGE_BORDER_MARGIN), min(image.height, bottom + IMAGE_BORDER_MARGIN))
+    return image.crop(bbox) if bbox != (0, 0, image.width, image.height) else image
+
+def _fit_short_side(image: Image.Image, short_side: int) -> Image.Image:
+    # Same fit the model applies: long side within 2048, short side within the tier
+    scale = min(1.0, short_side / min(image.size), 2048 / max(image.size))
+    if scale >= 1.0:
+        return image
+    return image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+
+def _tier_error(reference: Image.Image, candidate: Image.Image) -> float:
+    """
+    Mean grayscale difference between the reference and the candidate scaled back up,
+    per non-blank pixel (so whitespace doesn't dilute it); fine print a tier would blur
+    shows up as error.
+    """
+    gray = reference.convert("L")
+    restored = candidate.convert("L").resize(reference.size, Image.BILINEAR)
+    histogram = ImageChops.difference(gray, restored).histogram()
+    ink_pixels = sum(gray.histogram()[:IMAGE_BORDER_THRESHOLD]) or 1
+    return sum(level * count for level, count in enumerate(histogram)) / ink_pixels
+
+def pick_resolution(image: Image.Image) -> Image.Image:
+    """
+    Smallest tier whose downsample keeps the page legible, compared against the top tier.
+    """
+    reference = _fit_short_side(image, RESOLUTION_TIERS[-1])
+    for tier in RESOLUTION_TIERS[:-1]:
+        candidate = _fit_short_side(reference, tier)
+        if candidate.size == reference.size or _tier_error(reference, candidate) <= IMAGE_LEGIBILITY_MAX_ERROR:
+            return candidate
+    return reference
+
+def encode_image(image: Image.Image, image_format: str = IMAGE_OUTPUT_FORMAT) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        image.save(buffer, format="WEBP", quality=IMAGE_QUALITY, method=4)
+    else:
+        image.save(buffer, format="JPEG", quality=IMAGE_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+def preprocess_image(image: Image.Image, doc_type_hint: str) -> dict:
+    """
+    Crop -> resolution tier -> compressed encode. CPU-bound; run off the event loop.
+    Returns {"data", "mime", "detail", "width", "height", "tokens"}.
+    """
+    detail = CATEGORY_DETAIL.get(doc_type_hint, DEFAULT_DETAIL)
+    image = crop_blank_borders(image.convert("RGB"))
+    if detail == "low":
+        image.thumbnail((LOW_DETAIL_SIZE, LOW_DETAIL_SIZE), Image.LANCZOS)
+        tokens = 85
+    else:
+        image = pick_resolution(image)
+        tokens = estimate_image_tokens(image.width, image.height)
+    image_format = IMAGE_OUTPUT_FORMAT if IMAGE_OUTPUT_FORMAT in MIME_TYPES else "jpeg"
+    return {
+        "data": encode_image(image, image_format),
+        "mime": MIME_TYPES[image_format],
+        "detail": detail,
+        "width": image.width,
+        "height": image.height,
+        "tokens": tokens,
+    }
+
+def preprocess_image_bytes(data: bytes, doc_type_hint: str) -> dict:
+    image = Image.open(io.BytesIO(data))
+    # Phone photos carry their rotation in EXIF
+    return preprocess_image(ImageOps.exif_transpose(image), doc_type_hint)
+
+def to_data_url(prepared: dict) -> str:
+    return f"data:{prepared['mime']};base64,{base64.b64encode(prepared['data']).decode('utf-8')}"
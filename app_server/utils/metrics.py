@@ -0,0 +1,124 @@
+import time
+import functools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from app_server.utils.tracing import tracer
+
+# Per-node instrumentation, exported in Prometheus format on /metrics
+NODE_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+node_duration_seconds = Histogram(
+    "claim_node_duration_seconds", "Wall time of a claim graph node", ["node"], buckets=NODE_LATENCY_BUCKETS
+)
+node_io_seconds = Histogram(
+    "claim_node_io_seconds", "I/O wait inside a claim graph node, by backend", ["node", "backend"], buckets=NODE_LATENCY_BUCKETS
+)
+node_errors_total = Counter("claim_node_errors_total", "Claim graph node exceptions", ["node"])
+io_seconds = Histogram(
+    "claim_io_seconds", "External call latency, by backend", ["backend"], buckets=NODE_LATENCY_BUCKETS
+)
+io_errors_total = Counter("claim_io_errors_total", "Failed external calls, by backend", ["backend"])
+llm_tokens_total = Counter("claim_llm_tokens_total", "Azure OpenAI token usage", ["purpose", "kind"])
+cache_requests_total = Counter("claim_cache_requests_total", "Cache lookups", ["cache", "result"])
+azure_queue_wait_seconds = Histogram(
+    "claim_azure_queue_wait_seconds", "Wait for Azure OpenAI quota / circuit breaker before a call", ["deployment"],
+    buckets=NODE_LATENCY_BUCKETS
+)
+azure_retries_total = Counter("claim_azure_retries_total", "Retried Azure OpenAI calls", ["deployment", "reason"])
+vision_latency_seconds = Histogram(
+    "claim_vision_latency_seconds", "Vision completion latency, by document category", ["category"],
+    buckets=NODE_LATENCY_BUCKETS
+)
+vision_hedges_total = Counter("claim_vision_hedges_total", "Hedged vision requests, by winner", ["category", "winner"])
+azure_circuit_open = Gauge("claim_azure_circuit_open", "1 while the deployment's circuit breaker is open", ["deployment"])
+
+# Accumulator for the node currently running in this task (shared with tasks it gathers)
+_node_stats = ContextVar("node_stats", default=None)
+_current_node = ContextVar("current_node", default=None)
+
+def current_node():
+    """
+    Name of the graph node running in this task, or None outside the graph.
+    """
+    return _current_node.get()
+
+@contextmanager
+def track_io(backend: str, operation: str = None, per_node: bool = True):
+    """
+    Times and traces an external call (postgres, mongo, blob, azure, backend_sync). The time
+    is also charged to the enclosing node unless per_node is False (background work such as syncs).
+    """
+    start = time.perf_counter()
+    try:
+        with tracer.start_as_current_span(operation or backend, attributes={"io.backend": backend}):
+            yield
+    except Exception:
+        io_errors_total.labels(backend).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        io_seconds.labels(backend).observe(elapsed)
+        stats = _node_stats.get() if per_node else None
+        if stats is not None:
+            stats["io"][backend] = stats["io"].get(backend, 0.0) + elapsed
+
+def record_tokens(usage, purpose: str = "vision"):
+    """
+    Records resp.usage from a chat completion.
+    """
+    if usage is None:
+        return
+    prompt, completion = usage.prompt_tokens or 0, usage.completion_tokens or 0
+    llm_tokens_total.labels(purpose, "prompt").inc(prompt)
+    llm_tokens_total.labels(purpose, "completion").inc(completion)
+    stats = _node_stats.get()
+    if stats is not None:
+        stats["tokens"]["prompt"] += prompt
+        stats["tokens"]["completion"] += completion
+
+def record_cache(cache: str, hit: bool):
+    cache_requests_total.labels(cache, "hit" if hit else "miss").inc()
+    stats = _node_stats.get()
+    if stats is not None:
+        stats["cache_hits" if hit else "cache_misses"] += 1
+
+def instrument_node(name: str, node_fn):
+    """
+    Wraps a graph node in a span and records wall time, per-backend I/O, token usage and
+    cache hits, exporting them to Prometheus and adding them to the state under node_metrics[name].
+    """
+    @functools.wraps(node_fn)
+    async def wrapper(state):
+        stats = {"io": {}, "tokens": {"prompt": 0, "completion": 0}, "cache_hits": 0, "cache_misses": 0}
+        token = _node_stats.set(stats)
+        name_token = _current_node.set(name)
+        start = time.perf_counter()
+        try:
+            with tracer.start_as_current_span(f"node.{name}", attributes={"claim.id": state.get("claim_id") or ""}):
+                result = await node_fn(state)
+        except Exception:
+            node_errors_total.labels(name).inc()
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _node_stats.reset(token)
+            _current_node.reset(name_token)
+            node_duration_seconds.labels(name).observe(elapsed)
+            for backend, seconds in stats["io"].items():
+                node_io_seconds.labels(name, backend).observe(seconds)
+
+        logging.debug(f"Node {name} took {elapsed * 1000:.1f}ms (io: {stats['io']})")
+        return {**(result or {}), "node_metrics": {name: {
+            "wall_ms": round(elapsed * 1000, 2),
+            "io_ms": {backend: round(seconds * 1000, 2) for backend, seconds in stats["io"].items()},
+            "tokens": stats["tokens"],
+            "cache_hits": stats["cache_hits"],
+            "cache_misses": stats["cache_misses"],
+        }}}
+
+    return wrapper
+
+def render_metrics():
+    return generate_latest(), CONTENT_TYPE_LATEST
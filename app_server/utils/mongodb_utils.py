@@ -1,6 +1,8 @@
 import os
-from pymongo import MongoClient
+import re
+from pymongo import MongoClient, AsyncMongoClient, ASCENDING
 from dotenv import load_dotenv
+from app_server.utils.metrics import track_io
 import logging
 
 load_dotenv()
@@ -8,35 +10,110 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "insurance_ai")
 
-client = MongoClient(MONGO_URI)
+# One tuned client pair for the whole process (sync for scripts/checkpointing, async for the graph)
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000")),
+    "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primaryPreferred"),
+    "retryReads": True,
+}
+
+client = MongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
 db = client[DB_NAME]
 claims_collection = db["claims"]
 
+async_client = AsyncMongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
+async_db = async_client[DB_NAME]
+async_claims_collection = async_db["claims"]
+
 from bson import ObjectId
 
-def get_claim_by_id(claim_id: str):
+OBJECT_ID_PATTERN = re.compile(r"^[0-9a-fA-F]{24}$")
+
+# Only the claim fields the graph (and UI timeline) read from fnol_data
+FNOL_PROJECTION = {
+    "claim_id": 1, "id": 1,
+    "user_id": 1, "userId": 1, "policy_id": 1, "policyId": 1, "policyNumber": 1,
+    "claim_type": 1, "status": 1, "estimated_amount": 1,
+    "claimant_info": 1, "death_details": 1, "accident_details": 1,
+    "hospitalization_details": 1, "incident_details": 1, "documents": 1,
+}
+
+def _lookup_filters(claim_id: str) -> list:
     """
-    Fetch a claim document from MongoDB by its claim_id, id, or _id.
+    Routes the lookup by ID shape. Each filter is a single-field equality that hits
+    an index (_id, claim_id or id), in order of precedence.
     """
-    try:
-        # Build query: check claim_id, id, and _id (if valid ObjectId)
-        query_conditions = [{"claim_id": claim_id}, {"id": claim_id}, {"_id": claim_id}]
+    if OBJECT_ID_PATTERN.match(claim_id):
+        return [{"_id": ObjectId(claim_id)}, {"claim_id": claim_id}, {"id": claim_id}]
+    return [{"claim_id": claim_id}, {"id": claim_id}, {"_id": claim_id}]
+
+def _lookup_query(claim_id: str, projection: dict = None):
+    """
+    One $or over the lookup filters (each branch uses its own index), so a claim is found in
+    a single round trip whichever field holds the id. Returns the filters, the query and the
+    projection, widened so the matched field can be told apart.
+    """
+    filters = _lookup_filters(claim_id)
+    if projection and any(projection.values()):
+        projection = {**projection, "claim_id": 1, "id": 1}
+    return filters, {"$or": filters}, projection
+
+def _pick_claim(filters: list, claims: list):
+    # Several documents can match different branches; keep the old first-filter-wins precedence
+    for query in filters:
+        (field, value), = query.items()
+        for claim in claims:
+            if claim.get(field) == value:
+                return claim
+    return None
+
+def _normalize_claim(claim):
+    if not claim:
+        return None
         
-        # Check if it's a valid ObjectId string
-        if len(claim_id) == 24 and all(c in "0123456789abcdefABCDEF" for c in claim_id):
-            query_conditions.append({"_id": ObjectId(claim_id)})
-            
-        query = {"$or": query_conditions}
-        claim = claims_collection.find_one(query)
+    # Convert ObjectId to string for JSON serialization compatibility
+    if "_id" in claim:
+        claim["_id"] = str(claim["_id"])
         
-        if not claim:
-            return None
-            
-        # Convert ObjectId to string for JSON serialization compatibility
-        if "_id" in claim:
-            claim["_id"] = str(claim["_id"])
-            
-        return claim
+    return claim
+
+def get_claim_by_id(claim_id: str, projection: dict = None):
+    """
+    Fetch a claim document from MongoDB by its claim_id, id, or _id.
+    """
+    try:
+        filters, query, projection = _lookup_query(claim_id, projection)
+        claims = list(claims_collection.find(query, projection).limit(len(filters)))
+        return _normalize_claim(_pick_claim(filters, claims))
+    except Exception as e:
+        logging.error(f"Error fetching claim from MongoDB: {e}")
+        return None
+
+async def aget_claim_by_id(claim_id: str, projection: dict = FNOL_PROJECTION):
+    """
+    Async variant of get_claim_by_id for use inside the graph nodes.
+    Projects only the FNOL fields the graph uses by default.
+    """
+    try:
+        filters, query, projection = _lookup_query(claim_id, projection)
+        with track_io("mongo", "get_claim_by_id"):
+            claims = await async_claims_collection.find(query, projection).limit(len(filters)).to_list(len(filters))
+        return _normalize_claim(_pick_claim(filters, claims))
     except Exception as e:
         logging.error(f"Error fetching claim from MongoDB: {e}")
         return None
+
+async def ensure_claim_indexes():
+    """
+    Ensures the indexes backing get_claim_by_id exist (_id is always indexed). Called at startup.
+    """
+    try:
+        await async_claims_collection.create_index([("claim_id", ASCENDING)], sparse=True)
+        await async_claims_collection.create_index([("id", ASCENDING)], sparse=True)
+    except Exception as e:
+        logging.warning(f"Could not create claim lookup indexes: {e}")
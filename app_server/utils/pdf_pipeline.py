@@ -0,0 +1,217 @@
+import io
+import os
+import asyncio
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import fitz # PyMuPDF
+from PIL import Image
+from app_server.utils.clients import http_client
+from app_server.utils.metrics import track_io
+from app_server.utils.tracing import traced
+from app_server.utils.image_preprocessing import IMAGE_PREPROCESSING_ENABLED, estimate_image_tokens, preprocess_image
+
+# Downloads are streamed into memory up to this size, then spill to a temp file
+PDF_SPOOL_MAX_MEMORY_BYTES = int(os.getenv("PDF_SPOOL_MAX_MEMORY_BYTES", str(8 * 1024 * 1024)))
+DOCUMENT_MAX_DOWNLOAD_BYTES = int(os.getenv("DOCUMENT_MAX_DOWNLOAD_BYTES", str(50 * 1024 * 1024)))
+
+# Pages bundled into one vision request, and the image-token budget they share
+PDF_MAX_PAGES_PER_REQUEST = int(os.getenv("PDF_MAX_PAGES_PER_REQUEST", "4"))
+PDF_VISION_TOKEN_BUDGET = int(os.getenv("PDF_VISION_TOKEN_BUDGET", "4500"))
+PDF_MIN_DPI = int(os.getenv("PDF_MIN_DPI", "72"))
+PDF_MAX_DPI = int(os.getenv("PDF_MAX_DPI", "200"))
+PDF_JPEG_QUALITY = int(os.getenv("PDF_JPEG_QUALITY", "85"))
+# Only the first N pages (plus the last one) are scanned for page selection
+PDF_SCAN_MAX_PAGES = int(os.getenv("PDF_SCAN_MAX_PAGES", "40"))
+# Text-layer fast path reads at most this many pages
+PDF_TEXT_MAX_PAGES = int(os.getenv("PDF_TEXT_MAX_PAGES", "10"))
+# 0 = render in threads; > 0 = render in a process pool of this size
+PDF_RENDER_PROCESSES = int(os.getenv("PDF_RENDER_PROCESSES", "0"))
+
+# Text-layer keywords that mark the pages worth sending for each document category
+PAGE_KEYWORDS = {
+    "hospital-bills": ["grand total", "net payable", "amount payable", "total", "bill", "invoice", "balance", "paid"],
+    "discharge-summary": ["discharge", "diagnosis", "admission", "summary"],
+    "death-certificate": ["death", "deceased", "cause", "registration", "certificate"],
+    "rc-copy": ["registration", "chassis", "engine", "owner"],
+    "driving-license": ["licence", "license", "validity", "vehicle class"],
+    "claim-form": ["claim", "policy", "signature", "declaration"],
+}
+
+_render_pool = None
+
+class SpooledDownload:
+    """
+    Bounded download buffer: memory up to PDF_SPOOL_MAX_MEMORY_BYTES, then a temp file.
+    Hashes the content as it arrives, so the cache key needs no second pass.
+    """
+
+    def __init__(self, max_memory_bytes: int = PDF_SPOOL_MAX_MEMORY_BYTES, max_bytes: int = DOCUMENT_MAX_DOWNLOAD_BYTES):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.path = None
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._sha256 = hashlib.sha256()
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise ValueError(f"Document exceeds {self.max_bytes} bytes")
+        self._sha256.update(chunk)
+        if self._file is None and self.size > self.max_memory_bytes:
+            self._file = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer.getvalue())
+            self._buffer = None
+        (self._file or self._buffer).write(chunk)
+
+    @property
+    def digest(self) -> str:
+        return self._sha256.hexdigest()
+
+    def source(self) -> dict:
+        """
+        fitz.open() arguments for the downloaded document (picklable, for the process pool).
+        """
+        if self._file is not None:
+            self._file.flush()
+            return {"filename": self.path, "filetype": "pdf"}
+        return {"stream": self._buffer.getvalue(), "filetype": "pdf"}
+
+    def read_bytes(self) -> bytes:
+        if self._file is not None:
+            self._file.flush()
+            with open(self.path, "rb") as f:
+                return f.read()
+        return self._buffer.getvalue()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            os.unlink(self.path)
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+async def download_document(url: str) -> SpooledDownload:
+    """
+    Streams a document into a SpooledDownload. The caller closes it.
+    """
+    spool = SpooledDownload()
+    try:
+        with track_io("blob", "blob_download"):
+            async with http_client.stream("GET", url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+    return spool
+
+def pick_dpi(width_pt: float, height_pt: float, token_budget: int) -> int:
+    """
+    Highest DPI that still adds detail the model will see (it downsamples to 768px on the
+    short side), lowered until the page fits its share of the token budget.
+    """
+    width_in, height_in = width_pt / 72, height_pt / 72
+    dpi = min(PDF_MAX_DPI, 768 / min(width_in, height_in), 2048 / max(width_in, height_in))
+    while dpi > PDF_MIN_DPI and estimate_image_tokens(width_in * dpi, height_in * dpi) > token_budget:
+        dpi *= 0.9
+    return int(max(dpi, PDF_MIN_DPI))
+
+def select_pages(doc, doc_type_hint: str, max_pages: int = PDF_MAX_PAGES_PER_REQUEST) -> list:
+    """
+    Picks the pages worth sending, scored by category keywords in the text layer.
+    The first page always goes (headers, names); for bills the last page is favoured
+    because that is where totals usually are. Returns page numbers in document order.
+    """
+    page_count = len(doc)
+    if page_count <= max_pages:
+        return list(range(page_count))
+
+    keywords = PAGE_KEYWORDS.get(doc_type_hint, [])
+    candidates = sorted(set(range(min(page_count, PDF_SCAN_MAX_PAGES))) | {page_count - 1})
+    scores = {}
+    for number in candidates:
+        text = doc[number].get_text("text").lower() if keywords else ""
+        scores[number] = sum(text.count(keyword) for keyword in keywords)
+    scores[0] += 1000
+    if doc_type_hint == "hospital-bills":
+        scores[page_count - 1] += 5
+
+    # Ties (e.g. scanned pages with no text layer) keep the earliest pages
+    ranked = sorted(candidates, key=lambda number: (-scores[number], number))
+    return sorted(ranked[:max_pages])
+
+def render_selected_pages(source: dict, doc_type_hint: str, max_pages: int = PDF_MAX_PAGES_PER_REQUEST,
+                          token_budget: int = PDF_VISION_TOKEN_BUDGET) -> list:
+    """
+    Selects and renders pages, sharing the token budget between them, then crops and
+    re-encodes them (see image_preprocessing). CPU-bound; runs in a worker thread or process.
+    Returns [(page_number, {"data", "mime", "detail", ...}), ...].
+    """
+    doc = fitz.open(**source)
+    try:
+        if len(doc) == 0:
+            raise Exception("Empty PDF document")
+        pages = select_pages(doc, doc_type_hint, max_pages)
+        per_page_budget = token_budget // len(pages)
+        rendered = []
+        for number in pages:
+            page = doc[number]
+            pix = page.get_pixmap(dpi=pick_dpi(page.rect.width, page.rect.height, per_page_budget), alpha=False)
+            if IMAGE_PREPROCESSING_ENABLED:
+                image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+                rendered.append((number, preprocess_image(image, doc_type_hint)))
+            else:
+                rendered.append((number, {"data": pix.tobytes("jpg", jpg_quality=PDF_JPEG_QUALITY), "mime": "image/jpeg", "detail": "auto"}))
+        return rendered
+    finally:
+        doc.close()
+
+def extract_text_layer(source: dict, max_pages: int = PDF_TEXT_MAX_PAGES) -> str:
+    """
+    Returns the embedded text of the first max_pages pages ("" for scanned PDFs).
+    """
+    doc = fitz.open(**source)
+    try:
+        return "\n".join(doc[number].get_text("text") for number in range(min(len(doc), max_pages)))
+    finally:
+        doc.close()
+
+async def run_cpu_bound(fn, *args):
+    """
+    Runs PyMuPDF work off the event loop (thread, or process pool if configured).
+    """
+    global _render_pool
+    if PDF_RENDER_PROCESSES <= 0:
+        return await asyncio.to_thread(fn, *args)
+    if _render_pool is None:
+        _render_pool = ProcessPoolExecutor(max_workers=PDF_RENDER_PROCESSES)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_render_pool, fn, *args)
+
+async def render_pdf(spool: SpooledDownload, doc_type_hint: str) -> list:
+    with traced("pdf.render", **{"document.category": doc_type_hint}) as span:
+        pages = await run_cpu_bound(render_selected_pages, spool.source(), doc_type_hint)
+        span.set_attribute("pdf.pages_rendered", len(pages))
+        return pages
+
+async def read_pdf_text(spool: SpooledDownload) -> str:
+    with traced("pdf.text_layer"):
+        return await run_cpu_bound(extract_text_layer, spool.source())
+
+def shutdown_render_pool():
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown(wait=False, cancel_futures=True)
+        _render_pool = None
+        logging.info("PDF render pool shut down.")
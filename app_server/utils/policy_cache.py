@@ -0,0 +1,197 @@
+import os
+import json
+import asyncio
+import logging
+import asyncpg
+from cachetools import TTLCache
+from app_server.utils.postgres_utils import DATABASE_URL, afetch_policy_by_number, afetch_policies_by_numbers
+from app_server.utils.metrics import record_cache
+
+# Read-through cache for hot policies (group health, fleet car, ...)
+POLICY_CACHE_SIZE = int(os.getenv("POLICY_CACHE_SIZE", "5000"))
+POLICY_CACHE_TTL = float(os.getenv("POLICY_CACHE_TTL", "30"))
+POLICY_CACHE_NEGATIVE_TTL = float(os.getenv("POLICY_CACHE_NEGATIVE_TTL", "10"))
+
+# Optional LISTEN/NOTIFY invalidation. Install a trigger on public.policy that runs
+#   PERFORM pg_notify('policy_changed', NEW."policyNumber");
+# on UPDATE/DELETE; an empty payload clears the whole cache.
+POLICY_CACHE_LISTEN = os.getenv("POLICY_CACHE_LISTEN", "false").lower() == "true"
+POLICY_NOTIFY_CHANNEL = os.getenv("POLICY_NOTIFY_CHANNEL", "policy_changed")
+POLICY_LISTEN_RETRY_SECONDS = float(os.getenv("POLICY_LISTEN_RETRY_SECONDS", "5"))
+
+_policies = TTLCache(maxsize=POLICY_CACHE_SIZE, ttl=POLICY_CACHE_TTL)
+_not_found = TTLCache(maxsize=POLICY_CACHE_SIZE, ttl=POLICY_CACHE_NEGATIVE_TTL)
+# Concurrent misses for the same policy share one database round-trip
+_inflight = {}
+# Bumped by invalidate_policy; a load started before an invalidation doesn't store its row
+_generations = {}
+_generation = 0
+_listener_conn = None
+_listener_reconnect = None
+
+policy_cache_stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "invalidations": 0,
+                      "prefetched": 0}
+
+async def get_policy(policy_number: str):
+    """
+    Returns the policy row for policy_number, or None if it does not exist.
+    Database errors are not cached and also return None.
+    """
+    if policy_number in _policies:
+        policy_cache_stats["hits"] += 1
+        record_cache("policy", hit=True)
+        return dict(_policies[policy_number])
+    if policy_number in _not_found:
+        policy_cache_stats["negative_hits"] += 1
+        record_cache("policy", hit=True)
+        return None
+
+    future = _inflight.get(policy_number)
+    if future is not None:
+        policy_cache_stats["coalesced"] += 1
+    else:
+        policy_cache_stats["misses"] += 1
+        record_cache("policy", hit=False)
+        future = asyncio.ensure_future(_load(policy_number, _generation_of(policy_number)))
+        _inflight[policy_number] = future
+        future.add_done_callback(lambda done: _inflight.pop(policy_number, None) if _inflight.get(policy_number) is done else None)
+
+    try:
+        policy = await asyncio.shield(future)
+    except Exception as e:
+        policy_cache_stats["errors"] += 1
+        print(f"❌ Error fetching policy {policy_number}: {e}")
+        return None
+    return dict(policy) if policy else None
+
+def _generation_of(policy_number: str) -> tuple:
+    return _generation, _generations.get(policy_number, 0)
+
+async def _load(policy_number: str, generation: tuple):
+    policy = await afetch_policy_by_number(policy_number, raise_on_error=True)
+    if _generation_of(policy_number) != generation:
+        # Invalidated while loading: the row may predate the change, so don't cache it
+        return policy
+    if policy:
+        _policies[policy_number] = policy
+    else:
+        _not_found[policy_number] = True
+    return policy
+
+async def prefetch_policies(policy_numbers) -> int:
+    """
+    Loads the policies not cached yet with one query, so bulk runs don't pay a round trip per
+    claim; the claims then hit the cache. Policies that don't exist are cached as not found.
+    Returns how many numbers were looked up. On a database error nothing is cached and each
+    claim falls back to its own lookup.
+    """
+    wanted = {number for number in policy_numbers if number}
+    missing = [number for number in wanted if number not in _policies and number not in _not_found and number not in _inflight]
+    if not missing:
+        return 0
+    generations = {number: _generation_of(number) for number in missing}
+    try:
+        found = await afetch_policies_by_numbers(missing, raise_on_error=True)
+    except Exception as e:
+        policy_cache_stats["errors"] += 1
+        logging.warning(f"Could not prefetch {len(missing)} policies: {e}")
+        return 0
+    for number in missing:
+        if _generation_of(number) != generations[number]:
+            continue  # invalidated while loading
+        if number in found:
+            _policies[number] = found[number]
+        else:
+            _not_found[number] = True
+    policy_cache_stats["prefetched"] += len(missing)
+    return len(missing)
+
+def invalidate_policy(policy_number: str = None):
+    """
+    Drops one policy (or every policy, when policy_number is None) from the cache.
+    """
+    global _generation
+    policy_cache_stats["invalidations"] += 1
+    if policy_number is None:
+        _generation += 1
+        _generations.clear()
+        _inflight.clear()
+        _policies.clear()
+        _not_found.clear()
+        return
+    _generations[policy_number] = _generations.get(policy_number, 0) + 1
+    _inflight.pop(policy_number, None)
+    _policies.pop(policy_number, None)
+    _not_found.pop(policy_number, None)
+
+def get_policy_cache_stats() -> dict:
+    lookups = sum(policy_cache_stats[key] for key in ("hits", "negative_hits", "misses", "coalesced"))
+    hit_rate = (policy_cache_stats["hits"] + policy_cache_stats["negative_hits"]) / lookups if lookups else 0.0
+    return {
+        **policy_cache_stats,
+        "hit_rate": round(hit_rate, 4),
+        "size": len(_policies),
+        "negative_size": len(_not_found),
+        "listening": _listener_conn is not None,
+    }
+
+def _on_policy_notify(connection, pid, channel, payload):
+    policy_number = payload.strip()
+    if policy_number.startswith("{"):
+        try:
+            policy_number = json.loads(policy_number).get("policyNumber", "")
+        except ValueError:
+            policy_number = ""
+    invalidate_policy(policy_number or None)
+
+def _on_listener_lost(connection):
+    """
+    Notifications sent while the listener is down are lost, so the cache can't be trusted:
+    clear it and reconnect in the background.
+    """
+    global _listener_conn, _listener_reconnect
+    if connection is not _listener_conn:
+        return
+    logging.warning("Policy change listener lost; clearing the policy cache and reconnecting")
+    _listener_conn = None
+    invalidate_policy()
+    if _listener_reconnect is None or _listener_reconnect.done():
+        _listener_reconnect = asyncio.ensure_future(_reconnect_listener())
+
+async def _reconnect_listener():
+    while _listener_conn is None:
+        await asyncio.sleep(POLICY_LISTEN_RETRY_SECONDS)
+        if await _connect_listener():
+            # Changes between the drop and now were never notified
+            invalidate_policy()
+
+async def _connect_listener() -> bool:
+    global _listener_conn
+    try:
+        connection = await asyncpg.connect(DATABASE_URL)
+        await connection.add_listener(POLICY_NOTIFY_CHANNEL, _on_policy_notify)
+        connection.add_termination_listener(_on_listener_lost)
+    except Exception as e:
+        logging.warning(f"Could not start policy change listener: {e}")
+        return False
+    _listener_conn = connection
+    logging.info(f"Listening for policy changes on '{POLICY_NOTIFY_CHANNEL}'")
+    return True
+
+async def start_policy_listener():
+    """
+    Subscribes to POLICY_NOTIFY_CHANNEL on a dedicated connection when POLICY_CACHE_LISTEN is set.
+    """
+    if not POLICY_CACHE_LISTEN or _listener_conn is not None:
+        return
+    await _connect_listener()
+
+async def stop_policy_listener():
+    global _listener_conn, _listener_reconnect
+    if _listener_reconnect is not None:
+        _listener_reconnect.cancel()
+        _listener_reconnect = None
+    if _listener_conn is not None:
+        connection, _listener_conn = _listener_conn, None
+        connection.remove_termination_listener(_on_listener_lost)
+        await connection.close()
@@ -1,8 +1,12 @@
-
 import os
+import time
+import asyncio
 import psycopg2
+import asyncpg
+from contextlib import asynccontextmanager
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
+from app_server.utils.metrics import track_io
 
 load_dotenv()
 
@@ -39,3 +43,125 @@ def fetch_policy_by_number(policy_number: str):
         return None
     finally:
         conn.close()
+
+# Process-wide asyncpg pool used by the graph nodes
+POSTGRES_POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN_SIZE", "2"))
+POSTGRES_POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", "20"))
+POSTGRES_MAX_CONN_LIFETIME = float(os.getenv("POSTGRES_MAX_CONN_LIFETIME", "1800"))
+POSTGRES_MAX_IDLE_SECONDS = float(os.getenv("POSTGRES_MAX_IDLE_SECONDS", "300"))
+POSTGRES_HEALTHCHECK_IDLE_SECONDS = float(os.getenv("POSTGRES_HEALTHCHECK_IDLE_SECONDS", "30"))
+POSTGRES_COMMAND_TIMEOUT = float(os.getenv("POSTGRES_COMMAND_TIMEOUT", "5"))
+
+# Only the columns read by policy_verification_node, coverage_node and the UI timeline
+POLICY_COLUMNS = 'id, "policyNumber", status, type, coverage'
+POLICY_BY_NUMBER_QUERY = f'SELECT {POLICY_COLUMNS} FROM public.policy WHERE "policyNumber" = $1'
+POLICIES_BY_NUMBERS_QUERY = f'SELECT {POLICY_COLUMNS} FROM public.policy WHERE "policyNumber" = ANY($1::text[])'
+
+class PooledConnection(asyncpg.Connection):
+    """
+    asyncpg connection that remembers its age and last use, for recycling and health checks.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+    def needs_recycle(self) -> bool:
+        return time.monotonic() - self.created_at > POSTGRES_MAX_CONN_LIFETIME
+
+    def needs_health_check(self) -> bool:
+        return time.monotonic() - self.last_used_at > POSTGRES_HEALTHCHECK_IDLE_SECONDS
+
+    def touch(self):
+        self.last_used_at = time.monotonic()
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+async def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    DATABASE_URL,
+                    min_size=POSTGRES_POOL_MIN_SIZE,
+                    max_size=POSTGRES_POOL_MAX_SIZE,
+                    max_inactive_connection_lifetime=POSTGRES_MAX_IDLE_SECONDS,
+                    command_timeout=POSTGRES_COMMAND_TIMEOUT,
+                    connection_class=PooledConnection,
+                )
+    return _pool
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+@asynccontextmanager
+async def acquire_connection():
+    """
+    Checks a healthy connection out of the pool.
+    Connections past POSTGRES_MAX_CONN_LIFETIME, or idle ones failing a ping, are replaced.
+    """
+    pool = await get_pool()
+    while True:
+        conn = await pool.acquire()
+        stale = conn.needs_recycle()
+        if not stale and conn.needs_health_check():
+            try:
+                await conn.execute("SELECT 1")
+            except Exception:
+                stale = True
+        if not stale:
+            break
+        # Terminated connections are transparently re-opened by the pool on next acquire
+        conn.terminate()
+        await pool.release(conn)
+
+    try:
+        yield conn
+    finally:
+        conn.touch()
+        await pool.release(conn)
+
+async def afetch_policy_by_number(policy_number: str, raise_on_error: bool = False):
+    """
+    Async variant of fetch_policy_by_number used by policy_verification_node.
+    asyncpg's per-connection statement cache prepares the query once per pooled connection.
+    With raise_on_error, database errors propagate instead of looking like "not found".
+    """
+    try:
+        # Pool wait counts as Postgres time too
+        with track_io("postgres", "fetch_policy_by_number"):
+            async with acquire_connection() as conn:
+                policy = await conn.fetchrow(POLICY_BY_NUMBER_QUERY, policy_number)
+        return dict(policy) if policy else None
+    except Exception as e:
+        if raise_on_error:
+            raise
+        print(f"❌ Error fetching policy {policy_number}: {e}")
+        return None
+
+async def afetch_policies_by_numbers(policy_numbers, raise_on_error: bool = False):
+    """
+    Batch lookup for bulk runs. Returns {policyNumber: policy} for the policies that exist.
+    With raise_on_error, database errors propagate instead of looking like "none found".
+    """
+    if not policy_numbers:
+        return {}
+    try:
+        with track_io("postgres", "fetch_policies_by_numbers"):
+            async with acquire_connection() as conn:
+                rows = await conn.fetch(POLICIES_BY_NUMBERS_QUERY, list(set(policy_numbers)))
+        return {row["policyNumber"]: dict(row) for row in rows}
+    except Exception as e:
+        if raise_on_error:
+            raise
+        print(f"❌ Error fetching policies {policy_numbers}: {e}")
+        return {}
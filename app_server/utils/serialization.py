@@ -0,0 +1,50 @@
+import orjson
+from decimal import Decimal
+from typing import Any, Iterable
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+# orjson handles datetime/date/UUID natively; non-str keys are stringified like json.dumps does
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def _default(obj):
+    # Postgres numeric columns arrive as Decimal, Mongo ids as ObjectId
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (ObjectId, bytes)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serializes claim state / API payloads to JSON bytes in a single pass.
+    """
+    return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson. Return it directly from an endpoint so FastAPI's
+    jsonable_encoder walk over the content is skipped.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def project(state: dict, fields: Iterable[str]) -> dict:
+    """
+    Picks fields from the state; dotted paths reach into nested dicts
+    (e.g. "document_data.results"). Missing fields are left out.
+    """
+    projected = {}
+    for field in fields:
+        value, found = state, True
+        for key in field.split("."):
+            if not isinstance(value, dict) or key not in value:
+                found = False
+                break
+            value = value[key]
+        if found:
+            projected[field] = value
+    return projected
@@ -1,29 +1,49 @@
 import os
-import requests
-import json
+import random
+import asyncio
 import logging
-from datetime import date, datetime
-from app_server.utils.claim_ui_mapper import map_claim_state_to_timeline
+from datetime import date
+from cachetools import TTLCache
+from opentelemetry.context import Context
+from app_server.agent.state import merge_decision, merge_node_metrics
+from app_server.utils.claim_ui_mapper import TimelineBuilder
+from app_server.utils.clients import http_client
+from app_server.utils.metrics import track_io, current_node
+from app_server.utils.serialization import dumps
+from app_server.utils.tracing import tracer, current_span_link
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, (date, datetime)):
-            return obj.isoformat()
-        return super(DateTimeEncoder, self).default(obj)
+# Intermediate states arriving within this window are coalesced into a single POST
+SYNC_DEBOUNCE_SECONDS = float(os.getenv("SYNC_DEBOUNCE_SECONDS", "0.5"))
 
-def sync_claim_state_to_backend(state: dict, current_step: str, status: str = "processing"):
+# Steps that end the workflow; these are flushed immediately instead of debounced
+TERMINAL_STEPS = {"settlement_complete"}
+
+# Bulk sender: payloads from many claims are grouped into one POST /agent/sync/bulk
+SYNC_BULK_ENABLED = os.getenv("SYNC_BULK_ENABLED", "true").lower() == "true"
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "50"))
+SYNC_BATCH_INTERVAL_SECONDS = float(os.getenv("SYNC_BATCH_INTERVAL_SECONDS", "0.25"))
+# Urgent (terminal) payloads wait only this long, so terminals from concurrent claims still share a batch
+SYNC_URGENT_LINGER_SECONDS = float(os.getenv("SYNC_URGENT_LINGER_SECONDS", "0.02"))
+SYNC_MAX_RETRIES = int(os.getenv("SYNC_MAX_RETRIES", "3"))
+SYNC_RETRY_BACKOFF_SECONDS = float(os.getenv("SYNC_RETRY_BACKOFF_SECONDS", "0.2"))
+
+# State keys left out of agentData: the backend already stores the FNOL submission, and
+# instrumentation is served on /metrics. Set to "" to send the whole state.
+SYNC_AGENT_DATA_EXCLUDE = {
+    key.strip() for key in os.getenv("SYNC_AGENT_DATA_EXCLUDE", "fnol_data,node_metrics").split(",") if key.strip()
+}
+
+# Send only the timeline steps that changed (stepHistoryPatch) after a claim's first sync.
+# Needs a backend that applies patches; otherwise the full stepHistory is sent every time.
+SYNC_TIMELINE_PATCH = os.getenv("SYNC_TIMELINE_PATCH", "false").lower() == "true"
+
+def map_backend_status(state: dict, status: str = "processing") -> str:
     """
-    Syncs the current ClaimAgentState to the Backend API for display in Admin Panel.
+    Map decision to backend expected status.
+    investigate -> manual_review, reject -> rejected, approve -> approved
     """
-    claim_id = state.get("claim_id")
-    if not claim_id:
-        logging.warning("No claim_id found in state, skipping sync.")
-        return
-
-    # Map decision to backend expected status
-    # investigate -> manual_review, reject -> rejected, approve -> approved
     backend_status = status
     if state.get("decision"):
         decision = state.get("decision").lower()
@@ -33,39 +53,355 @@ def sync_claim_state_to_backend(state: dict, current_step: str, status: str = "p
             backend_status = "rejected"
         elif decision == "approve":
             backend_status = "approved"
+    return backend_status
+
+def merge_sync_state(accumulated: dict, state: dict, delta: dict) -> dict:
+    """
+    Folds a node's input state and its own output (delta) into the claim's accumulated state,
+    applying the graph's reducers. Parallel branches start from the same input state, so
+    anything in `accumulated` their input lacks was added by a sibling and is kept.
+    """
+    merged = {**accumulated, **state}
+    # reasoning is append-only: the longer of the two lists already contains the other
+    merged["reasoning"] = max(accumulated.get("reasoning") or [], state.get("reasoning") or [], key=len)
+    merged["node_metrics"] = merge_node_metrics(accumulated.get("node_metrics"), state.get("node_metrics"))
+    merged["decision"] = merge_decision(accumulated.get("decision"), state.get("decision"))
+    for key, value in delta.items():
+        if key == "reasoning":
+            merged[key] = merged[key] + list(value or [])
+        elif key == "node_metrics":
+            merged[key] = merge_node_metrics(merged[key], value)
+        elif key == "decision":
+            merged[key] = merge_decision(merged[key], value)
+        else:
+            merged[key] = value
+    if not merged["node_metrics"]:
+        merged.pop("node_metrics")
+    if merged["decision"] is None:
+        merged.pop("decision")
+    return merged
+
+class BulkSyncSender:
+    """
+    Groups serialized ApplicationProcessCreate payloads into bulk requests.
+
+    A batch is flushed when it reaches SYNC_BATCH_SIZE, after SYNC_BATCH_INTERVAL_SECONDS,
+    or after a short linger once an urgent (terminal) payload is queued. If the backend does not expose the bulk
+    route (404/405), the sender falls back to single POST /agent/sync calls for good.
+    on_rejected, if set, is called with the ids of payloads that were not applied: failed
+    after the retries, or refused as a step history conflict (409, or listed under
+    "conflicts" in the bulk response).
+    """
+
+    def __init__(self, batch_size: int = SYNC_BATCH_SIZE, interval_seconds: float = SYNC_BATCH_INTERVAL_SECONDS,
+                 bulk_enabled: bool = SYNC_BULK_ENABLED):
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.bulk_supported = bulk_enabled
+        # applicationId -> serialized payload; a newer payload for the same claim replaces the queued one
+        self._pending = {}
+        # applicationId -> link to the span that queued it; a batch spans several claims' traces
+        self._links = {}
+        self._flush_now = asyncio.Event()
+        self._urgent = False
+        self._closing = False
+        self._task = None
+        self.on_rejected = None
+        self.stats = {"payloads": 0, "bulk_requests": 0, "single_requests": 0, "failed": 0, "conflicts": 0}
+
+    def enqueue(self, application_id: str, body: bytes, urgent: bool = False):
+        self._pending.pop(application_id, None)
+        self._pending[application_id] = body
+        self._links[application_id] = current_span_link()
+        self.stats["payloads"] += 1
+        if urgent:
+            self._urgent = True
+            self._flush_now.set()
+        elif len(self._pending) >= self.batch_size:
+            self._flush_now.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def is_pending(self, application_id: str) -> bool:
+        return application_id in self._pending
+
+    async def close(self):
+        if self._task and not self._task.done():
+            self._closing = True
+            self._flush_now.set()
+            await self._task
+        self._closing = False
+
+    async def _run(self):
+        while self._pending:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            if self._urgent and not self._closing and len(self._pending) < self.batch_size:
+                await asyncio.sleep(SYNC_URGENT_LINGER_SECONDS)
+            self._urgent = False
+
+            batch = list(self._pending.items())[:self.batch_size]
+            for application_id, _ in batch:
+                del self._pending[application_id]
+            if len(self._pending) >= self.batch_size or self._closing:
+                self._flush_now.set()
+
+            await self._send_batch(batch)
+
+    async def _send_batch(self, batch):
+        # Own trace (not the claim that happened to start the sender task), linked to every claim in it
+        links = [link for link in (self._links.pop(application_id, None) for application_id, _ in batch) if link]
+        with tracer.start_as_current_span("backend_sync.batch", context=Context(), links=links,
+                                          attributes={"sync.batch_size": len(batch)}):
+            await self._send_batch_traced(batch)
+
+    async def _send_batch_traced(self, batch):
+        if self.bulk_supported and len(batch) > 1:
+            body = b"[" + b",".join(payload for _, payload in batch) + b"]"
+            response = await self._post("/agent/sync/bulk", body)
+            if response is not None and response.status_code in (404, 405):
+                logging.warning("Backend does not support /agent/sync/bulk, falling back to single syncs.")
+                self.bulk_supported = False
+            else:
+                self.stats["bulk_requests"] += 1
+                if response is None or response.status_code >= 400:
+                    self.stats["failed"] += len(batch)
+                    self._rejected([application_id for application_id, _ in batch])
+                else:
+                    logging.info(f"✅ Bulk-synced {len(batch)} claim states to backend.")
+                    try:
+                        conflicts = response.json().get("conflicts") or []
+                    except Exception:
+                        conflicts = []
+                    self.stats["conflicts"] += len(conflicts)
+                    self._rejected(conflicts)
+                return
+
+        await asyncio.gather(*(self._send_single(application_id, payload) for application_id, payload in batch))
+
+    async def _send_single(self, application_id: str, payload: bytes):
+        response = await self._post("/agent/sync", payload)
+        self.stats["single_requests"] += 1
+        if response is None or response.status_code >= 400:
+            self.stats["conflicts" if response is not None and response.status_code == 409 else "failed"] += 1
+            self._rejected([application_id])
+        else:
+            logging.info(f"✅ Synced claim state to backend for {application_id}.")
 
-    # Fetch existing step history to preserve manual completions
-    existing_step_history = None
-    try:
-        response = requests.get(f"{BACKEND_URL}/agent/application/{claim_id}", timeout=2)
-        if response.status_code == 200:
-            existing_data = response.json()
-            existing_step_history = existing_data.get("stepHistory")
-    except Exception as e:
-        logging.debug(f"Could not fetch existing step history: {e}")
-    
-    # Map state to UI step history
-    step_history = map_claim_state_to_timeline(state, existing_step_history)
-    
-    # Prepare payload matching schemas.ApplicationProcessCreate
-    payload = {
-        "applicationId": claim_id,
-        "status": backend_status,
-        "currentStep": current_step,
-        "agentData": state, 
-        "stepHistory": step_history,
-        "startTime": date.today().isoformat()
-    }
-    
-    try:
-        # Handle potential non-serializable objects (like datetime)
-        json_str = json.dumps(payload, cls=DateTimeEncoder)
-        payload_dict = json.loads(json_str) 
-        
-        response = requests.post(f"{BACKEND_URL}/agent/sync", json=payload_dict, timeout=5)
-        if response.status_code >= 400:
-             logging.error(f"Backend sync failed: {response.status_code} - {response.text}")
+    def _rejected(self, application_ids):
+        if self.on_rejected is not None and application_ids:
+            self.on_rejected(application_ids)
+
+    async def _post(self, path: str, body: bytes):
+        """
+        POST with bounded retries and jittered exponential backoff on 5xx / transport errors.
+        Returns the last response, or None if every attempt failed at the transport level.
+        """
+        response = None
+        for attempt in range(SYNC_MAX_RETRIES + 1):
+            try:
+                # Sent in the background, so not charged to any node
+                with track_io("backend_sync", f"sync_post {path}", per_node=False):
+                    response = await http_client.post(
+                        f"{BACKEND_URL}{path}",
+                        content=body,
+                        headers={"Content-Type": "application/json"},
+                        timeout=5
+                    )
+                if response.status_code < 500:
+                    if response.status_code >= 400 and response.status_code not in (404, 405, 409):
+                        logging.error(f"Backend sync failed: {response.status_code} - {response.text}")
+                    return response
+                logging.warning(f"Backend sync attempt {attempt + 1} got {response.status_code}")
+            except Exception as e:
+                logging.warning(f"Backend sync attempt {attempt + 1} failed: {e}")
+            if attempt < SYNC_MAX_RETRIES:
+                await asyncio.sleep(SYNC_RETRY_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random()))
+
+        logging.error(f"❌ Error syncing claim(s) to backend after {SYNC_MAX_RETRIES + 1} attempts ({path})")
+        return response
+
+class BackendSyncManager:
+    """
+    Background sync of claim state to the Admin backend.
+
+    Each claim has a single latest-state slot: a newer state replaces a queued older one,
+    and one worker task per claim debounces and sends whatever is in the slot. Step history
+    is fetched from the backend once per claim; after that a TimelineBuilder per claim
+    re-renders only the steps of the nodes that ran since the previous send.
+    """
+
+    def __init__(self, debounce_seconds: float = SYNC_DEBOUNCE_SECONDS, sender: BulkSyncSender = None):
+        self.debounce_seconds = debounce_seconds
+        self.sender = sender or BulkSyncSender()
+        self._latest = {}      # claim_id -> (state, current_step, status)
+        self._terminal = set() # claims whose next send must not be debounced
+        self._wakeups = {}     # claim_id -> asyncio.Event cutting the debounce short
+        self._tasks = {}       # claim_id -> worker task
+        self._dirty_nodes = {}  # claim_id -> nodes that ran since the last send (None: unknown, render all)
+        self._timelines = TTLCache(maxsize=10000, ttl=3600)
+        # claim_id -> state accumulated from every node's own output during the current run
+        self._states = TTLCache(maxsize=10000, ttl=3600)
+        # claim_id -> (base version, step ids) of a patch still waiting in the sender
+        self._unflushed = {}
+        # Claims whose last payload the backend didn't apply: their next send is the full stepHistory
+        self._resync = set()
+        self.sender.on_rejected = self._on_rejected
+        # Batch re-processing can turn syncing off so historical runs don't overwrite the Admin panel
+        self.enabled = True
+
+    def reset(self, claim_id: str):
+        """
+        Forgets the claim's accumulated state; called when a fresh run of the claim starts.
+        """
+        self._states.pop(claim_id, None)
+
+    def submit(self, state: dict, current_step: str, status: str = "processing", terminal: bool = False, delta: dict = None):
+        """
+        Queues the state for sync and returns immediately. delta is what the submitting node
+        returned; state is then its input state.
+        """
+        if not self.enabled:
+            return
+        claim_id = state.get("claim_id")
+        if not claim_id:
+            logging.warning("No claim_id found in state, skipping sync.")
+            return
+
+        # Parallel branches each submit the state they started from plus their own output;
+        # merging into the claim's accumulated state keeps what a sibling already sent
+        state = merge_sync_state(self._states.get(claim_id, {}), state, delta or {})
+        self._states[claim_id] = state
+        self._latest[claim_id] = (state, current_step, status)
+        node = current_node()
+        dirty = self._dirty_nodes.setdefault(claim_id, set())
+        if node is None or dirty is None:
+            self._dirty_nodes[claim_id] = None
+        else:
+            dirty.add(node)
+        if terminal or current_step in TERMINAL_STEPS:
+            self._terminal.add(claim_id)
+            if claim_id in self._wakeups:
+                self._wakeups[claim_id].set()
+
+        if claim_id not in self._tasks:
+            self._wakeups[claim_id] = asyncio.Event()
+            self._tasks[claim_id] = asyncio.create_task(self._run(claim_id))
+
+    def _on_rejected(self, claim_ids):
+        # Finished claims have no timeline left; their next sync starts from scratch anyway
+        self._resync.update(claim_id for claim_id in claim_ids if claim_id in self._timelines)
+
+    async def flush(self, claim_id: str = None):
+        """
+        Sends pending states now (for one claim, or all claims) and waits for completion.
+        """
+        claim_ids = [claim_id] if claim_id else list(self._tasks)
+        for cid in claim_ids:
+            if cid in self._tasks:
+                self._terminal.add(cid)
+                self._wakeups[cid].set()
+        tasks = [self._tasks[cid] for cid in claim_ids if cid in self._tasks]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        await self.flush()
+        await self.sender.close()
+
+    async def _run(self, claim_id: str):
+        try:
+            while claim_id in self._latest:
+                if claim_id not in self._terminal:
+                    wakeup = self._wakeups[claim_id]
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), timeout=self.debounce_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    wakeup.clear()
+
+                state, current_step, status = self._latest.pop(claim_id)
+                nodes = self._dirty_nodes.pop(claim_id, None)
+                await self._send(claim_id, state, current_step, status, nodes, urgent=claim_id in self._terminal)
+        finally:
+            self._tasks.pop(claim_id, None)
+            self._wakeups.pop(claim_id, None)
+            if claim_id in self._terminal:
+                self._terminal.discard(claim_id)
+                self._timelines.pop(claim_id, None)
+                self._states.pop(claim_id, None)
+                self._unflushed.pop(claim_id, None)
+                self._resync.discard(claim_id)
+
+    async def _get_step_history(self, claim_id: str):
+        # Fetched once per claim (when its TimelineBuilder is created) to preserve manual completions
+        existing_step_history = None
+        try:
+            with track_io("backend_sync", "sync_get_step_history", per_node=False):
+                response = await http_client.get(f"{BACKEND_URL}/agent/application/{claim_id}", timeout=2)
+            if response.status_code == 200:
+                existing_data = response.json()
+                existing_step_history = existing_data.get("stepHistory")
+        except Exception as e:
+            logging.debug(f"Could not fetch existing step history: {e}")
+        return existing_step_history
+
+    async def _send(self, claim_id: str, state: dict, current_step: str, status: str, nodes=None, urgent: bool = False):
+        timeline = self._timelines.get(claim_id)
+        if timeline is None:
+            timeline = TimelineBuilder(await self._get_step_history(claim_id))
+            self._timelines[claim_id] = timeline
+        base_version = timeline.version
+        changed = set(timeline.update(state, nodes))
+
+        # Prepare payload matching schemas.ApplicationProcessCreate
+        payload = {
+            "applicationId": claim_id,
+            "status": map_backend_status(state, status),
+            "currentStep": current_step,
+            "agentData": {key: value for key, value in state.items() if key not in SYNC_AGENT_DATA_EXCLUDE},
+            "startTime": date.today().isoformat()
+        }
+        resync = claim_id in self._resync
+        if resync:
+            # The backend missed a payload, so its version no longer matches ours: send it all
+            self._resync.discard(claim_id)
+            base_version = 0
+        if SYNC_TIMELINE_PATCH:
+            # A newer payload replaces a queued one in the sender, so carry the queued patch's steps over
+            if not resync and self.sender.is_pending(claim_id) and claim_id in self._unflushed:
+                pending_base, pending_steps = self._unflushed[claim_id]
+                base_version, changed = pending_base, changed | pending_steps
+            self._unflushed[claim_id] = (base_version, changed)
+        if not SYNC_TIMELINE_PATCH:
+            payload["stepHistory"] = timeline.step_history
+        elif base_version == 0:
+            payload["stepHistory"] = timeline.step_history
+            payload["stepHistoryVersion"] = timeline.version
         else:
-             logging.info(f"✅ Synced claim state to backend for {claim_id}. Step: {current_step}")
-    except Exception as e:
-        logging.error(f"❌ Error syncing claim to backend: {e}")
+            payload["stepHistoryPatch"] = {
+                "baseVersion": base_version,
+                "version": timeline.version,
+                "steps": [timeline.steps[step_id] for step_id in sorted(changed)],
+            }
+
+        try:
+            # datetimes / Decimals are handled by the encoder
+            body = dumps(payload)
+        except Exception as e:
+            logging.error(f"❌ Error serializing claim state for {claim_id}: {e}")
+            return
+        self.sender.enqueue(claim_id, body, urgent=urgent)
+
+sync_manager = BackendSyncManager()
+
+def sync_claim_state_to_backend(state: dict, current_step: str, status: str = "processing", terminal: bool = False, delta: dict = None):
+    """
+    Syncs the current ClaimAgentState to the Backend API for display in Admin Panel.
+    Non-blocking: the state is queued and sent by the background sync manager. Nodes pass
+    their input state and their own output as delta.
+    """
+    sync_manager.submit(state, current_step, status=status, terminal=terminal, delta=delta)
@@ -0,0 +1,110 @@
+import os
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# Text-layer fast path: born-digital PDFs are read from their embedded text instead of vision
+TEXT_FAST_PATH_ENABLED = os.getenv("TEXT_FAST_PATH_ENABLED", "true").lower() == "true"
+# Minimum alphanumeric characters for the text layer to be trusted
+TEXT_FAST_PATH_MIN_CHARS = int(os.getenv("TEXT_FAST_PATH_MIN_CHARS", "200"))
+# Categories without a regex extractor go to a text-only chat call when enabled
+TEXT_LLM_ENABLED = os.getenv("TEXT_LLM_ENABLED", "true").lower() == "true"
+TEXT_LLM_MAX_CHARS = int(os.getenv("TEXT_LLM_MAX_CHARS", "12000"))
+REGEX_CONFIDENCE = 0.9
+
+# How each document was read: cache, regex, text_llm or vision
+extraction_path_stats = Counter()
+
+AMOUNT = r"(?:rs\.?|inr|₹)?\s*([\d,]+(?:\.\d{1,2})?)"
+DATE = r"(\d{4}-\d{2}-\d{2}|\d{1,2}[/.\-]\d{1,2}[/.\-]\d{2,4}|\d{1,2}[\s\-][A-Za-z]{3,9}[\s\-,]+\d{4})"
+SEP = r"\s*[:\-]?\s*"
+# Day-first, as on Indian documents
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%y", "%d-%m-%y", "%d %b %Y", "%d %B %Y", "%d-%b-%Y"]
+
+def record_extraction_path(path: str):
+    extraction_path_stats[path] += 1
+
+def get_extraction_path_stats() -> dict:
+    read = extraction_path_stats["regex"] + extraction_path_stats["text_llm"] + extraction_path_stats["vision"]
+    avoided = read - extraction_path_stats["vision"]
+    return {**extraction_path_stats, "vision_avoided_ratio": round(avoided / read, 4) if read else 0.0}
+
+def has_usable_text(text: str) -> bool:
+    return sum(ch.isalnum() for ch in text) >= TEXT_FAST_PATH_MIN_CHARS
+
+def _first(pattern: str, text: str) -> Optional[str]:
+    match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+    return match.group(1).strip() if match else None
+
+def _iso_date(value: Optional[str]) -> Optional[str]:
+    """
+    Normalizes to YYYY-MM-DD so it compares with fnol dates; unknown formats are kept as-is.
+    """
+    if not value:
+        return None
+    cleaned = re.sub(r"[\s,]+", " ", value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return value
+
+def _total_amount(text: str) -> Optional[str]:
+    # Most specific label wins; the last occurrence is the final total on multi-page bills
+    for label in (r"grand\s+total", r"net\s+payable", r"amount\s+payable", r"(?<!sub)\btotal\s+amount", r"bill\s+amount", r"(?<!sub)\btotal\b"):
+        matches = re.findall(label + SEP + AMOUNT, text, re.IGNORECASE)
+        if matches:
+            return matches[-1]
+    return None
+
+def extract_hospital_bill(text: str) -> Dict[str, Any]:
+    return {
+        "hospital_name": _first(r"^(.*\b(?:hospital|clinic|medical cent(?:er|re))\b.*)$", text),
+        "patient_name": _first(r"patient(?:'s)?\s+name" + SEP + r"(.+)", text),
+        "total_amount": _total_amount(text),
+        "date_of_admission": _iso_date(_first(r"(?:date\s+of\s+admission|admission\s+date|admitted\s+on|\bdoa\b)" + SEP + DATE, text)),
+        "date_of_discharge": _iso_date(_first(r"(?:date\s+of\s+discharge|discharge\s+date|discharged\s+on|\bdod\b)" + SEP + DATE, text)),
+    }
+
+def extract_death_certificate(text: str) -> Dict[str, Any]:
+    return {
+        "name_of_deceased": _first(r"name\s+of\s+(?:the\s+)?deceased" + SEP + r"(.+)", text),
+        "date_of_death": _iso_date(_first(r"date\s+of\s+death" + SEP + DATE, text)),
+        "cause_of_death": _first(r"cause\s+of\s+death" + SEP + r"(.+)", text),
+        "registration_number": _first(r"registration\s+(?:no\.?|number)" + SEP + r"([A-Z0-9/\-]+)", text),
+    }
+
+def extract_rc_copy(text: str) -> Dict[str, Any]:
+    return {
+        "registration_number": _first(r"(?:registration|regn\.?|reg\.?)\s+(?:no\.?|number)" + SEP + r"([A-Z]{2}[\s\-]?\d{1,2}[\s\-]?[A-Z]{0,3}[\s\-]?\d{1,4})", text),
+        "owner_name": _first(r"owner(?:'s)?\s+name" + SEP + r"(.+)", text),
+        "chassis_number": _first(r"chassis\s+(?:no\.?|number)" + SEP + r"([A-Z0-9]{6,20})", text),
+        "engine_number": _first(r"engine\s+(?:no\.?|number)" + SEP + r"([A-Z0-9]{5,20})", text),
+    }
+
+# category -> (extractor, fields that must be found for the result to be used)
+REGEX_EXTRACTORS = {
+    "hospital-bills": (extract_hospital_bill, ["total_amount"]),
+    "death-certificate": (extract_death_certificate, ["name_of_deceased", "date_of_death"]),
+    "rc-copy": (extract_rc_copy, ["registration_number", "chassis_number"]),
+}
+
+def extract_with_regex(doc_type_hint: str, text: str) -> Optional[Dict[str, Any]]:
+    """
+    Deterministic extraction for known categories. Returns None when the category has no
+    extractor or a required field is missing, so the caller falls back to a model.
+    """
+    if doc_type_hint not in REGEX_EXTRACTORS:
+        return None
+    extractor, required = REGEX_EXTRACTORS[doc_type_hint]
+    fields = extractor(text)
+    if any(not fields.get(field) for field in required):
+        return None
+    return {
+        "document_type": doc_type_hint,
+        "extracted_data": {key: value for key, value in fields.items() if value},
+        "confidence": REGEX_CONFIDENCE,
+        "extraction_method": "text_regex",
+    }
@@ -0,0 +1,84 @@
+import os
+import logging
+from contextlib import contextmanager
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+# End-to-end traces per claim: run -> node -> external call. Off unless TRACING_ENABLED=true.
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+# console | file | otlp
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file").lower()
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
+# Also trace LangChain/LangGraph internals and LLM attributes via openinference
+TRACING_OPENINFERENCE = os.getenv("TRACING_OPENINFERENCE", "false").lower() == "true"
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "insurance-claim-agent")
+
+# Until init_tracing() installs a provider this is a no-op tracer
+tracer = trace.get_tracer("app_server")
+
+_provider = None
+_trace_file = None
+
+def _build_exporter():
+    global _trace_file
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    if TRACING_EXPORTER == "console":
+        return ConsoleSpanExporter()
+    # One JSON span per line, for offline analysis without a collector
+    _trace_file = open(TRACING_FILE_PATH, "a")
+    return ConsoleSpanExporter(out=_trace_file, formatter=lambda span: span.to_json(indent=None) + "\n")
+
+def init_tracing():
+    """
+    Installs the tracer provider (ratio sampling, honouring the parent's decision). Idempotent.
+    """
+    global _provider
+    if not TRACING_ENABLED or _provider is not None:
+        return
+    try:
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": SERVICE_NAME}),
+            sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATIO)),
+        )
+        provider.add_span_processor(BatchSpanProcessor(_build_exporter()))
+        trace.set_tracer_provider(provider)
+        _provider = provider
+        if TRACING_OPENINFERENCE:
+            from openinference.instrumentation.langchain import LangChainInstrumentor
+            LangChainInstrumentor().instrument(tracer_provider=provider)
+        logging.info(f"Tracing enabled ({TRACING_EXPORTER}, sample ratio {TRACING_SAMPLE_RATIO}).")
+    except Exception as e:
+        logging.warning(f"Tracing disabled, could not initialise: {e}")
+
+def shutdown_tracing():
+    """
+    Flushes pending spans.
+    """
+    global _provider, _trace_file
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = None
+    if _trace_file is not None:
+        _trace_file.close()
+        _trace_file = None
+
+@contextmanager
+def traced(name: str, **attributes):
+    """
+    Span for in-process work that is not an external call (e.g. the PDF render).
+    """
+    with tracer.start_as_current_span(name, attributes=attributes) as span:
+        yield span
+
+def current_span_link():
+    """
+    Link to the current span, for work that is batched across claims (backend bulk sync).
+    """
+    span_context = trace.get_current_span().get_span_context()
+    return trace.Link(span_context) if span_context.is_valid else None
@@ -0,0 +1,413 @@
+"""
+Load test for POST /submit_claim against local stand-ins for every external service.
+
+    python -m benchmarks.bench_claims --claims 200 --concurrency 20
+    python -m benchmarks.bench_claims --claims 500 --concurrency 50 --azure-latency-ms 1500 --azure-error-rate 0.02
+    python -m benchmarks.bench_claims --output after.json --baseline before.json   # exit 1 on regression
+    python -m benchmarks.bench_claims --deployments eastus,westeurope=2000:0.3   # route over two stub deployments
+    VISION_HEDGING_ENABLED=true python -m benchmarks.bench_claims --azure-jitter-ms 1500 --deployments a,b
+
+By default benchmarks.stub_services (Azure OpenAI, blob storage, Admin backend) is started in
+a child process, the app runs in this process behind an ASGI transport, and Postgres/Mongo
+are replaced by in-memory stand-ins with --db-latency-ms of simulated latency. --real-db runs
+the app's normal startup against MONGO_URI / DATABASE_URL instead (policies BENCH-<TYPE>-NNN
+must exist). --url drives an already running server; it must be configured to use the stubs.
+
+Claims are a mix of life / health / car with the mandatory documents for each type. Unless
+--shared-documents is given every claim gets its own document bytes, so the extraction cache
+starts cold. Reports throughput, per-claim and per-node p50/p95/p99 and process memory.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import subprocess
+from collections import Counter, defaultdict
+import httpx
+
+CLAIM_DOCUMENTS = {
+    "life": ["death-certificate", "bank-details"],
+    "health": ["claim-form", "hospital-bills", "discharge-summary"],
+    "car": ["claim-form", "rc-copy", "driving-license", "damage-photos"],
+}
+DOCUMENT_EXTENSIONS = {"death-certificate": "pdf", "rc-copy": "pdf", "hospital-bills": "pdf", "claim-form": "pdf",
+                       "policy-document": "pdf"}
+
+# Ignore p95 growth below this many ms when comparing against a baseline (timer noise)
+REGRESSION_MIN_DELTA_MS = 5.0
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def summarize(values) -> dict:
+    return {"n": len(values), "mean": sum(values) / len(values), "p50": percentile(values, 50),
+            "p95": percentile(values, 95), "p99": percentile(values, 99)}
+
+def policy_number(claim_type: str, index: int, policies: int) -> str:
+    return f"BENCH-{claim_type.upper()}-{index % policies:03d}"
+
+def make_claim(run_id: str, index: int, claim_type: str, stub_url: str, policies: int, shared_documents: bool,
+               categories: list = None) -> dict:
+    claim_id = f"{run_id}-{index:06d}"
+    salt = "shared" if shared_documents else claim_id
+    documents = [
+        {"filename": f"{category}.{DOCUMENT_EXTENSIONS.get(category, 'jpg')}", "category": category,
+         "url": f"{stub_url}/blob/{salt}/{category}.{DOCUMENT_EXTENSIONS.get(category, 'jpg')}"}
+        for category in categories or CLAIM_DOCUMENTS[claim_type]
+    ]
+    number = policy_number(claim_type, index, policies)
+    fnol = {"user_id": "bench-user", "policy_id": number, "policyNumber": number, "claim_type": claim_type,
+            "status": "submitted", "documents": documents}
+    # Names and dates match the stub fixtures, so proof verification passes
+    if claim_type == "life":
+        fnol["claimant_info"] = {"name": "John Doe"}
+        fnol["death_details"] = {"date_of_death": "2024-01-01", "cause_of_death": "Cardiac arrest"}
+    elif claim_type == "health":
+        fnol["claimant_info"] = {"name": "Ravi Kumar"}
+        fnol["hospitalization_details"] = {"admission_date": "2024-03-12", "hospital_name": "City Care Hospital"}
+        fnol["incident_details"] = {"incident_date": "2024-03-12"}
+    else:
+        fnol["claimant_info"] = {"name": "John Doe"}
+        fnol["accident_details"] = {"accident_type": "collision", "accident_date": "2024-05-02"}
+        fnol["estimated_amount"] = 85000
+    return {"claim_id": claim_id, "policy_id": number, "fnol_data": fnol}
+
+def parse_deployments(value: str) -> dict:
+    """
+    "name[=latency_ms[:throttle_rate]],..." -> stub overrides per deployment name.
+    """
+    deployments = {}
+    for part in value.split(","):
+        name, _, settings = part.partition("=")
+        latency, _, throttle = settings.partition(":")
+        deployments[name] = {key: float(setting) for key, setting in (("latency_ms", latency), ("throttle_rate", throttle)) if setting}
+    return deployments
+
+def parse_mix(value: str) -> list:
+    weights = {}
+    for part in value.split(","):
+        claim_type, _, weight = part.partition("=")
+        if claim_type not in CLAIM_DOCUMENTS:
+            raise argparse.ArgumentTypeError(f"unknown claim type '{claim_type}'")
+        weights[claim_type] = float(weight or 1)
+    return [claim_type for claim_type, weight in weights.items() for _ in range(int(weight * 10))]
+
+class InMemoryCollection:
+    """
+    Mongo stand-in for the extraction cache: the calls it makes, keyed by _id.
+    """
+
+    def __init__(self, latency_seconds: float):
+        self.latency_seconds = latency_seconds
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        await asyncio.sleep(self.latency_seconds)
+        return self.docs.get(query.get("_id"))
+
+    async def replace_one(self, query, doc, upsert=False):
+        await asyncio.sleep(self.latency_seconds)
+        self.docs[query["_id"]] = {"_id": query["_id"], **doc}
+
+    async def create_index(self, *args, **kwargs):
+        return None
+
+    async def estimated_document_count(self):
+        return len(self.docs)
+
+    async def delete_many(self, query):
+        for key in query["_id"]["$in"]:
+            self.docs.pop(key, None)
+
+def install_stand_ins(db_latency_ms: float, policies: int):
+    """
+    Swaps the Postgres policy lookup, the Mongo claim lookup and the extraction cache's
+    collection for in-memory versions. Calls are still timed as postgres / mongo I/O.
+    """
+    import app_server.utils.policy_cache as policy_cache
+    import app_server.utils.extraction_cache as extraction_cache
+    import app_server.agent.nodes.fnol_node as fnol_node
+    from app_server.utils.metrics import track_io
+
+    latency = db_latency_ms / 1000
+    table = {
+        policy_number(claim_type, index, policies): {
+            "id": f"{claim_type}-{index}", "policyNumber": policy_number(claim_type, index, policies),
+            "status": "Active", "type": claim_type, "coverage": 2000000,
+        }
+        for claim_type in CLAIM_DOCUMENTS for index in range(policies)
+    }
+
+    async def fetch_policy(number, raise_on_error=False):
+        with track_io("postgres", "fetch_policy_by_number"):
+            await asyncio.sleep(latency)
+            return table.get(number)
+
+    async def get_claim(claim_id):
+        with track_io("mongo", "get_claim_by_id"):
+            await asyncio.sleep(latency)
+            return None
+
+    policy_cache.afetch_policy_by_number = fetch_policy
+    fnol_node.aget_claim_by_id = get_claim
+    extraction_cache._collection = InMemoryCollection(latency)
+
+def start_stubs(port: int, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "STUB_AZURE_LATENCY_MS": str(args.azure_latency_ms),
+        "STUB_AZURE_PER_IMAGE_MS": str(args.azure_per_image_ms),
+        "STUB_AZURE_JITTER_MS": str(args.azure_jitter_ms),
+        "STUB_AZURE_ERROR_RATE": str(args.azure_error_rate),
+        "STUB_AZURE_THROTTLE_RATE": str(args.azure_throttle_rate),
+        "STUB_BLOB_LATENCY_MS": str(args.blob_latency_ms),
+        "STUB_BACKEND_LATENCY_MS": str(args.backend_latency_ms),
+        "STUB_AZURE_DEPLOYMENTS": json.dumps(getattr(args, "deployments", None) or {}),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.stub_services:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+async def wait_until_up(url: str, process: subprocess.Popen = None, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"stub services exited with code {process.returncode}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            await asyncio.sleep(0.2)
+
+def local_rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+async def remote_rss_bytes(client: httpx.AsyncClient) -> int:
+    response = await client.get("/metrics")
+    for line in response.text.splitlines():
+        if line.startswith("process_resident_memory_bytes "):
+            return int(float(line.split()[1]))
+    return 0
+
+class ClaimLoad:
+    """
+    Submits claims with bounded concurrency and collects latencies, node timings and memory.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, concurrency: int, remote: bool):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.remote = remote
+        self.claim_ms = []
+        self.node_ms = defaultdict(list)
+        self.node_io_ms = defaultdict(list)
+        self.statuses = Counter()
+        self.decisions = Counter()
+        self.rss_samples = []
+
+    async def submit(self, claim: dict, record: bool = True):
+        async with self.semaphore:
+            start = time.perf_counter()
+            response = await self.client.post("/submit_claim", params={"fields": "node_metrics"}, json=claim)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        if not record:
+            return
+        self.statuses[response.status_code] += 1
+        if response.status_code != 200:
+            return
+        body = response.json()
+        self.claim_ms.append(elapsed_ms)
+        self.decisions[body.get("decision")] += 1
+        for node, metrics in (body.get("state", {}).get("node_metrics") or {}).items():
+            self.node_ms[node].append(metrics["wall_ms"])
+            self.node_io_ms[node].append(sum(metrics.get("io_ms", {}).values()))
+
+    async def sample_memory(self, interval: float = 0.25):
+        while True:
+            self.rss_samples.append(await remote_rss_bytes(self.client) if self.remote else local_rss_bytes())
+            await asyncio.sleep(interval)
+
+    async def warm_up(self, claims: list):
+        await asyncio.gather(*(self.submit(claim, record=False) for claim in claims))
+
+    async def run(self, claims: list) -> float:
+        sampler = asyncio.create_task(self.sample_memory())
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(self.submit(claim) for claim in claims))
+        finally:
+            sampler.cancel()
+        return time.perf_counter() - start
+
+    def results(self, wall: float, config: dict) -> dict:
+        mb = [sample / 2**20 for sample in self.rss_samples] or [0.0]
+        return {
+            "config": config,
+            "wall_s": wall,
+            "throughput": len(self.claim_ms) / wall if wall else 0.0,
+            "statuses": {str(status): count for status, count in self.statuses.items()},
+            "decisions": dict(self.decisions),
+            "claim_ms": summarize(self.claim_ms) if self.claim_ms else {},
+            "nodes": {node: {**summarize(values), "io_sum_mean": sum(self.node_io_ms[node]) / len(values)}
+                      for node, values in self.node_ms.items()},
+            "memory_mb": {"start": mb[0], "peak": max(mb), "end": mb[-1]},
+        }
+
+def report(results: dict, stub_stats: dict = None):
+    config = results["config"]
+    print(f"\n--- Claim benchmark: {config['claims']} claims, concurrency {config['concurrency']} ---")
+    print(f"wall={results['wall_s']:.2f}s throughput={results['throughput']:.2f} claims/s "
+          f"statuses={results['statuses']} decisions={results['decisions']}")
+    if results["claim_ms"]:
+        claim_ms = results["claim_ms"]
+        print(f"per claim: p50={claim_ms['p50']:.1f}ms p95={claim_ms['p95']:.1f}ms p99={claim_ms['p99']:.1f}ms")
+    if results["nodes"]:
+        # I/O of concurrent calls inside a node is summed, so it can exceed the node's wall time
+        print(f"{'node':<28}{'n':>7}{'mean':>10}{'io sum':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for node, s in results["nodes"].items():
+            print(f"{node:<28}{s['n']:>7}{s['mean']:>8.1f}ms{s['io_sum_mean']:>8.1f}ms{s['p50']:>8.1f}ms"
+                  f"{s['p95']:>8.1f}ms{s['p99']:>8.1f}ms")
+    memory = results["memory_mb"]
+    print(f"memory (RSS): start={memory['start']:.0f}MB peak={memory['peak']:.0f}MB end={memory['end']:.0f}MB")
+    if stub_stats:
+        print("stubs: " + ", ".join(f"{key}={value}" for key, value in stub_stats.items()))
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Regressions beyond the tolerance: lower throughput, higher claim or node p95.
+    """
+    regressions = []
+    if results["throughput"] < baseline["throughput"] * (1 - tolerance):
+        regressions.append(f"throughput {baseline['throughput']:.2f} -> {results['throughput']:.2f} claims/s")
+    pairs = [("claim", baseline.get("claim_ms"), results.get("claim_ms"))]
+    pairs += [(f"node {node}", stats, results["nodes"].get(node)) for node, stats in baseline.get("nodes", {}).items()]
+    for label, before, after in pairs:
+        if not before or not after:
+            continue
+        if after["p95"] > before["p95"] * (1 + tolerance) and after["p95"] - before["p95"] > REGRESSION_MIN_DELTA_MS:
+            regressions.append(f"{label} p95 {before['p95']:.1f}ms -> {after['p95']:.1f}ms")
+    return regressions
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=5, help="claims run first and left out of the stats")
+    parser.add_argument("--mix", type=parse_mix, default="life=1,health=1,car=1", help="claim type weights")
+    parser.add_argument("--policies", type=int, default=50, help="distinct policy numbers per claim type")
+    parser.add_argument("--shared-documents", action="store_true", help="same document bytes for every claim (warm cache)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--stub-url", help="use already running stubs instead of starting them")
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--real-db", action="store_true", help="use MONGO_URI / DATABASE_URL instead of in-memory stand-ins")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--azure-latency-ms", type=float, default=800)
+    parser.add_argument("--azure-per-image-ms", type=float, default=250)
+    parser.add_argument("--azure-jitter-ms", type=float, default=200)
+    parser.add_argument("--azure-error-rate", type=float, default=0.0)
+    parser.add_argument("--azure-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--blob-latency-ms", type=float, default=30)
+    parser.add_argument("--backend-latency-ms", type=float, default=10)
+    parser.add_argument("--deployments", type=parse_deployments,
+                        help="route completions over these stub deployments: name[=latency_ms[:throttle_rate]],...")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression vs the baseline")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    stubs = None
+    stub_url = args.stub_url
+    if not stub_url:
+        stub_url = f"http://127.0.0.1:{args.stub_port}"
+        stubs = start_stubs(args.stub_port, args)
+    try:
+        await wait_until_up(f"{stub_url}/stub/stats", stubs)
+
+        app_lifespan = None
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=600)
+        else:
+            # Must be set before app_server is imported: clients are built at import time
+            os.environ["AZURE_OPENAI_ENDPOINT"] = stub_url
+            os.environ.setdefault("AZURE_OPENAI_API_KEY", "bench")
+            os.environ["BACKEND_URL"] = stub_url
+            if args.deployments:
+                os.environ["AZURE_DEPLOYMENTS"] = json.dumps([
+                    {"name": name, "endpoint": stub_url, "deployment": name} for name in args.deployments
+                ])
+            from app_server.app import app
+            # One line per request from the HTTP clients would drown the report
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+            if args.real_db:
+                app_lifespan = app.router.lifespan_context(app)
+                await app_lifespan.__aenter__()
+            else:
+                install_stand_ins(args.db_latency_ms, args.policies)
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=600)
+
+        run_id = f"BENCH-{int(time.time())}"
+        claim_types = [random.choice(args.mix) for _ in range(args.warmup + args.claims)]
+        claims = [make_claim(run_id, i, claim_type, stub_url, args.policies, args.shared_documents)
+                  for i, claim_type in enumerate(claim_types)]
+
+        load = ClaimLoad(client, args.concurrency, remote=bool(args.url))
+        async with httpx.AsyncClient(base_url=stub_url) as stub_client:
+            await load.warm_up(claims[:args.warmup])
+            await stub_client.post("/stub/stats/reset")
+            wall = await load.run(claims[args.warmup:])
+            stub_stats = (await stub_client.get("/stub/stats")).json()
+
+        config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "mix")}
+        results = load.results(wall, config)
+        report(results, stub_stats)
+        if not args.url:
+            from app_server.utils.clients import azure_chat, vision_chat
+            routing = azure_chat.get_stats()
+            print(f"azure routing: failovers={routing['failovers']}")
+            for name, deployment in routing["deployments"].items():
+                print(f"  {name:<20} routed={deployment['routed']} ewma={deployment['ewma_latency_ms']}ms "
+                      f"throttled={deployment['throttled']} retries={deployment['retries']} circuit={deployment['circuit']}")
+            vision = vision_chat.get_stats()
+            if vision["enabled"]:
+                print(f"vision hedging: hedged={vision.get('hedged', 0)} primary_won={vision.get('primary_won', 0)} "
+                      f"hedge_won={vision.get('hedge_won', 0)} over_budget={vision.get('over_budget', 0)}")
+
+        await client.aclose()
+        if app_lifespan is not None:
+            await app_lifespan.__aexit__(None, None, None)
+        elif not args.url:
+            from app_server.utils.sync import sync_manager
+            from app_server.utils.clients import close_clients
+            await sync_manager.close()
+            await close_clients()
+    finally:
+        if stubs is not None:
+            stubs.terminate()
+            stubs.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS vs " + args.baseline + ":\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.baseline} (tolerance {args.tolerance:.0%}).")
+
+if __name__ == "__main__":
+    asyncio.run(main())
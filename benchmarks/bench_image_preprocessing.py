@@ -0,0 +1,87 @@
+"""
+Vision input cost before/after image preprocessing, on generated fixture documents.
+
+    python -m benchmarks.bench_image_preprocessing
+    python -m benchmarks.bench_image_preprocessing --azure   # also time real vision calls
+
+"before" is what used to be sent: uploaded images as-is, PDFs as the first page rendered
+at 2x zoom to JPEG. "after" is the current pipeline (page selection, DPI budget, border
+crop, resolution tier, compressed encode). Tokens are the GPT-4o image-token estimate.
+"""
+import io
+import time
+import random
+import asyncio
+import argparse
+import fitz # PyMuPDF
+from PIL import Image
+from benchmarks.fixtures import damage_photo_jpeg, license_photo_jpeg, multipage_bill_pdf, scanned_bill_jpeg
+from app_server.utils.image_preprocessing import estimate_image_tokens, preprocess_image_bytes, to_data_url
+from app_server.utils.pdf_pipeline import render_selected_pages
+
+def before_image(data: bytes) -> dict:
+    width, height = Image.open(io.BytesIO(data)).size
+    return {"data": data, "mime": "image/jpeg", "detail": "auto", "tokens": estimate_image_tokens(width, height)}
+
+def before_pdf(data: bytes) -> list:
+    doc = fitz.open(stream=data, filetype="pdf")
+    pix = doc[0].get_pixmap(matrix=fitz.Matrix(2, 2))
+    return [{"data": pix.tobytes("jpg"), "mime": "image/jpeg", "detail": "auto",
+             "tokens": estimate_image_tokens(pix.width, pix.height)}]
+
+def after_pdf(data: bytes, category: str) -> list:
+    return [prepared for _, prepared in render_selected_pages({"stream": data, "filetype": "pdf"}, category)]
+
+async def time_vision(images: list, category: str) -> float:
+    from app_server.utils.clients import azure_client, AZURE_DEPLOYMENT_NAME
+    start = time.perf_counter()
+    await azure_client.chat.completions.create(
+        model=AZURE_DEPLOYMENT_NAME,
+        messages=[{"role": "user", "content": [
+            {"type": "text", "text": f"Extract the fields of this {category} as JSON."},
+            *({"type": "image_url", "image_url": {"url": to_data_url(image), "detail": image["detail"]}} for image in images),
+        ]}],
+        max_tokens=300,
+        temperature=0.0,
+        response_format={"type": "json_object"},
+    )
+    return time.perf_counter() - start
+
+def report(name, label, images, prep_seconds, vision_seconds=None):
+    line = (f"{name:<22}{label:<7} pages={len(images)}  bytes={sum(len(i['data']) for i in images):>9,}  "
+            f"tokens={sum(i['tokens'] for i in images):>6}  prep={prep_seconds * 1000:7.1f}ms")
+    if vision_seconds is not None:
+        line += f"  vision={vision_seconds * 1000:7.1f}ms"
+    print(line)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--azure", action="store_true", help="also time real vision calls (needs AZURE_* env)")
+    args = parser.parse_args()
+    random.seed(7)
+
+    fixtures = [
+        ("damage photo", "damage-photos", "image", damage_photo_jpeg()),
+        ("scanned bill", "hospital-bills", "image", scanned_bill_jpeg()),
+        ("licence photo", "driving-license", "image", license_photo_jpeg()),
+        ("8-page bill pdf", "hospital-bills", "pdf", multipage_bill_pdf()),
+    ]
+    totals = {"before": [0, 0], "after": [0, 0]}
+    for name, category, kind, data in fixtures:
+        for label in ("before", "after"):
+            start = time.perf_counter()
+            if kind == "pdf":
+                images = before_pdf(data) if label == "before" else after_pdf(data, category)
+            else:
+                images = [before_image(data) if label == "before" else preprocess_image_bytes(data, category)]
+            prep_seconds = time.perf_counter() - start
+            vision_seconds = await time_vision(images, category) if args.azure else None
+            report(name, label, images, prep_seconds, vision_seconds)
+            totals[label][0] += sum(len(i["data"]) for i in images)
+            totals[label][1] += sum(i["tokens"] for i in images)
+
+    print(f"\ntotal bytes  {totals['before'][0]:>10,} -> {totals['after'][0]:>10,}")
+    print(f"total tokens {totals['before'][1]:>10,} -> {totals['after'][1]:>10,}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Policy lookup latency: connect-per-call psycopg2 (before) vs pooled asyncpg (after).
+
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_policy_lookup PN-0001 PN-0002 --lookups 500 --concurrency 20
+
+The "before" path runs the legacy fetch_policy_by_number in worker threads, which is how a
+blocking call behaves once it is moved off the event loop.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from app_server.utils.postgres_utils import (
+    fetch_policy_by_number,
+    afetch_policy_by_number,
+    afetch_policies_by_numbers,
+    close_pool,
+)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def report(label, latencies, wall):
+    ms = [v * 1000 for v in latencies]
+    print(f"{label:<28} n={len(ms):<5} mean={statistics.mean(ms):7.2f}ms  p50={percentile(ms, 50):7.2f}ms  "
+          f"p95={percentile(ms, 95):7.2f}ms  p99={percentile(ms, 99):7.2f}ms  throughput={len(ms) / wall:8.1f}/s")
+
+async def run(label, lookup, policy_numbers, lookups, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await lookup(policy_numbers[i % len(policy_numbers)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(lookups)))
+    report(label, latencies, time.perf_counter() - start)
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("policy_numbers", nargs="+")
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    async def before(policy_number):
+        return await asyncio.to_thread(fetch_policy_by_number, policy_number)
+
+    await run("before: connect per call", before, args.policy_numbers, args.lookups, args.concurrency)
+    # Warm the pool so connection setup is not attributed to the first lookups
+    await afetch_policy_by_number(args.policy_numbers[0])
+    await run("after: pooled + projected", afetch_policy_by_number, args.policy_numbers, args.lookups, args.concurrency)
+
+    start = time.perf_counter()
+    found = await afetch_policies_by_numbers(args.policy_numbers)
+    print(f"batch lookup of {len(args.policy_numbers)} numbers: {len(found)} found in {(time.perf_counter() - start) * 1000:.2f}ms")
+    await close_pool()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,214 @@
+"""
+Regression check for the claim graph topologies: runs one corpus of claims through the
+sequential graph and the parallel (fan-out / join) graph and compares their decisions.
+
+    python -m benchmarks.compare_graphs
+    python -m benchmarks.compare_graphs --claims 60 --azure-latency-ms 300
+
+The corpus covers every way a run can end: approvals for each claim type, FNOL rejections
+(missing documents), policy rejections (unknown / lapsed policy) that cancel document
+extraction, proof mismatches and fraud flags that send the claim to investigation, and
+documents that fail to download, plus life claims with every document category of a real
+upload (test_result_clean.json). Services are the same stand-ins benchmarks.bench_claims
+uses. Exits 1 if any claim gets a different decision or settlement amount, if an uploaded
+document was not read, or if the timeline the stub backend ended up with shows no SQL
+latency for a verified policy (the policy step is re-rendered once policy_verification's
+node_metrics arrive).
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+import httpx
+from collections import Counter
+from benchmarks.bench_claims import (
+    CLAIM_DOCUMENTS,
+    install_stand_ins,
+    make_claim,
+    start_stubs,
+    wait_until_up,
+)
+
+# Compared per claim; the first two must match, the others are reported
+DECISION_FIELDS = ("decision", "settlement_amount")
+DETAIL_FIELDS = ("proof_verified", "fraud_risk.status", "coverage_data.covers_incident_type")
+# Categories uploaded with the sample life claim in test_result_clean.json
+SAMPLE_LIFE_DOCUMENTS = ["death-certificate", "bank-details", "claim-form", "claimant-id", "nominee-proof",
+                         "policy-document", "claimant-address"]
+
+def lapsed_policies():
+    """
+    Makes BENCH-<TYPE>-LAPSED resolve to a policy that is not Active.
+    """
+    import app_server.utils.policy_cache as policy_cache
+    fetch_policy = policy_cache.afetch_policy_by_number
+
+    async def fetch_with_lapsed(number, raise_on_error=False):
+        if number and number.endswith("-LAPSED"):
+            return {"id": number, "policyNumber": number, "status": "Lapsed", "coverage": 2000000}
+        return await fetch_policy(number, raise_on_error)
+
+    policy_cache.afetch_policy_by_number = fetch_with_lapsed
+
+def build_corpus(run_id: str, claims: int, stub_url: str, policies: int) -> list:
+    """
+    Claims with a variant applied to each; the variant is part of the claim id.
+    """
+    variants = ["approve", "approve", "unknown_policy", "lapsed_policy", "missing_document",
+                "name_mismatch", "fraud", "high_value", "broken_document", "sample_documents"]
+    corpus = []
+    for index in range(claims):
+        claim_type = list(CLAIM_DOCUMENTS)[index % len(CLAIM_DOCUMENTS)]
+        variant = variants[index % len(variants)]
+        categories = None
+        if variant == "sample_documents":
+            claim_type, categories = "life", SAMPLE_LIFE_DOCUMENTS
+        claim = make_claim(f"{run_id}-{variant.upper()}", index, claim_type, stub_url, policies, shared_documents=False,
+                           categories=categories)
+        fnol = claim["fnol_data"]
+        if variant in ("unknown_policy", "lapsed_policy"):
+            number = f"BENCH-{claim_type.upper()}-{'UNKNOWN' if variant == 'unknown_policy' else 'LAPSED'}"
+            fnol["policyNumber"] = fnol["policy_id"] = claim["policy_id"] = number
+        elif variant == "missing_document":
+            fnol["documents"] = fnol["documents"][:-1]
+        elif variant == "name_mismatch":
+            fnol["claimant_info"] = {"name": "Somebody Else"}
+        elif variant == "high_value":
+            fnol["estimated_amount"] = 450000
+        elif variant == "broken_document":
+            fnol["documents"][0]["url"] = fnol["documents"][0]["url"].replace("/blob/", "/blob-missing/")
+        corpus.append(claim)
+    return corpus
+
+def field(state: dict, path: str):
+    value = state
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+def unread_documents(states: dict) -> list:
+    """
+    Uploaded documents missing from document_data of claims whose documents were read.
+    """
+    unread = []
+    for claim_id, state in states.items():
+        document_data = state.get("document_data") or {}
+        if document_data.get("status") != "completed":
+            continue  # rejected before extraction finished
+        read = {result["filename"] for result in document_data.get("results", {}).values()}
+        unread.extend(f"{claim_id}: {doc['filename']}" for doc in state["fnol_data"].get("documents", [])
+                      if doc.get("url") and doc["filename"] not in read)
+    return unread
+
+async def missing_sql_latency(stub_url: str, states: dict) -> list:
+    """
+    Claims with a verified policy whose synced policy step still shows SQL Latency N/A.
+    """
+    missing = []
+    async with httpx.AsyncClient(base_url=stub_url) as client:
+        for claim_id, state in states.items():
+            if (state.get("policy_sql_data") or {}).get("status") != "Active":
+                continue  # rejected before the policy node synced
+            response = await client.get(f"/agent/application/{claim_id}")
+            steps = response.json().get("stepHistory", []) if response.status_code == 200 else []
+            policy_step = next((step for step in steps if step.get("id") == 2), {})
+            metrics = {metric["label"]: metric["value"] for metric in policy_step.get("decision", {}).get("metrics", [])}
+            if metrics.get("SQL Latency", "N/A") == "N/A":
+                missing.append(claim_id)
+    return missing
+
+async def run_corpus(graph, corpus: list, concurrency: int) -> tuple:
+    from app_server.agent.runner import build_initial_state
+    semaphore = asyncio.Semaphore(concurrency)
+    wall_ms = {}
+
+    async def run(claim):
+        async with semaphore:
+            start = time.perf_counter()
+            state = await graph.ainvoke(build_initial_state(claim))
+            wall_ms[claim["claim_id"]] = (time.perf_counter() - start) * 1000
+            return claim["claim_id"], state
+
+    states = dict(await asyncio.gather(*(run(claim) for claim in corpus)))
+    return states, wall_ms
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=36)
+    parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--policies", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--stub-port", type=int, default=9100)
+    parser.add_argument("--db-latency-ms", type=float, default=20.0)
+    parser.add_argument("--azure-latency-ms", type=float, default=400)
+    parser.add_argument("--azure-per-image-ms", type=float, default=100)
+    parser.add_argument("--azure-jitter-ms", type=float, default=50)
+    parser.add_argument("--azure-error-rate", type=float, default=0.0)
+    parser.add_argument("--azure-throttle-rate", type=float, default=0.0)
+    parser.add_argument("--blob-latency-ms", type=float, default=30)
+    parser.add_argument("--backend-latency-ms", type=float, default=10)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    stubs = start_stubs(args.stub_port, args)
+    try:
+        await wait_until_up(f"{stub_url}/stub/stats", stubs)
+        # Must be set before app_server is imported: clients are built at import time
+        os.environ["AZURE_OPENAI_ENDPOINT"] = stub_url
+        os.environ.setdefault("AZURE_OPENAI_API_KEY", "bench")
+        os.environ["BACKEND_URL"] = stub_url
+        from app_server.agent.claim_graph import compile_claim_graph
+        from app_server.utils.sync import sync_manager
+        from app_server.utils.clients import close_clients
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        install_stand_ins(args.db_latency_ms, args.policies)
+        lapsed_policies()
+
+        # Separate corpora (same claims, different ids) so the second run can't hit the
+        # extraction cache the first one filled
+        run_id = f"GRAPH-{int(time.time())}"
+        results = {}
+        for name, parallel in (("sequential", False), ("parallel", True)):
+            corpus = build_corpus(f"{run_id}-{name[:3].upper()}", args.claims, stub_url, args.policies)
+            results[name] = await run_corpus(compile_claim_graph(parallel=parallel), corpus, args.concurrency)
+
+        await sync_manager.close()
+        await close_clients()
+        no_latency = [claim_id for name in results for claim_id in await missing_sql_latency(stub_url, results[name][0])]
+        unread = [document for name in results for document in unread_documents(results[name][0])]
+    finally:
+        stubs.terminate()
+        stubs.wait()
+
+    (sequential, sequential_ms), (parallel, parallel_ms) = results["sequential"], results["parallel"]
+    mismatches, details = [], []
+    decisions = Counter()
+    for (seq_id, seq_state), (par_id, par_state) in zip(sequential.items(), parallel.items()):
+        decisions[seq_state.get("decision")] += 1
+        for path in DECISION_FIELDS + DETAIL_FIELDS:
+            if field(seq_state, path) != field(par_state, path):
+                line = f"{seq_id} / {par_id}: {path} {field(seq_state, path)!r} != {field(par_state, path)!r}"
+                (mismatches if path in DECISION_FIELDS else details).append(line)
+
+    print(f"\n--- Graph topologies: {len(sequential)} claims, decisions {dict(decisions)} ---")
+    for name, wall_ms in (("sequential", sequential_ms), ("parallel", parallel_ms)):
+        ordered = sorted(wall_ms.values())
+        print(f"{name:>10}: p50={ordered[len(ordered) // 2]:.1f}ms max={ordered[-1]:.1f}ms")
+    if details:
+        print("\nOther fields that differ:\n  " + "\n  ".join(details))
+    if no_latency:
+        print("\nPOLICY STEP WITHOUT SQL LATENCY:\n  " + "\n  ".join(no_latency))
+    if unread:
+        print("\nUPLOADED DOCUMENTS NOT READ:\n  " + "\n  ".join(unread))
+    if mismatches:
+        print("\nDECISION MISMATCHES:\n  " + "\n  ".join(mismatches))
+    if mismatches or no_latency or unread:
+        sys.exit(1)
+    print("\nDecisions identical; every upload read; policy steps show SQL latency.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Generated claim documents for the benchmarks: phone photos, scans and born-digital PDFs.
+"""
+import io
+import random
+import fitz # PyMuPDF
+from PIL import Image, ImageDraw, ImageFilter
+
+BILL_LINES = ["CITY CARE HOSPITAL, PUNE", "Patient Name: Ravi Kumar", "Date of Admission: 12/03/2024"] + \
+    [f"{i:>3}  Item {i}  pharmacy / room / consultation charges      {random.randint(200, 9000):>8}.00" for i in range(1, 60)]
+
+def _text_page(lines, fontsize=9) -> fitz.Document:
+    doc = fitz.open()
+    page = doc.new_page()
+    for i, line in enumerate(lines[:70]):
+        page.insert_text((50, 50 + i * 11), line, fontsize=fontsize)
+    return doc
+
+def scanned_bill_jpeg() -> bytes:
+    # 300 DPI scan with a grey scanner-bed border and slight blur
+    pix = _text_page(BILL_LINES)[0].get_pixmap(dpi=300)
+    page = Image.frombytes("RGB", (pix.width, pix.height), pix.samples).filter(ImageFilter.GaussianBlur(0.6))
+    scan = Image.new("RGB", (page.width + 240, page.height + 240), (200, 200, 200))
+    scan.paste(page, (120, 120))
+    buffer = io.BytesIO()
+    scan.save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+def damage_photo_jpeg() -> bytes:
+    # 12MP phone photo
+    photo = Image.effect_noise((4032, 3024), 40).convert("RGB")
+    draw = ImageDraw.Draw(photo)
+    for _ in range(40):
+        x, y = random.randint(0, 3800), random.randint(0, 2800)
+        draw.ellipse((x, y, x + random.randint(50, 600), y + random.randint(50, 400)),
+                     fill=tuple(random.randint(0, 255) for _ in range(3)))
+    buffer = io.BytesIO()
+    photo.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def license_photo_jpeg() -> bytes:
+    pix = _text_page(["DRIVING LICENCE", "DL No: MH12 20110012345", "Name: Anil Patil",
+                      "Valid Till: 14-08-2031", "Vehicle Class: LMV, MCWG"], fontsize=20)[0].get_pixmap(dpi=200)
+    card = Image.frombytes("RGB", (pix.width, pix.height), pix.samples).crop((0, 0, 1400, 500))
+    buffer = io.BytesIO()
+    card.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def multipage_bill_pdf() -> bytes:
+    doc = fitz.open()
+    for number in range(8):
+        page = doc.new_page()
+        for i, line in enumerate(BILL_LINES[:40]):
+            page.insert_text((50, 50 + i * 14), line, fontsize=9)
+        if number == 7:
+            page.insert_text((50, 700), "Grand Total: Rs. 1,23,456.00   Net Payable: Rs. 1,23,456.00", fontsize=10)
+    return doc.tobytes()
+
+def text_pdf(lines) -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    for i, line in enumerate(lines):
+        page.insert_text((50, 60 + i * 16), line, fontsize=11)
+    return doc.tobytes()
+
+def scanned_pdf(image_bytes: bytes) -> bytes:
+    # Image-only PDF: no text layer, so it goes through render + vision
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, stream=image_bytes)
+    return doc.tobytes()
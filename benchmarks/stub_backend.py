@@ -0,0 +1,92 @@
+"""
+Local stand-in for the Admin backend's agent routes.
+
+    uvicorn benchmarks.stub_backend:app --port 8000
+
+Set STUB_BACKEND_BULK=false to emulate a backend without /agent/sync/bulk, and
+STUB_BACKEND_LATENCY_MS to add a fixed delay per request. GET /stats reports how
+many requests and payloads were received. stepHistoryPatch payloads (SYNC_TIMELINE_PATCH)
+are applied to the stored stepHistory; a patch whose baseVersion doesn't match is refused
+as a conflict (409 on /agent/sync, listed under "conflicts" in the bulk response).
+STUB_BACKEND_DROP_RATE drops that share of payloads with a 503, to exercise retries and resyncs.
+"""
+import os
+import random
+import asyncio
+from fastapi import FastAPI, Body, HTTPException
+
+BULK_ENABLED = os.getenv("STUB_BACKEND_BULK", "true").lower() == "true"
+LATENCY_MS = float(os.getenv("STUB_BACKEND_LATENCY_MS", "0"))
+DROP_RATE = float(os.getenv("STUB_BACKEND_DROP_RATE", "0"))
+
+app = FastAPI(title="Stub Admin Backend")
+
+applications = {}
+stats = {"get_requests": 0, "sync_requests": 0, "bulk_requests": 0, "payloads": 0, "patches": 0, "patch_conflicts": 0,
+         "dropped": 0}
+
+async def _delay():
+    if LATENCY_MS:
+        await asyncio.sleep(LATENCY_MS / 1000)
+
+def _maybe_drop():
+    if DROP_RATE and random.random() < DROP_RATE:
+        stats["dropped"] += 1
+        raise HTTPException(status_code=503, detail="dropped")
+
+def _store(payload: dict) -> bool:
+    """
+    Stores the payload; returns False (nothing stored) for a patch that doesn't apply.
+    """
+    patch = payload.pop("stepHistoryPatch", None)
+    existing = applications.get(payload["applicationId"])
+    if patch is not None:
+        stats["patches"] += 1
+        if existing is None or existing.get("stepHistoryVersion", 0) != patch["baseVersion"]:
+            stats["patch_conflicts"] += 1
+            return False
+        steps = {step["id"]: step for step in (existing or {}).get("stepHistory", [])}
+        steps.update({step["id"]: step for step in patch["steps"]})
+        payload["stepHistory"] = [steps[step_id] for step_id in sorted(steps)]
+        payload["stepHistoryVersion"] = patch["version"]
+    applications[payload["applicationId"]] = payload
+    stats["payloads"] += 1
+    return True
+
+@app.get("/agent/application/{application_id}")
+async def get_application(application_id: str):
+    await _delay()
+    stats["get_requests"] += 1
+    if application_id not in applications:
+        raise HTTPException(status_code=404, detail="not found")
+    return applications[application_id]
+
+@app.post("/agent/sync")
+async def sync(payload: dict = Body(...)):
+    await _delay()
+    stats["sync_requests"] += 1
+    _maybe_drop()
+    if not _store(payload):
+        raise HTTPException(status_code=409, detail="stepHistory version conflict")
+    return {"status": "ok"}
+
+@app.post("/agent/sync/bulk")
+async def sync_bulk(payloads: list = Body(...)):
+    if not BULK_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    await _delay()
+    stats["bulk_requests"] += 1
+    _maybe_drop()
+    conflicts = [payload["applicationId"] for payload in payloads if not _store(payload)]
+    return {"status": "ok", "count": len(payloads), "conflicts": conflicts}
+
+@app.get("/stats")
+async def get_stats():
+    return {**stats, "applications": len(applications)}
+
+@app.post("/stats/reset")
+async def reset_stats():
+    applications.clear()
+    for key in stats:
+        stats[key] = 0
+    return stats
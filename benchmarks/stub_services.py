@@ -0,0 +1,185 @@
+"""
+Local stand-ins for the external services a claim run calls: Azure OpenAI chat completions,
+blob storage and the Admin backend's agent routes, on one port.
+
+    uvicorn benchmarks.stub_services:app --port 9100
+
+Point the agent at it with AZURE_OPENAI_ENDPOINT=http://127.0.0.1:9100 and
+BACKEND_URL=http://127.0.0.1:9100; document URLs look like
+http://127.0.0.1:9100/blob/<salt>/<category>.<ext>. A salt other than "shared" makes the
+bytes unique, so the extraction cache can't serve them.
+
+    STUB_AZURE_LATENCY_MS        base latency per completion (default 800)
+    STUB_AZURE_PER_IMAGE_MS      added per image in the request (default 250)
+    STUB_AZURE_JITTER_MS         mean of an exponential tail added on top (default 200)
+    STUB_AZURE_ERROR_RATE        fraction answered with 500 (default 0)
+    STUB_AZURE_THROTTLE_RATE     fraction answered with 429 + Retry-After (default 0)
+    STUB_BLOB_LATENCY_MS         latency per blob download (default 30)
+    STUB_AZURE_DEPLOYMENTS       JSON overrides per deployment name, e.g.
+                                 {"westeurope": {"latency_ms": 2000, "throttle_rate": 0.3}}
+                                 (keys: latency_ms, per_image_ms, jitter_ms, error_rate, throttle_rate)
+
+The backend routes and their STUB_BACKEND_* settings come from benchmarks.stub_backend.
+"""
+import os
+import re
+import json
+import time
+import random
+import asyncio
+from collections import Counter
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from benchmarks.stub_backend import app as backend_app
+from benchmarks.fixtures import (
+    damage_photo_jpeg,
+    license_photo_jpeg,
+    multipage_bill_pdf,
+    scanned_bill_jpeg,
+    scanned_pdf,
+    text_pdf,
+)
+
+AZURE_LATENCY_MS = float(os.getenv("STUB_AZURE_LATENCY_MS", "800"))
+AZURE_PER_IMAGE_MS = float(os.getenv("STUB_AZURE_PER_IMAGE_MS", "250"))
+AZURE_JITTER_MS = float(os.getenv("STUB_AZURE_JITTER_MS", "200"))
+AZURE_ERROR_RATE = float(os.getenv("STUB_AZURE_ERROR_RATE", "0"))
+AZURE_THROTTLE_RATE = float(os.getenv("STUB_AZURE_THROTTLE_RATE", "0"))
+BLOB_LATENCY_MS = float(os.getenv("STUB_BLOB_LATENCY_MS", "30"))
+DEPLOYMENT_OVERRIDES = json.loads(os.getenv("STUB_AZURE_DEPLOYMENTS") or "{}")
+
+app = FastAPI(title="Stub Azure OpenAI + Blob Storage")
+
+stats = {"completions": 0, "images": 0, "errors": 0, "throttled": 0, "blob_downloads": 0, "blob_bytes": 0}
+deployment_stats = Counter()  # completions per deployment
+
+def build_fixtures() -> dict:
+    """
+    category -> (file extension, bytes). Born-digital PDFs exercise the text fast path,
+    scans and photos the vision path.
+    """
+    random.seed(11)
+    bill_scan = scanned_bill_jpeg()
+    return {
+        "death-certificate": ("pdf", text_pdf([
+            "GOVERNMENT OF MAHARASHTRA - CERTIFICATE OF DEATH",
+            "Registration No: MH/PN/2024/004512",
+            "Name of Deceased: John Doe",
+            "Date of Death: 01/01/2024",
+            "Cause of Death: Cardiac arrest",
+            "Place of Death: City Care Hospital, Pune",
+            "Issued by the Registrar of Births and Deaths, Pune Municipal Corporation",
+        ])),
+        "rc-copy": ("pdf", text_pdf([
+            "CERTIFICATE OF REGISTRATION - FORM 23",
+            "Registration No: MH12 AB 1234",
+            "Owner Name: John Doe",
+            "Chassis No: MA3EWDE1S00123456",
+            "Engine No: K12MN1234567",
+            "Maker: Maruti Suzuki   Model: Swift VXI   Fuel: Petrol   Date of Registration: 14/08/2019",
+        ])),
+        "hospital-bills": ("pdf", multipage_bill_pdf()),
+        "discharge-summary": ("jpg", bill_scan),
+        "claim-form": ("pdf", scanned_pdf(bill_scan)),
+        "bank-details": ("jpg", license_photo_jpeg()),
+        "driving-license": ("jpg", license_photo_jpeg()),
+        "damage-photos": ("jpg", damage_photo_jpeg()),
+        # The other uploads of a real life claim (test_result_clean.json)
+        "claimant-id": ("jpg", license_photo_jpeg()),
+        "nominee-proof": ("jpg", license_photo_jpeg()),
+        "claimant-address": ("jpg", bill_scan),
+        "policy-document": ("pdf", text_pdf([
+            "LIFE INSURANCE POLICY SCHEDULE",
+            "Policy Holder: John Doe",
+            "Plan: Term Assurance   Sum Assured: Rs. 10,00,000",
+            "Nominee: Jane Doe (Spouse)",
+            "Date of Commencement: 01/04/2015   Premium Paying Term: 20 years",
+            "Issued by the Branch Office, Pune",
+        ])),
+    }
+
+FIXTURES = build_fixtures()
+MEDIA_TYPES = {"pdf": "application/pdf", "jpg": "image/jpeg"}
+# Extracted fields per category beyond the reference number; names agree with the generated claims
+EXTRACTED_FIELDS = {"claimant-id": {"name": "John Doe"}}
+
+def _setting(deployment: str, key: str, default: float) -> float:
+    return float(DEPLOYMENT_OVERRIDES.get(deployment, {}).get(key, default))
+
+def _latency_seconds(deployment: str, images: int) -> float:
+    jitter_ms = _setting(deployment, "jitter_ms", AZURE_JITTER_MS)
+    jitter = random.expovariate(1 / jitter_ms) if jitter_ms > 0 else 0.0
+    latency_ms = _setting(deployment, "latency_ms", AZURE_LATENCY_MS)
+    return (latency_ms + _setting(deployment, "per_image_ms", AZURE_PER_IMAGE_MS) * images + jitter) / 1000
+
+def _completion(deployment: str, content: str, prompt_tokens: int) -> dict:
+    return {
+        "id": f"chatcmpl-stub-{random.getrandbits(48):x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": deployment,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 60, "total_tokens": prompt_tokens + 60},
+    }
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    body = await request.json()
+    parts = []
+    for message in body.get("messages", []):
+        content = message.get("content")
+        parts.extend(content if isinstance(content, list) else [{"type": "text", "text": content or ""}])
+    text = " ".join(part.get("text", "") for part in parts if part.get("type") == "text")
+    images = sum(1 for part in parts if part.get("type") == "image_url")
+
+    stats["completions"] += 1
+    stats["images"] += images
+    deployment_stats[deployment] += 1
+    await asyncio.sleep(_latency_seconds(deployment, images))
+
+    throttle_rate = _setting(deployment, "throttle_rate", AZURE_THROTTLE_RATE)
+    roll = random.random()
+    if roll < throttle_rate:
+        stats["throttled"] += 1
+        return JSONResponse({"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                            status_code=429, headers={"Retry-After": "1"})
+    if roll < throttle_rate + _setting(deployment, "error_rate", AZURE_ERROR_RATE):
+        stats["errors"] += 1
+        return JSONResponse({"error": {"code": "InternalServerError", "message": "stub failure"}}, status_code=500)
+
+    # Fields that agree with the generated claims, so runs go all the way to settlement
+    match = re.search(r"labeled (?:this )?as: '([^']*)'", text)
+    category = match.group(1) if match else "document"
+    extraction = {"document_type": category, "confidence": 0.92,
+                  "extracted_data": {"reference_number": "STUB-0001", **EXTRACTED_FIELDS.get(category, {})}}
+    prompt_tokens = len(text) // 4 + 765 * images
+    return _completion(deployment, json.dumps(extraction), prompt_tokens)
+
+@app.get("/blob/{salt}/{filename}")
+async def blob(salt: str, filename: str):
+    category, _, extension = filename.rpartition(".")
+    if category not in FIXTURES or FIXTURES[category][0] != extension:
+        raise HTTPException(status_code=404, detail="BlobNotFound")
+    if BLOB_LATENCY_MS:
+        await asyncio.sleep(BLOB_LATENCY_MS / 1000)
+    data = FIXTURES[category][1]
+    if salt != "shared":
+        # Trailing bytes after %%EOF / the JPEG EOI marker are ignored by readers but change the hash
+        data = data + f"\n{salt}\n".encode()
+    stats["blob_downloads"] += 1
+    stats["blob_bytes"] += len(data)
+    return Response(data, media_type=MEDIA_TYPES[extension])
+
+@app.get("/stub/stats")
+async def get_stats():
+    return {**stats, "deployments": deployment_stats}
+
+@app.post("/stub/stats/reset")
+async def reset_stats():
+    for key in stats:
+        stats[key] = 0
+    deployment_stats.clear()
+    return stats
+
+# /agent/* and /stats from the backend stub
+app.mount("/", backend_app)
@@ -0,0 +1,135 @@
+import time
+import asyncio
+import httpx
+import openai
+import pytest
+import app_server.utils.azure_limiter as azure_limiter
+from app_server.utils.azure_limiter import CircuitBreaker, CircuitOpenError, DeploymentLimiter, TokenBucket
+
+def rate_limited(retry_after_ms: int = None):
+    headers = {"retry-after-ms": str(retry_after_ms)} if retry_after_ms else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://azure.test"))
+    return openai.RateLimitError("throttled", response=response, body=None)
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(azure_limiter, "AZURE_RETRY_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(azure_limiter, "AZURE_RETRY_MAX_SECONDS", 0.01)
+
+def test_token_bucket_waits_for_refill():
+    async def scenario():
+        bucket = TokenBucket(600)  # 10 per second
+        await bucket.acquire(600)
+        started = time.monotonic()
+        await bucket.acquire(2)
+        return time.monotonic() - started
+
+    assert 0.15 <= asyncio.run(scenario()) < 0.5
+
+def test_token_bucket_caps_oversized_requests_and_refunds():
+    async def scenario():
+        bucket = TokenBucket(60000)
+        await bucket.acquire(10 ** 9)  # larger than the bucket: takes all of it instead of waiting forever
+        emptied = bucket.tokens
+        bucket.refund(500)
+        return emptied, bucket.tokens
+
+    emptied, refunded = asyncio.run(scenario())
+    assert emptied < 1
+    assert 500 <= refunded < 510
+
+def test_circuit_breaker_opens_probes_and_closes():
+    async def scenario():
+        breaker = CircuitBreaker("d1", failures=2, reset_seconds=0.1)
+        breaker.record_failure()
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await breaker.wait(time.monotonic() + 0.02)
+
+        await breaker.wait(time.monotonic() + 1)  # after reset_seconds: this caller is the probe
+        assert breaker.state == "half_open"
+        second = asyncio.create_task(breaker.wait(time.monotonic() + 1))
+        await asyncio.sleep(0.02)
+        assert not second.done()  # only one probe at a time
+        breaker.record_success()
+        await asyncio.wait_for(second, 0.5)
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+def test_circuit_breaker_reopens_on_failed_probe():
+    async def scenario():
+        breaker = CircuitBreaker("d1", failures=1, reset_seconds=0.05)
+        breaker.record_failure()
+        await breaker.wait(time.monotonic() + 1)
+        breaker.record_failure()
+        return breaker.state
+
+    assert asyncio.run(scenario()) == "open"
+
+def test_limiter_retries_429_and_pauses_other_callers():
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise rate_limited(retry_after_ms=200)
+        return "ok"
+
+    async def scenario():
+        limiter = DeploymentLimiter("d1")
+        started = time.monotonic()
+        first = asyncio.create_task(limiter.call(create))
+        await asyncio.sleep(0.05)
+        # Arrives during the pause set by the first caller's 429
+        assert await limiter.call(create) == "ok"
+        assert await first == "ok"
+        return limiter, started
+
+    limiter, started = asyncio.run(scenario())
+    assert limiter.stats["throttled"] == 1
+    assert limiter.stats["retries"] == 1
+    assert all(at - started >= 0.19 for at in calls[1:])
+
+def test_pause_is_not_slept_again_after_breaker_wait():
+    async def create(**kwargs):
+        return "ok"
+
+    async def scenario():
+        limiter = DeploymentLimiter("d1")
+        limiter.breaker = CircuitBreaker("d1", failures=1, reset_seconds=0.3)
+        limiter.breaker.record_failure()
+        limiter.paused_until = time.monotonic() + 0.3
+        started = time.monotonic()
+        await limiter.call(create)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.5
+
+def test_slots_are_free_while_backing_off():
+    slots = asyncio.Semaphore(2)
+    in_flight = []
+
+    async def throttled(**kwargs):
+        raise rate_limited(retry_after_ms=300)
+
+    async def healthy(**kwargs):
+        in_flight.append(slots._value)
+        return "ok"
+
+    async def scenario():
+        busy = DeploymentLimiter("busy")
+        backing_off = [asyncio.create_task(busy.call(throttled, max_retries=1, slots=slots)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        await DeploymentLimiter("idle").call(healthy, slots=slots)
+        elapsed = time.monotonic() - started
+        for task in backing_off:
+            with pytest.raises(openai.RateLimitError):
+                await task
+        return elapsed
+
+    assert asyncio.run(scenario()) < 0.1
+    assert in_flight == [1]  # the request itself holds a slot
@@ -0,0 +1,114 @@
+import time
+import asyncio
+import types
+import httpx
+import openai
+import pytest
+import app_server.utils.azure_limiter as azure_limiter
+import app_server.utils.azure_router as azure_router
+from app_server.utils.azure_router import Deployment, DeploymentRouter
+
+class FakeClient:
+    """
+    Stands in for AsyncAzureOpenAI: answers after `latency` seconds, or raises `error`.
+    """
+
+    def __init__(self, latency: float = 0.0, error: Exception = None):
+        self.latency = latency
+        self.error = error
+        self.calls = []
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.latency)
+        if self.error is not None:
+            raise self.error
+        return types.SimpleNamespace(usage=None, model=kwargs["model"])
+
+    async def close(self):
+        pass
+
+def rate_limited():
+    response = httpx.Response(429, request=httpx.Request("POST", "http://azure.test"))
+    return openai.RateLimitError("throttled", response=response, body=None)
+
+@pytest.fixture(autouse=True)
+def no_exploration(monkeypatch):
+    monkeypatch.setattr(azure_router, "AZURE_ROUTER_EXPLORE_RATE", 0)
+    monkeypatch.setattr(azure_limiter, "AZURE_MAX_RETRIES", 1)
+    monkeypatch.setattr(azure_limiter, "AZURE_RETRY_BASE_SECONDS", 0.01)
+
+def deployment(name: str, client, model: str = "gpt-4o"):
+    return Deployment(name, client, f"{name}-deployment", model=model)
+
+def test_routes_to_the_fastest_deployment():
+    slow, fast = FakeClient(latency=0.05), FakeClient(latency=0.0)
+    router = DeploymentRouter([deployment("east", slow), deployment("west", fast)])
+
+    async def scenario():
+        # Both unmeasured at first, so both get tried before the averages decide
+        for _ in range(10):
+            await router.create(model="gpt-4o", messages=[])
+
+    asyncio.run(scenario())
+    assert len(fast.calls) > len(slow.calls)
+    assert fast.calls[-1]["model"] == "west-deployment"
+
+def test_ewma_tracks_latency_and_errors():
+    d = deployment("east", FakeClient())
+    d._observe(latency=1.0)
+    d._observe(latency=2.0)
+    assert d.ewma_latency == pytest.approx(1.0 * 0.8 + 2.0 * 0.2)
+    d._observe(failed=True)
+    assert d.error_rate == pytest.approx(0.2)
+    assert d.ewma_latency == pytest.approx(1.2)
+
+def test_fails_over_on_throttling_without_retrying_there():
+    throttled, healthy = FakeClient(error=rate_limited()), FakeClient()
+    router = DeploymentRouter([deployment("east", throttled), deployment("west", healthy)])
+    router.deployments[1].ewma_latency = 10.0  # worse score, so east is tried first
+    route = []
+
+    resp = asyncio.run(router.create(route=route, model="gpt-4o", messages=[]))
+    assert resp.model == "west-deployment"
+    assert route == ["east", "west"]
+    assert len(throttled.calls) == 1
+    assert router.failovers == 1
+    assert router.deployments[0].error_rate > 0
+
+def test_last_deployment_retries_in_full():
+    throttled = FakeClient(error=rate_limited())
+    router = DeploymentRouter([deployment("east", throttled)])
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(router.create(model="gpt-4o", messages=[]))
+    assert len(throttled.calls) == 2  # AZURE_MAX_RETRIES + 1
+
+def test_avoid_only_when_something_else_serves_the_model():
+    east, west = FakeClient(), FakeClient()
+    router = DeploymentRouter([deployment("east", east), deployment("west", west)])
+    router.deployments[1].ewma_latency = 10.0
+
+    asyncio.run(router.create(avoid={"east"}, model="gpt-4o", messages=[]))
+    assert (len(east.calls), len(west.calls)) == (0, 1)
+    asyncio.run(router.create(avoid={"east", "west"}, model="gpt-4o", messages=[]))
+    assert len(east.calls) == 1
+
+def test_skips_a_paused_deployment():
+    east, west = FakeClient(), FakeClient()
+    router = DeploymentRouter([deployment("east", east), deployment("west", west)])
+    router.deployments[1].ewma_latency = 10.0
+    router.deployments[0].limiter.paused_until = time.monotonic() + 60
+
+    asyncio.run(router.create(model="gpt-4o", messages=[]))
+    assert (len(east.calls), len(west.calls)) == (0, 1)
+
+def test_pools_by_model_and_signature():
+    primary = FakeClient()
+    router = DeploymentRouter([deployment("east", primary), deployment("west", FakeClient())])
+    assert router.signature("gpt-4o") == "east=east-deployment,west=west-deployment"
+
+    # A model no deployment serves runs on the first endpoint
+    asyncio.run(router.create(model="gpt-4o-mini", messages=[]))
+    assert primary.calls[-1]["model"] == "gpt-4o-mini"
+    assert router.signature("gpt-4o-mini") == "east/gpt-4o-mini=gpt-4o-mini"
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Annotated, Dict, List, Optional, TypedDict
+import operator
+from langgraph.graph import StateGraph, START, END
+from app_server.agent.branches import BranchGroup
+from app_server.agent.claim_graph import build_claim_subgraph
+from app_server.agent.claim_types import GENERIC_PROFILE
+from app_server.agent.state import merge_decision
+
+class BranchState(TypedDict):
+    claim_id: str
+    reject: bool
+    decision: Annotated[Optional[str], merge_decision]
+    done: Annotated[List[str], operator.add]
+
+def build_graph(stage: BranchGroup, slow_seconds: float = 0.2):
+    async def checker(state):
+        await asyncio.sleep(0.02)
+        return {"decision": "Reject" if state["reject"] else "Approve", "done": ["checker"]}
+
+    async def slow(state):
+        await asyncio.sleep(slow_seconds)
+        return {"done": ["slow"]}
+
+    workflow = StateGraph(BranchState)
+    workflow.add_node("checker", stage.branch("checker", checker))
+    workflow.add_node("slow", stage.branch("slow", slow))
+    workflow.add_edge(START, "checker")
+    workflow.add_edge(START, "slow")
+    workflow.add_edge(["checker", "slow"], END)
+    return workflow.compile()
+
+def test_merge_decision_keeps_the_most_severe():
+    assert merge_decision(None, "Approve") == "Approve"
+    assert merge_decision("Investigate", None) == "Investigate"
+    assert merge_decision("Reject", "Approve") == "Reject"
+    assert merge_decision("Approve", "Investigate") == "Investigate"
+    assert merge_decision("Investigate", "Reject") == "Reject"
+
+def test_reject_cancels_running_siblings():
+    graph = build_graph(BranchGroup("checker", "slow"), slow_seconds=5)
+    state = asyncio.run(asyncio.wait_for(graph.ainvoke({"claim_id": "C1", "reject": True, "done": []}), 2))
+    assert state["decision"] == "Reject"
+    assert state["done"] == ["checker"]
+
+def test_concurrent_runs_of_one_claim_do_not_cancel_each_other():
+    graph = build_graph(BranchGroup("checker", "slow"))
+
+    async def scenario(config):
+        return await asyncio.gather(
+            graph.ainvoke({"claim_id": "C1", "reject": True, "done": []}, config),
+            graph.ainvoke({"claim_id": "C1", "reject": False, "done": []}, config),
+        )
+
+    # Same thread, no checkpointer; then the runner's per-run ids
+    rejected, approved = asyncio.run(scenario({"configurable": {"thread_id": "C1"}}))
+    assert rejected["done"] == ["checker"]
+    assert sorted(approved["done"]) == ["checker", "slow"]
+
+    async def with_run_ids():
+        return await asyncio.gather(
+            graph.ainvoke({"claim_id": "C1", "reject": True, "done": []}, {"configurable": {"thread_id": "C1", "run_id": "r1"}}),
+            graph.ainvoke({"claim_id": "C1", "reject": False, "done": []}, {"configurable": {"thread_id": "C1", "run_id": "r2"}}),
+        )
+
+    rejected, approved = asyncio.run(with_run_ids())
+    assert sorted(approved["done"]) == ["checker", "slow"]
+
+def test_parallel_subgraph_runs_fraud_check_after_coverage():
+    graph = build_claim_subgraph(GENERIC_PROFILE, parallel=True).compile().get_graph()
+    edges = {(edge.source, edge.target) for edge in graph.edges}
+    assert ("coverage", "review_join") in edges
+    assert ("review_join", "fraud_check") in edges
+    assert ("intake_join", "fraud_check") not in edges
@@ -0,0 +1,126 @@
+import json
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI, Response
+import app_server.utils.sync as sync
+from app_server.utils.sync import BackendSyncManager, BulkSyncSender
+from benchmarks import stub_backend
+
+@pytest.fixture
+def backend(monkeypatch):
+    """
+    The stub Admin backend, served in-process to the sync module's HTTP client.
+    """
+    asyncio.run(stub_backend.reset_stats())
+    monkeypatch.setattr(sync, "http_client", httpx.AsyncClient(transport=httpx.ASGITransport(app=stub_backend.app)))
+    monkeypatch.setattr(sync, "SYNC_RETRY_BACKOFF_SECONDS", 0)
+    return stub_backend
+
+def payload(claim_id, **fields):
+    return json.dumps({"applicationId": claim_id, "status": "processing", **fields}).encode()
+
+async def send(sender, payloads):
+    for claim_id, body in payloads:
+        sender.enqueue(claim_id, body)
+    await sender.close()
+
+def test_batches_claims_into_one_bulk_request(backend):
+    sender = BulkSyncSender(batch_size=10, interval_seconds=0.01)
+    asyncio.run(send(sender, [(f"C{i}", payload(f"C{i}")) for i in range(5)]))
+    assert backend.stats["bulk_requests"] == 1
+    assert backend.stats["sync_requests"] == 0
+    assert sorted(backend.applications) == [f"C{i}" for i in range(5)]
+
+def test_newer_payload_replaces_queued_one(backend):
+    sender = BulkSyncSender(batch_size=10, interval_seconds=0.01)
+    asyncio.run(send(sender, [("C1", payload("C1", currentStep="fnol")), ("C1", payload("C1", currentStep="coverage"))]))
+    assert backend.stats["payloads"] == 1
+    assert backend.applications["C1"]["currentStep"] == "coverage"
+
+@pytest.mark.parametrize("status_code", [404, 405])
+def test_falls_back_to_single_syncs_without_bulk_route(backend, monkeypatch, status_code):
+    monkeypatch.setattr(stub_backend, "BULK_ENABLED", False)
+    if status_code == 405:
+        # A backend that serves the path but not POST on it
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def method_not_allowed(request, call_next):
+            if request.url.path == "/agent/sync/bulk":
+                return Response(status_code=405)
+            return await call_next(request)
+
+        app.mount("/", stub_backend.app)
+        monkeypatch.setattr(sync, "http_client", httpx.AsyncClient(transport=httpx.ASGITransport(app=app)))
+
+    sender = BulkSyncSender(batch_size=10, interval_seconds=0.01)
+    asyncio.run(send(sender, [("C1", payload("C1")), ("C2", payload("C2"))]))
+    assert not sender.bulk_supported
+    assert backend.stats["sync_requests"] == 2
+    assert sorted(backend.applications) == ["C1", "C2"]
+
+def test_reports_conflicting_patches(backend):
+    rejected = []
+    sender = BulkSyncSender(batch_size=10, interval_seconds=0.01)
+    sender.on_rejected = rejected.extend
+    stale = {"baseVersion": 7, "version": 8, "steps": []}
+    asyncio.run(send(sender, [("C1", payload("C1", stepHistory=[], stepHistoryVersion=1)),
+                              ("C2", payload("C2", stepHistoryPatch=stale))]))
+    assert rejected == ["C2"]
+    assert sender.stats["conflicts"] == 1
+
+def test_reports_payloads_that_fail_after_retries(backend, monkeypatch):
+    monkeypatch.setattr(stub_backend, "DROP_RATE", 1.0)
+    monkeypatch.setattr(sync, "SYNC_MAX_RETRIES", 1)
+    rejected = []
+    sender = BulkSyncSender(batch_size=10, interval_seconds=0.01)
+    sender.on_rejected = rejected.extend
+    asyncio.run(send(sender, [("C1", payload("C1")), ("C2", payload("C2"))]))
+    assert sorted(rejected) == ["C1", "C2"]
+    assert sender.stats["failed"] == 2
+    assert backend.stats["dropped"] == 2
+
+def claim_state(claim_id, claim_type):
+    return {"claim_id": claim_id, "fnol_data": {"claim_type": claim_type, "documents": []}}
+
+def test_resends_full_step_history_after_a_dropped_patch(backend, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_TIMELINE_PATCH", True)
+    monkeypatch.setattr(sync, "SYNC_MAX_RETRIES", 0)
+    manager = BackendSyncManager(debounce_seconds=0, sender=BulkSyncSender(batch_size=1, interval_seconds=0.01))
+
+    async def scenario():
+        await manager._send("C1", claim_state("C1", "life"), "fnol", "processing")
+        await manager.sender.close()
+        # The backend misses the next patch, so it stays one version behind
+        monkeypatch.setattr(stub_backend, "DROP_RATE", 1.0)
+        await manager._send("C1", claim_state("C1", "health"), "fnol", "processing", nodes={"fnol"})
+        await manager.sender.close()
+        monkeypatch.setattr(stub_backend, "DROP_RATE", 0)
+        await manager._send("C1", claim_state("C1", "car"), "fnol", "processing", nodes={"fnol"})
+        await manager.sender.close()
+
+    asyncio.run(scenario())
+    timeline = manager._timelines["C1"]
+    stored = backend.applications["C1"]
+    assert backend.stats["dropped"] == 1
+    assert backend.stats["patch_conflicts"] == 0
+    assert stored["stepHistoryVersion"] == timeline.version == 3
+    assert stored["stepHistory"] == json.loads(json.dumps(timeline.step_history, default=str))
+    assert "C1" not in manager._resync
+
+def test_patches_again_once_resynced(backend, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_TIMELINE_PATCH", True)
+    manager = BackendSyncManager(debounce_seconds=0, sender=BulkSyncSender(batch_size=1, interval_seconds=0.01))
+    manager._resync.add("C1")
+
+    async def scenario():
+        await manager._send("C1", claim_state("C1", "life"), "fnol", "processing")
+        await manager.sender.close()
+        await manager._send("C1", claim_state("C1", "car"), "fnol", "processing", nodes={"fnol"})
+        await manager.sender.close()
+
+    asyncio.run(scenario())
+    assert backend.stats["patches"] == 1
+    assert backend.stats["patch_conflicts"] == 0
+    assert backend.applications["C1"]["stepHistoryVersion"] == 2
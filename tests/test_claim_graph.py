@@ -0,0 +1,23 @@
+import asyncio
+from app_server.agent.claim_graph import subgraph_node
+
+class FakeSubgraph:
+    def __init__(self, changes: dict):
+        self.changes = changes
+
+    async def ainvoke(self, state):
+        return {**state, **self.changes, "reasoning": state["reasoning"] + self.changes.get("reasoning", [])}
+
+def test_subgraph_node_passes_on_only_what_changed():
+    fnol_data = {"claim_type": "life", "documents": [{"filename": "death-certificate.pdf"}]}
+    state = {"claim_id": "C1", "fnol_data": fnol_data, "decision": None, "reasoning": ["FNOL ok"]}
+    node = subgraph_node(FakeSubgraph({"decision": "Approve", "settlement_amount": 1000000.0,
+                                       "reasoning": ["Assessed amount: 1000000.0"]}))
+
+    update = asyncio.run(node(state))
+    assert update == {"decision": "Approve", "settlement_amount": 1000000.0, "reasoning": ["Assessed amount: 1000000.0"]}
+
+def test_subgraph_node_keeps_equal_but_rebuilt_values_out():
+    state = {"claim_id": "C1", "fnol_data": {"claim_type": "car"}, "reasoning": []}
+    node = subgraph_node(FakeSubgraph({"fnol_data": {"claim_type": "car"}}))
+    assert asyncio.run(node(state)) == {"reasoning": []}
@@ -0,0 +1,62 @@
+import asyncio
+import mongomock
+from bson import ObjectId
+import app_server.utils.mongodb_utils as mongodb_utils
+from app_server.utils.mongodb_utils import aget_claim_by_id, get_claim_by_id
+
+OID = ObjectId()
+
+class CountingCollection:
+    """
+    mongomock collection counting round trips; find() also works awaited via to_list.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        cursor = self.collection.find(query, projection)
+
+        async def to_list(length=None):
+            return list(cursor)
+
+        cursor.to_list = to_list
+        return cursor
+
+    def find_one(self, query, projection=None):
+        self.queries.append(query)
+        return self.collection.find_one(query, projection)
+
+def claims(monkeypatch):
+    collection = mongomock.MongoClient().db.claims
+    collection.insert_many([
+        {"_id": OID, "claim_id": "CLM-1", "status": "submitted"},
+        {"_id": "legacy", "id": "CLM-2", "status": "approved"},
+        # Its claim_id is the first claim's ObjectId string: _id must still win for that id
+        {"_id": ObjectId(), "claim_id": str(OID), "status": "other"},
+    ])
+    counting = CountingCollection(collection)
+    monkeypatch.setattr(mongodb_utils, "claims_collection", counting)
+    monkeypatch.setattr(mongodb_utils, "async_claims_collection", counting)
+    return counting
+
+def test_finds_by_any_id_field_in_one_query(monkeypatch):
+    collection = claims(monkeypatch)
+    assert get_claim_by_id("CLM-1")["_id"] == str(OID)
+    assert get_claim_by_id("CLM-2")["_id"] == "legacy"
+    assert get_claim_by_id("legacy")["id"] == "CLM-2"
+    assert get_claim_by_id("missing") is None
+    assert len(collection.queries) == 4
+
+def test_keeps_precedence_when_several_claims_match(monkeypatch):
+    claims(monkeypatch)
+    assert get_claim_by_id(str(OID))["status"] == "submitted"
+
+def test_async_lookup_with_projection(monkeypatch):
+    collection = claims(monkeypatch)
+    claim = asyncio.run(aget_claim_by_id("CLM-2", {"status": 1}))
+    assert claim["status"] == "approved"
+    assert asyncio.run(aget_claim_by_id(str(OID), {"status": 1}))["status"] == "submitted"
+    assert len(collection.queries) == 2
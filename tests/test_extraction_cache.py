@@ -0,0 +1,25 @@
+import asyncio
+import app_server.utils.extraction_cache as extraction_cache
+from app_server.utils.extraction_cache import make_cache_key, get_cached_extraction, put_cached_extraction
+from benchmarks.bench_claims import InMemoryCollection
+
+def test_key_covers_deployment_and_pipeline_variant():
+    base = make_cache_key(b"pdf", "v3", "east=gpt-4o", "claim-form", "preprocess=True")
+    assert base == make_cache_key(b"pdf", "v3", "east=gpt-4o", "claim-form", "preprocess=True")
+    assert base != make_cache_key(b"pdf", "v3", "east=gpt-4o,west=gpt-4o-mini", "claim-form", "preprocess=True")
+    assert base != make_cache_key(b"pdf", "v3", "east=gpt-4o", "claim-form", "preprocess=False")
+    assert base != make_cache_key(b"pdf2", "v3", "east=gpt-4o", "claim-form", "preprocess=True")
+
+def test_local_tier_returns_copies(monkeypatch):
+    monkeypatch.setattr(extraction_cache, "_collection", InMemoryCollection(0))
+    monkeypatch.setattr(extraction_cache, "_local_cache", {})
+
+    async def run():
+        result = {"extracted_data": {"name": "A"}}
+        await put_cached_extraction("k", result)
+        result["extracted_data"]["name"] = "changed by caller"
+        first = await get_cached_extraction("k")
+        first["extracted_data"]["name"] = "changed by another claim"
+        return await get_cached_extraction("k")
+
+    assert asyncio.run(run()) == {"extracted_data": {"name": "A"}}
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+import app_server.utils.hedging as hedging
+from app_server.utils.hedging import HedgedChat, percentile
+
+class FakeRouter:
+    """
+    Answers with the deployment it picked, after that deployment's latency. The first
+    deployment not in `avoid` is picked.
+    """
+
+    def __init__(self, latencies: dict, errors: dict = None):
+        self.latencies = latencies
+        self.errors = errors or {}
+        self.cancelled = []
+
+    async def create(self, avoid=(), route: list = None, **kwargs):
+        name = next((name for name in self.latencies if name not in avoid), next(iter(self.latencies)))
+        if route is not None:
+            route.append(name)
+        try:
+            await asyncio.sleep(self.latencies[name])
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        if name in self.errors:
+            raise self.errors[name]
+        return name
+
+@pytest.fixture(autouse=True)
+def hedging_enabled(monkeypatch):
+    monkeypatch.setattr(hedging, "VISION_HEDGING_ENABLED", True)
+    monkeypatch.setattr(hedging, "VISION_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(hedging, "VISION_HEDGE_MIN_DELAY_MS", 10)
+    monkeypatch.setattr(hedging, "VISION_HEDGE_PERCENTILE", 95)
+
+def warmed_up(router, seconds: float = 0.02, samples: int = 20):
+    chat = HedgedChat(router)
+    chat.latencies["bill"].extend([seconds] * samples)
+    return chat
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 51
+    assert percentile(values, 95) == 95
+    assert percentile(values, 100) == 100
+    assert percentile([3.0], 99) == 3.0
+
+def test_no_hedging_until_enough_samples():
+    chat = HedgedChat(FakeRouter({"east": 0.0}))
+    assert chat.hedge_delay("bill") is None
+    chat.latencies["bill"].extend([0.001] * 5)
+    assert chat.hedge_delay("bill") == 0.01  # floored at VISION_HEDGE_MIN_DELAY_MS
+
+def test_fast_primary_is_not_hedged():
+    chat = warmed_up(FakeRouter({"east": 0.0, "west": 0.0}))
+    assert asyncio.run(chat.create("bill", model="gpt-4o")) == "east"
+    assert chat.stats["hedged"] == 0
+
+def test_slow_primary_is_hedged_on_another_deployment():
+    router = FakeRouter({"east": 0.5, "west": 0.0})
+    chat = warmed_up(router)
+    assert asyncio.run(chat.create("bill", model="gpt-4o")) == "west"
+    assert chat.stats["hedged"] == chat.stats["hedge_won"] == 1
+    assert router.cancelled == ["east"]
+
+def test_cancelled_primary_counts_in_the_latency_window():
+    chat = warmed_up(FakeRouter({"east": 0.5, "west": 0.05}))
+    asyncio.run(chat.create("bill", model="gpt-4o"))
+    # 20 warm-up samples, the hedge's own latency, and the primary's time until it was cancelled
+    samples = list(chat.latencies["bill"])[20:]
+    assert len(samples) == 2
+    assert max(samples) >= 0.02 + 0.05
+
+def test_failed_request_does_not_win_while_the_other_can_answer():
+    router = FakeRouter({"east": 0.05, "west": 0.0}, errors={"west": RuntimeError("boom")})
+    chat = warmed_up(router)
+    assert asyncio.run(chat.create("bill", model="gpt-4o")) == "east"
+    assert chat.stats["primary_won"] == 1
+
+def test_hedges_stay_within_budget(monkeypatch):
+    monkeypatch.setattr(hedging, "VISION_HEDGE_BUDGET", 0.0)
+    chat = warmed_up(FakeRouter({"east": 0.05, "west": 0.0}))
+
+    async def scenario():
+        for _ in range(int(hedging.HEDGE_BUDGET_BURST) + 2):
+            await chat.create("bill", model="gpt-4o")
+
+    asyncio.run(scenario())
+    assert chat.stats["hedged"] == hedging.HEDGE_BUDGET_BURST
+    assert chat.stats["over_budget"] == 2
+
+def test_budget_accrues_per_request_up_to_the_burst(monkeypatch):
+    monkeypatch.setattr(hedging, "VISION_HEDGE_BUDGET", 0.5)
+    chat = warmed_up(FakeRouter({"east": 0.0}))
+    chat.budget = 0
+
+    async def scenario():
+        for _ in range(4):
+            await chat.create("bill", model="gpt-4o")
+
+    asyncio.run(scenario())
+    assert chat.budget == pytest.approx(2.0)
+    chat.budget = hedging.HEDGE_BUDGET_BURST
+    asyncio.run(scenario())
+    assert chat.budget == hedging.HEDGE_BUDGET_BURST
@@ -0,0 +1,42 @@
+import asyncio
+import logging
+import app_server.jobs.worker as worker
+from app_server.jobs.worker import JobWorkerPool
+
+def test_consumer_survives_a_failure_it_cannot_record(monkeypatch, caplog):
+    jobs = [{"_id": "J1", "claim_id": "C1", "claim": {"claim_id": "C1"}, "attempts": 1},
+            {"_id": "J2", "claim_id": "C2", "claim": {"claim_id": "C2"}, "attempts": 1}]
+    completed = []
+
+    async def claim_next_job(consumer_id):
+        return jobs.pop(0) if jobs else None
+
+    async def run_claim(claim):
+        if claim["claim_id"] == "C1":
+            raise RuntimeError("node failed")
+        return {"decision": "Approve"}
+
+    async def fail_job(*args):
+        raise ConnectionError("mongo unavailable")
+
+    async def complete_job(job_id, consumer_id, result):
+        completed.append(job_id)
+        return True
+
+    monkeypatch.setattr(worker, "claim_next_job", claim_next_job)
+    monkeypatch.setattr(worker, "run_claim", run_claim)
+    monkeypatch.setattr(worker, "fail_job", fail_job)
+    monkeypatch.setattr(worker, "complete_job", complete_job)
+    monkeypatch.setattr(worker, "JOB_POLL_INTERVAL_SECONDS", 0.01)
+
+    async def scenario():
+        pool = JobWorkerPool(1, worker_id="test")
+        pool.start()
+        while jobs or not completed:
+            await asyncio.sleep(0.01)
+        await pool.stop()
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+    assert completed == ["J2"]
+    assert "left to lease expiry" in caplog.text
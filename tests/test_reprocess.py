@@ -0,0 +1,78 @@
+import io
+import asyncio
+import pytest
+import app_server.reprocess as reprocess
+import app_server.utils.policy_cache as policy_cache
+from app_server.reprocess import ReprocessRun
+
+@pytest.fixture(autouse=True)
+def policy_queries(monkeypatch):
+    """
+    Policy numbers per batch query, with the cache emptied around the test.
+    """
+    queries = []
+
+    async def afetch_policies_by_numbers(policy_numbers, raise_on_error=False):
+        queries.append(sorted(policy_numbers))
+        return {number: {"policyNumber": number, "status": "Active"} for number in policy_numbers if number != "PN-GONE"}
+
+    monkeypatch.setattr(policy_cache, "afetch_policies_by_numbers", afetch_policies_by_numbers)
+    policy_cache.invalidate_policy()
+    yield queries
+    policy_cache.invalidate_policy()
+
+async def claims(count: int):
+    for index in range(count):
+        yield {"_id": f"oid-{index}", "claim_id": f"C{index}", "policyNumber": f"PN-{index % 30}"}
+
+def test_progress_and_node_timings(monkeypatch, capsys):
+    async def run_claim(claim, thread_id=None):
+        await asyncio.sleep(0)
+        if claim["claim_id"] == "C7":
+            raise RuntimeError("node failed")
+        return {"decision": "Approve", "node_metrics": {"fnol": {"wall_ms": 1.5}, "settlement": {"wall_ms": 2.0}}}
+
+    monkeypatch.setattr(reprocess, "run_claim", run_claim)
+    batch = ReprocessRun("test", 20, io.StringIO(), io.StringIO())
+    asyncio.run(batch.run(claims(250), done={"C3"}))
+
+    progress = [line for line in capsys.readouterr().out.splitlines() if line.startswith("...")]
+    assert progress == ["... 100 claims processed", "... 200 claims processed"]
+    assert batch.counts == {"succeeded": 248, "failed": 1, "skipped": 1}
+    assert batch.node_ms["fnol"] == [1.5] * 248
+    assert batch.node_ms["settlement"] == [2.0] * 248
+    assert batch.checkpoint_file.getvalue().count("\n") == 248
+
+def test_policies_are_prefetched_per_window(monkeypatch, policy_queries):
+    async def run_claim(claim, thread_id=None):
+        policy = await policy_cache.get_policy(claim["fnol_data"]["policyNumber"])
+        return {"decision": "Approve" if policy else "Reject"}
+
+    monkeypatch.setattr(reprocess, "run_claim", run_claim)
+    batch = ReprocessRun("test", 10, io.StringIO(), io.StringIO())
+    asyncio.run(batch.run(claims(60), done=set()))
+
+    # 30 distinct policies over windows of 10 claims: each fetched once, then served from the cache
+    assert len(policy_queries) == 3
+    assert sum(len(numbers) for numbers in policy_queries) == 30
+    assert policy_cache.get_policy_cache_stats()["misses"] == 0
+    assert batch.decisions == {"Approve": 60}
+
+def test_prefetch_caches_missing_policies_and_skips_cached_ones(policy_queries):
+    async def scenario():
+        assert await policy_cache.prefetch_policies(["PN-1", "PN-GONE", None, "PN-1"]) == 2
+        assert await policy_cache.prefetch_policies(["PN-1", "PN-GONE"]) == 0
+        return await policy_cache.get_policy("PN-1"), await policy_cache.get_policy("PN-GONE")
+
+    found, gone = asyncio.run(scenario())
+    assert found["status"] == "Active" and gone is None
+    assert policy_queries == [["PN-1", "PN-GONE"]]
+
+def test_prefetch_error_caches_nothing(monkeypatch):
+    async def broken(policy_numbers, raise_on_error=False):
+        raise ConnectionError("postgres down")
+
+    monkeypatch.setattr(policy_cache, "afetch_policies_by_numbers", broken)
+    assert asyncio.run(policy_cache.prefetch_policies(["PN-1"])) == 0
+    assert policy_cache.get_policy_cache_stats()["size"] == 0
+    assert policy_cache.get_policy_cache_stats()["negative_size"] == 0